@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+
+from Database.redis import get_async_redis_client
+
+# Гранулярность -> (длина корзины в секундах, формат партиции ключа, срок хранения партиции)
+GRANULARITIES = {
+    "minute": (60, "%Y%m%d", timedelta(days=2)),
+    "hour": (3600, "%Y%m", timedelta(days=400)),
+    "day": (86400, "%Y", timedelta(days=5 * 366)),
+}
+
+
+def bucket_start(ts: float, granularity: str) -> int:
+    size = GRANULARITIES[granularity][0]
+    return int(ts) // size * size
+
+
+class ClickRollup:
+    """
+    Переходы по ссылкам во временных корзинах: минуты, часы и дни в хэшах Redis.
+    Каждый сброс буфера сразу сворачивается во все три уровня, ключи партиционированы по дню, месяцу и году
+    и истекают целиком: минуты живут двое суток, часы — больше года, дни — пять лет.
+    Ряд за период читается HMGET по нужным корзинам, без сырых событий.
+    """
+    KEY_PREFIX = "clicks:"
+    MAX_POINTS = 2000
+
+    def __init__(self):
+        self.redis = get_async_redis_client()
+
+    def key(self, alias: str, granularity: str, bucket: int) -> str:
+        partition = datetime.fromtimestamp(bucket, timezone.utc).strftime(GRANULARITIES[granularity][1])
+        return f"{self.KEY_PREFIX}{granularity}:{alias}:{partition}"
+
+    async def add(self, clicks: dict[tuple[str, int], int]):
+        """
+        :param clicks: (alias, начало минуты в unix-времени) -> количество переходов
+        """
+        if not clicks:
+            return
+        increments: dict[tuple[str, str], int] = {}
+        ttls: dict[str, int] = {}
+        for (alias, minute), count in clicks.items():
+            for granularity, (_, _, retention) in GRANULARITIES.items():
+                bucket = bucket_start(minute, granularity)
+                key = self.key(alias, granularity, bucket)
+                increments[(key, str(bucket))] = increments.get((key, str(bucket)), 0) + count
+                ttls[key] = int(retention.total_seconds())
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for (key, field), count in increments.items():
+                pipe.hincrby(key, field, count)
+            for key, ttl in ttls.items():
+                pipe.expire(key, ttl)
+            await pipe.execute()
+
+    async def forget(self, aliases: list[str], now: float | None = None):
+        """
+        Удаляет все корзины переходов удалённых ссылок — перебором партиций в пределах срока хранения.
+        """
+        if not aliases:
+            return
+        until = datetime.fromtimestamp(now, timezone.utc) if now else datetime.now(timezone.utc)
+        partitions = {}
+        for granularity, (_, partition_format, retention) in GRANULARITIES.items():
+            # Запас в сутки: ключ живёт retention с последней записи, а запись идёт с задержкой сброса
+            day = until - retention - timedelta(days=1)
+            names = set()
+            while day <= until:
+                names.add(day.strftime(partition_format))
+                day += timedelta(days=1)
+            partitions[granularity] = names
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for alias in aliases:
+                pipe.unlink(*(
+                    f"{self.KEY_PREFIX}{granularity}:{alias}:{partition}"
+                    for granularity, names in partitions.items() for partition in sorted(names)
+                ))
+            await pipe.execute()
+
+    async def series(self, alias: str, since: datetime, until: datetime, granularity: str = "hour") -> list[tuple[datetime, int]]:
+        """
+        Плотный ряд [(начало корзины, переходы)] за [since, until], пустые корзины — нули.
+        """
+        size = GRANULARITIES[granularity][0]
+        buckets = list(range(bucket_start(since.timestamp(), granularity), int(until.timestamp()) + 1, size))
+        if len(buckets) > self.MAX_POINTS:
+            raise ValueError(f"Range is limited to {self.MAX_POINTS} {granularity} buckets")
+        if not buckets:
+            return []
+
+        by_key: dict[str, list[int]] = {}
+        for bucket in buckets:
+            by_key.setdefault(self.key(alias, granularity, bucket), []).append(bucket)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, key_buckets in by_key.items():
+                pipe.hmget(key, [str(bucket) for bucket in key_buckets])
+            replies = await pipe.execute()
+
+        counts = {}
+        for key_buckets, values in zip(by_key.values(), replies):
+            counts.update(zip(key_buckets, values))
+        return [
+            (datetime.fromtimestamp(bucket, timezone.utc), int(counts.get(bucket) or 0))
+            for bucket in buckets
+        ]
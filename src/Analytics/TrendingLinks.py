@@ -0,0 +1,98 @@
+import math
+import time
+
+from Database.redis import get_async_redis_client
+
+# Окно -> постоянная затухания в секундах: переход «весит» e^(-возраст/окно)
+WINDOWS = {
+    "5m": 300,
+    "1h": 3600,
+    "1d": 86400,
+}
+
+# Forward decay: вклад перехода растёт как e^((t - landmark)/tau), поэтому старые счёты не нужно
+# пересчитывать. Когда множитель становится большим, весь ZSET масштабируется одним ZUNIONSTORE
+# и точка отсчёта переносится на текущий момент. Множество обрезается до самых горячих alias.
+RECORD_SCRIPT = """
+local now = tonumber(ARGV[1])
+local max_size = tonumber(ARGV[2])
+local windows = #KEYS / 2
+for w = 1, windows do
+    local zset, landmark_key = KEYS[2 * w - 1], KEYS[2 * w]
+    local tau = tonumber(ARGV[2 + w])
+    local landmark = tonumber(redis.call('GET', landmark_key))
+    if not landmark then
+        landmark = now
+        redis.call('SET', landmark_key, now)
+    elseif (now - landmark) / tau > tonumber(ARGV[3 + windows]) then
+        redis.call('ZUNIONSTORE', zset, 1, zset, 'WEIGHTS', math.exp((landmark - now) / tau))
+        landmark = now
+        redis.call('SET', landmark_key, now)
+    end
+    local weight = math.exp((now - landmark) / tau)
+    for i = 4 + windows, #ARGV, 2 do
+        redis.call('ZINCRBY', zset, tonumber(ARGV[i + 1]) * weight, ARGV[i])
+    end
+    local size = redis.call('ZCARD', zset)
+    if size > max_size then
+        redis.call('ZREMRANGEBYRANK', zset, 0, size - max_size - 1)
+    end
+end
+return 1
+"""
+
+
+class TrendingLinks:
+    """
+    Самые посещаемые ссылки за последние 5 минут, час и сутки: ZSET в Redis с экспоненциальным затуханием.
+    Обновляется пачкой при сбросе буфера переходов, топ читается одним ZREVRANGE — время ответа
+    не зависит от размера таблицы ссылок. В каждом окне хранится не больше max_size alias.
+    :param max_size: Сколько самых горячих alias держать в каждом окне
+    """
+    KEY_PREFIX = "trending:"
+    MAX_SIZE = 10_000
+    # Порог показателя экспоненты, после которого счёты масштабируются — далеко до переполнения double
+    RESCALE_EXPONENT = 30
+
+    def __init__(self, max_size: int = MAX_SIZE):
+        self.redis = get_async_redis_client()
+        self.max_size = max_size
+        self._record = self.redis.register_script(RECORD_SCRIPT)
+
+    def key(self, window: str) -> str:
+        return f"{self.KEY_PREFIX}{window}"
+
+    async def add(self, counts: dict[str, int], now: float | None = None):
+        """
+        :param counts: alias -> количество переходов с прошлого сброса
+        """
+        if not counts:
+            return
+        keys = []
+        for window in WINDOWS:
+            keys.extend([self.key(window), self.key(window) + ":landmark"])
+        args = [now or time.time(), self.max_size, *WINDOWS.values(), self.RESCALE_EXPONENT]
+        for alias, count in counts.items():
+            args.extend([alias, count])
+        await self._record(keys=keys, args=args)
+
+    async def forget(self, aliases: list[str]):
+        if not aliases:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for window in WINDOWS:
+                pipe.zrem(self.key(window), *aliases)
+            await pipe.execute()
+
+    async def top(self, window: str = "1h", k: int = 100, now: float | None = None) -> list[tuple[str, float]]:
+        """
+        k самых горячих alias окна с оценкой числа переходов, затухшей к текущему моменту.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zrevrange(self.key(window), 0, k - 1, withscores=True)
+            pipe.get(self.key(window) + ":landmark")
+            entries, landmark = await pipe.execute()
+        if not entries:
+            return []
+        decay = math.exp((float(landmark) - (now or time.time())) / WINDOWS[window])
+        return [(alias, score * decay) for alias, score in entries]
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone
+from hashlib import blake2b
+
+from Analytics.ClickRollup import GRANULARITIES, bucket_start
+from Database.redis import get_async_redis_client
+
+# Окна уникальных посетителей и срок хранения их HyperLogLog
+WINDOWS = {
+    "hour": timedelta(days=7),
+    "day": timedelta(days=90),
+}
+
+
+def visitor_fingerprint(ip: str | None, user_agent: str | None) -> str:
+    """
+    Обезличенный идентификатор посетителя: хэш IP и User-Agent, сами значения не хранятся.
+    """
+    return blake2b(f"{ip or ''}|{user_agent or ''}".encode(), digest_size=8).hexdigest()
+
+
+class UniqueVisitors:
+    """
+    Приблизительное число уникальных посетителей ссылки на HyperLogLog в Redis (PFADD/PFCOUNT, ошибка ~0.8%).
+    На ссылку — один HLL за всё время и по одному на каждый час и день; HLL занимает не больше 12 КБ,
+    оконные ключи истекают по WINDOWS. Уникальные за период — PFCOUNT по объединению оконных ключей.
+    """
+    KEY_PREFIX = "uv:"
+
+    def __init__(self):
+        self.redis = get_async_redis_client()
+
+    def key(self, alias: str, window: str | None = None, bucket: int | None = None) -> str:
+        if window is None:
+            return f"{self.KEY_PREFIX}{alias}"
+        return f"{self.KEY_PREFIX}{window}:{alias}:{bucket}"
+
+    async def add(self, visitors: dict[tuple[str, int], set[str]]):
+        """
+        :param visitors: (alias, начало часа в unix-времени) -> отпечатки посетителей
+        """
+        if not visitors:
+            return
+        members: dict[str, set[str]] = {}
+        ttls: dict[str, int] = {}
+        for (alias, hour), fingerprints in visitors.items():
+            members.setdefault(self.key(alias), set()).update(fingerprints)
+            for window, retention in WINDOWS.items():
+                key = self.key(alias, window, bucket_start(hour, window))
+                members.setdefault(key, set()).update(fingerprints)
+                ttls[key] = int(retention.total_seconds())
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, fingerprints in members.items():
+                pipe.pfadd(key, *fingerprints)
+            for key, ttl in ttls.items():
+                pipe.expire(key, ttl)
+            await pipe.execute()
+
+    async def forget(self, aliases: list[str], now: float | None = None):
+        """
+        Удаляет общий и все оконные HLL удалённых ссылок; оконные перечисляются в пределах срока хранения.
+        """
+        if not aliases:
+            return
+        now = now or datetime.now(timezone.utc).timestamp()
+        buckets = {
+            window: range(
+                bucket_start(now - retention.total_seconds() - GRANULARITIES[window][0], window),
+                int(now) + 1,
+                GRANULARITIES[window][0]
+            )
+            for window, retention in WINDOWS.items()
+        }
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for alias in aliases:
+                pipe.unlink(self.key(alias), *(
+                    self.key(alias, window, bucket) for window, window_buckets in buckets.items() for bucket in window_buckets
+                ))
+            await pipe.execute()
+
+    async def count(self, alias: str) -> int:
+        return await self.redis.pfcount(self.key(alias))
+
+    async def count_many(self, aliases: list[str]) -> list[int]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for alias in aliases:
+                pipe.pfcount(self.key(alias))
+            return await pipe.execute()
+
+    async def count_range(self, alias: str, since: datetime, until: datetime, window: str = "hour") -> int:
+        keys = [self.key(alias, window, bucket) for bucket in self._buckets(since, until, window)]
+        return await self.redis.pfcount(*keys) if keys else 0
+
+    async def count_buckets(self, alias: str, buckets: list[int], window: str = "hour") -> list[int]:
+        """
+        Уникальные посетители в каждой корзине окна window; buckets — начала корзин в unix-времени.
+        """
+        if not buckets:
+            return []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for bucket in buckets:
+                pipe.pfcount(self.key(alias, window, bucket))
+            return await pipe.execute()
+
+    @staticmethod
+    def _buckets(since: datetime, until: datetime, window: str) -> list[int]:
+        size = GRANULARITIES[window][0]
+        # Старше срока хранения окон данных нет — не запрашиваем пустые ключи
+        oldest = datetime.now(timezone.utc) - WINDOWS[window]
+        start = bucket_start(max(since, oldest).timestamp(), window)
+        return list(range(start, int(until.timestamp()) + 1, size))
@@ -0,0 +1,188 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+
+from Database.main_db import AsyncSessionLocal
+from DbManager.AsyncMainDbManager import AsyncMainDbManager
+from DbManager.AsyncRedisDbManager import AsyncRedisDbManager
+from Analytics.ClickRollup import ClickRollup, bucket_start
+from Analytics.UniqueVisitors import UniqueVisitors
+from Analytics.TrendingLinks import TrendingLinks
+
+
+class VisitBuffer:
+    """
+    Копит переходы по ссылкам в памяти воркера и сбрасывает их в БД одним пакетным UPDATE.
+    Переходы, которые ещё не учтены в хэше Redis (ответы из локального кэша), досылаются туда же одним скриптом.
+    :param flush_interval: Максимальный интервал между сбросами в секундах — окно возможной потери при падении
+    :param max_pending: Количество накопленных переходов, при котором сброс запускается досрочно
+    :param rollup: Временные корзины переходов; поминутные счётчики отправляются туда при каждом сбросе
+    :param unique_visitors: HyperLogLog уникальных посетителей; отпечатки копятся по часам и уходят одним пайплайном
+    :param trending: Затухающий топ ссылок; получает количество переходов по каждому alias за сброс
+    """
+
+    def __init__(
+        self,
+        db_manager: AsyncMainDbManager,
+        redis_manager: AsyncRedisDbManager | None = None,
+        flush_interval: float = 5,
+        max_pending: int = 1000,
+        rollup: ClickRollup | None = None,
+        unique_visitors: UniqueVisitors | None = None,
+        trending: TrendingLinks | None = None
+    ):
+        self.db_manager = db_manager
+        self.redis_manager = redis_manager
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.rollup = rollup
+        self.unique_visitors = unique_visitors
+        self.trending = trending
+        # alias -> [количество, время последнего перехода, сколько из них ещё не учтено в Redis]
+        self._pending: dict[str, list] = {}
+        # (alias, начало минуты) -> количество переходов
+        self._clicks: dict[tuple[str, int], int] = {}
+        # (alias, начало часа) -> отпечатки посетителей
+        self._visitors: dict[tuple[str, int], set[str]] = {}
+        self._pending_visits = 0
+        self._lock = threading.Lock()
+        self._wakeup: asyncio.Event | None = None
+
+    def record(self, alias: str, counted_in_cache: bool = False, visitor: str | None = None):
+        now = datetime.now(timezone.utc)
+        cache_delta = 0 if counted_in_cache else 1
+        minute = (alias, bucket_start(now.timestamp(), "minute"))
+        with self._lock:
+            self._clicks[minute] = self._clicks.get(minute, 0) + 1
+            if visitor:
+                self._visitors.setdefault((alias, bucket_start(minute[1], "hour")), set()).add(visitor)
+            entry = self._pending.get(alias)
+            if entry:
+                entry[0] += 1
+                entry[1] = now
+                entry[2] += cache_delta
+            else:
+                self._pending[alias] = [1, now, cache_delta]
+            self._pending_visits += 1
+            overflow = self._pending_visits >= self.max_pending
+
+        if overflow and self._wakeup:
+            self._wakeup.set()
+
+    def pending(self, alias: str) -> tuple[int, datetime | None]:
+        with self._lock:
+            entry = self._pending.get(alias)
+            return (entry[0], entry[1]) if entry else (0, None)
+
+    def discard(self, alias: str):
+        """
+        Забывает ещё не сброшенные переходы удалённой ссылки, чтобы они не достались новой ссылке с тем же alias.
+        """
+        with self._lock:
+            entry = self._pending.pop(alias, None)
+            if entry:
+                self._pending_visits -= entry[0]
+            for key in [key for key in self._clicks if key[0] == alias]:
+                del self._clicks[key]
+            for key in [key for key in self._visitors if key[0] == alias]:
+                del self._visitors[key]
+
+    def pending_uncached(self, alias: str) -> tuple[int, datetime | None]:
+        """
+        Переходы, которые ещё не попали в хэш Redis (ответы из локального кэша), и время последнего перехода.
+        """
+        with self._lock:
+            entry = self._pending.get(alias)
+            return (entry[2], entry[1]) if entry else (0, None)
+
+    async def flush(self) -> int:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            clicks, self._clicks = self._clicks, {}
+            visitors, self._visitors = self._visitors, {}
+            self._pending_visits = 0
+        if not batch:
+            return 0
+
+        try:
+            async with AsyncSessionLocal() as db:
+                await self.db_manager.apply_visits(
+                    {alias: (count, visited_at) for alias, (count, visited_at, _) in batch.items()}, db
+                )
+        except Exception:
+            # Возвращаем пачку обратно, чтобы не потерять переходы до следующей попытки
+            self._merge_back(batch, clicks, visitors)
+            raise
+
+        cache_visits = {
+            alias: (cache_delta, visited_at)
+            for alias, (_, visited_at, cache_delta) in batch.items() if cache_delta
+        }
+        if self.redis_manager and cache_visits:
+            try:
+                await self.redis_manager.record_visits(cache_visits)
+            except Exception as e:
+                # Кэш только отстанет по счётчику, источник истины — БД
+                print(f"[VisitBuffer] Cache counters update failed: {e}")
+        if self.rollup:
+            try:
+                await self.rollup.add(clicks)
+            except Exception as e:
+                # Ряды по времени — аналитика, общий счётчик в БД уже обновлён
+                print(f"[VisitBuffer] Click rollup update failed: {e}")
+        if self.unique_visitors:
+            try:
+                await self.unique_visitors.add(visitors)
+            except Exception as e:
+                print(f"[VisitBuffer] Unique visitors update failed: {e}")
+        if self.trending:
+            try:
+                await self.trending.add({alias: count for alias, (count, _, _) in batch.items()})
+            except Exception as e:
+                print(f"[VisitBuffer] Trending update failed: {e}")
+        return len(batch)
+
+    async def run(self):
+        """
+        Фоновый цикл сброса: по таймеру или досрочно при переполнении. При остановке сбрасывает остаток.
+        """
+        self._wakeup = asyncio.Event()
+        in_flight = None
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                # Отмена при остановке не должна обрывать запись уже забранной из буфера пачки
+                in_flight = asyncio.ensure_future(self.flush())
+                try:
+                    await asyncio.shield(in_flight)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"[VisitBuffer] Flush failed: {e}")
+        finally:
+            self._wakeup = None
+            if in_flight is not None and not in_flight.done():
+                await asyncio.gather(in_flight, return_exceptions=True)
+            await self.flush()
+
+    def _merge_back(
+        self, batch: dict[str, list], clicks: dict[tuple[str, int], int], visitors: dict[tuple[str, int], set[str]]
+    ):
+        with self._lock:
+            for hour, fingerprints in visitors.items():
+                self._visitors.setdefault(hour, set()).update(fingerprints)
+            for minute, count in clicks.items():
+                self._clicks[minute] = self._clicks.get(minute, 0) + count
+            for alias, (count, visited_at, cache_delta) in batch.items():
+                entry = self._pending.get(alias)
+                if entry:
+                    entry[0] += count
+                    entry[1] = max(entry[1], visited_at)
+                    entry[2] += cache_delta
+                else:
+                    self._pending[alias] = [count, visited_at, cache_delta]
+                self._pending_visits += count
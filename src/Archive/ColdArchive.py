@@ -0,0 +1,86 @@
+import gzip
+import json
+import os
+from datetime import date, datetime
+from typing import Iterator
+
+DEFAULT_ARCHIVE_DIR = "archive"
+
+
+class ColdArchive:
+    """
+    Холодный архив удалённых ссылок: сжатые NDJSON-файлы, разложенные по дням удаления.
+    Файл называется по первому id порции в партиции. Если после сбоя строки не удалились, следующая выгрузка
+    начнётся с того же id (возможно, захватив и более новые строки) и заменит файл, а не продублирует записи.
+    :param base_dir: Каталог архива, по умолчанию из ARCHIVE_DIR
+    """
+    DATASET = "expired_urls"
+
+    def __init__(self, base_dir: str | None = None):
+        self.base_dir = os.path.join(base_dir or os.getenv("ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR), self.DATASET)
+
+    def write(self, records: list[dict]) -> list[str]:
+        """
+        Раскладывает записи по партициям date=YYYY-MM-DD (по deletedAt) и атомарно пишет файлы.
+        :return: Пути записанных файлов
+        """
+        partitions: dict[str, list[dict]] = {}
+        for record in records:
+            partitions.setdefault(self._partition(record["deletedAt"]), []).append(record)
+
+        paths = []
+        for partition, items in sorted(partitions.items()):
+            directory = os.path.join(self.base_dir, f"date={partition}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{items[0]['id']:012d}.ndjson.gz")
+            tmp_path = path + ".tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as file:
+                for item in items:
+                    file.write(json.dumps(item, default=self._default, ensure_ascii=False))
+                    file.write("\n")
+            # Файл появляется под итоговым именем только целиком и только после сброса на диск
+            with open(tmp_path, "rb") as file:
+                os.fsync(file.fileno())
+            os.replace(tmp_path, path)
+            paths.append(path)
+        return paths
+
+    def partitions(self, since: date | None = None, until: date | None = None) -> list[str]:
+        if not os.path.isdir(self.base_dir):
+            return []
+        result = []
+        for name in sorted(os.listdir(self.base_dir)):
+            if not name.startswith("date="):
+                continue
+            day = date.fromisoformat(name[len("date="):])
+            if (since and day < since) or (until and day > until):
+                continue
+            result.append(os.path.join(self.base_dir, name))
+        return result
+
+    def iter_lines(self, since: date | None = None, until: date | None = None) -> Iterator[str]:
+        """
+        Построчно читает архив за период, не загружая файлы в память целиком.
+        """
+        for directory in self.partitions(since, until):
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith(".ndjson.gz"):
+                    continue
+                with gzip.open(os.path.join(directory, name), "rt", encoding="utf-8") as file:
+                    yield from file
+
+    def iter_records(self, since: date | None = None, until: date | None = None) -> Iterator[dict]:
+        for line in self.iter_lines(since, until):
+            yield json.loads(line)
+
+    @staticmethod
+    def _partition(deleted_at: datetime | str) -> str:
+        if isinstance(deleted_at, str):
+            deleted_at = datetime.fromisoformat(deleted_at)
+        return deleted_at.date().isoformat()
+
+    @staticmethod
+    def _default(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
@@ -0,0 +1,24 @@
+from redis import Redis
+
+from Cache.CacheInvalidator import CacheInvalidator
+from Cache.LocalCache import LocalCache
+
+
+class AuthInvalidator(CacheInvalidator):
+    """
+    Рассылает выход из системы и деактивацию пользователей между воркерами, чтобы кэш токенов
+    AuthService не отдавал отозванную личность до истечения TTL.
+    AuthService синхронный, поэтому публикация идёт через синхронный клиент Redis.
+    :param redis: Синхронный клиент Redis для публикации
+    """
+    LOGOUT_CHANNEL = "auth:logout"
+    DEACTIVATED_CHANNEL = "auth:deactivated"
+    CHANNELS = {LOGOUT_CHANNEL: True, DEACTIVATED_CHANNEL: False}
+
+    def __init__(self, cache: LocalCache, redis: Redis):
+        super().__init__(cache)
+        self.sync_redis = redis
+
+    def publish_sync(self, key: str, channel: str):
+        self._dispatch(channel, key)
+        self.sync_redis.publish(channel, f"{self.origin}:{key}")
@@ -0,0 +1,103 @@
+import hashlib
+import math
+from typing import AsyncIterator
+
+
+class CountingBloomFilter:
+    """
+    Bloom-фильтр со счётчиками вместо битов: поддерживает удаление элементов.
+    :param capacity: Ожидаемое количество элементов
+    :param error_rate: Допустимая доля ложноположительных ответов
+    """
+    MAX_COUNTER = 255
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.size = max(1, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._counters = bytearray(self.size)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            if self._counters[pos] < self.MAX_COUNTER:
+                self._counters[pos] += 1
+        self.count += 1
+
+    def remove(self, item: str):
+        positions = self._positions(item)
+        if not all(self._counters[pos] for pos in positions):
+            return
+        for pos in positions:
+            # Насыщенный счётчик уже не знает точного числа элементов — не трогаем его
+            if self._counters[pos] < self.MAX_COUNTER:
+                self._counters[pos] -= 1
+        self.count -= 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._counters[pos] for pos in self._positions(item))
+
+
+class AliasBloomFilter:
+    """
+    Фильтр существующих alias воркера. Пока фильтр не построен, считает, что любой alias может существовать.
+    Изменения, пришедшие во время перестроения, применяются к новому фильтру после его построения.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.ready = False
+        self._filter = CountingBloomFilter(capacity, error_rate)
+        self._replay: list[tuple[bool, str]] | None = None
+
+    def might_exist(self, alias: str) -> bool:
+        return not self.ready or alias in self._filter
+
+    def add(self, alias: str):
+        if self._replay is not None:
+            self._replay.append((True, alias))
+        else:
+            self._filter.add(alias)
+
+    def remove(self, alias: str):
+        if self._replay is not None:
+            self._replay.append((False, alias))
+        else:
+            self._filter.remove(alias)
+
+    def reset(self):
+        self.ready = False
+
+    async def rebuild(self, alias_pages: AsyncIterator[list[str]]):
+        self.ready = False
+        self._replay = []
+        new_filter = CountingBloomFilter(self.capacity, self.error_rate)
+        try:
+            async for aliases in alias_pages:
+                for alias in aliases:
+                    new_filter.add(alias)
+        finally:
+            replay, self._replay = self._replay, None
+
+        for added, alias in replay:
+            if added:
+                new_filter.add(alias)
+            elif alias in new_filter:
+                new_filter.remove(alias)
+
+        self._filter = new_filter
+        self.ready = True
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "items": self._filter.count,
+            "size": self._filter.size,
+            "hashCount": self._filter.hash_count
+        }
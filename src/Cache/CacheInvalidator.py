@@ -0,0 +1,92 @@
+import asyncio
+import uuid
+from typing import Callable
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from Cache.LocalCache import LocalCache
+from Database.redis import get_async_redis_client
+
+
+class CacheInvalidator:
+    """
+    Рассылает изменения ссылок между воркерами через Redis pub/sub, чтобы локальные кэши оставались согласованными.
+    Обработчики событий своего воркера вызываются сразу при публикации, чужого — при получении сообщения.
+    """
+    CHANNEL = "links:invalidate"
+    CREATED_CHANNEL = "links:created"
+    DELETED_CHANNEL = "links:deleted"
+    RECONNECT_DELAY = 1
+    # Каналы подписки и нужно ли по событию сбрасывать запись локального кэша
+    CHANNELS = {CHANNEL: True, CREATED_CHANNEL: False, DELETED_CHANNEL: True}
+
+    def __init__(self, cache: LocalCache):
+        self.cache = cache
+        self.redis = get_async_redis_client()
+        self.origin = uuid.uuid4().hex
+        self._handlers: dict[str, list[Callable[[str], None]]] = {
+            channel: [cache.invalidate] if invalidates else [] for channel, invalidates in self.CHANNELS.items()
+        }
+        self._subscribe_handlers: list[Callable[[], None]] = [cache.clear]
+        self._disconnect_handlers: list[Callable[[], None]] = [cache.clear]
+        self._task: asyncio.Task | None = None
+
+    def on_event(self, channel: str, handler: Callable[[str], None]):
+        self._handlers[channel].append(handler)
+
+    def on_subscribe(self, handler: Callable[[], None]):
+        """
+        Обработчик вызывается после каждой (пере)подписки: пропущенные сообщения могли сделать локальное состояние устаревшим.
+        """
+        self._subscribe_handlers.append(handler)
+
+    def on_disconnect(self, handler: Callable[[], None]):
+        self._disconnect_handlers.append(handler)
+
+    async def publish(self, *aliases: str, channel: str = CHANNEL):
+        for alias in aliases:
+            self._dispatch(channel, alias)
+
+        if len(aliases) == 1:
+            await self.redis.publish(channel, f"{self.origin}:{aliases[0]}")
+        elif aliases:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for alias in aliases:
+                    pipe.publish(channel, f"{self.origin}:{alias}")
+                await pipe.execute()
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _dispatch(self, channel: str, alias: str):
+        for handler in self._handlers[channel]:
+            handler(alias)
+
+    async def _listen(self):
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(*self._handlers)
+                for handler in self._subscribe_handlers:
+                    handler()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    origin, _, alias = message["data"].partition(":")
+                    if origin != self.origin:
+                        self._dispatch(message["channel"], alias)
+            except RedisConnectionError:
+                print("[CacheInvalidator] Redis unavailable, retrying...")
+                for handler in self._disconnect_handlers:
+                    handler()
+                await asyncio.sleep(self.RECONNECT_DELAY)
+            finally:
+                await pubsub.aclose()
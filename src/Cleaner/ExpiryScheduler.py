@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from DbManager.AsyncRedisDbManager import AsyncRedisDbManager
+
+
+class ExpiryScheduler:
+    """
+    Снимает ссылки в момент истечения. Сроки лежат в ZSET Redis, наступившие воркеры забирают атомарно,
+    поэтому каждую ссылку обрабатывает только один из них. Полный проход очистки остаётся страховкой.
+    :param on_expired: Обработчик пачки истёкших alias (удаление из БД и кэшей)
+    :param poll_interval: Пауза между проверками расписания в секундах — максимальная задержка снятия
+    :param batch_size: Сколько ссылок забирать за одну проверку
+    """
+
+    def __init__(
+        self,
+        redis_manager: AsyncRedisDbManager,
+        on_expired: Callable[[list[str]], Awaitable],
+        poll_interval: float = 1,
+        batch_size: int = 500
+    ):
+        self.redis_manager = redis_manager
+        self.on_expired = on_expired
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+
+    async def run_once(self) -> int:
+        now = datetime.now(timezone.utc)
+        aliases = await self.redis_manager.claim_expired(now, self.batch_size)
+        if not aliases:
+            return 0
+        try:
+            await self.on_expired(aliases)
+        except Exception:
+            # Возвращаем ссылки в расписание, чтобы снять их на следующей проверке
+            await self.redis_manager.schedule_expiry({alias: now for alias in aliases})
+            raise
+        return len(aliases)
+
+    async def run(self):
+        while True:
+            try:
+                processed = await self.run_once()
+            except Exception as e:
+                print(f"[ExpiryScheduler] Expiry pass failed: {e}")
+                processed = 0
+            # Полная пачка — скорее всего, есть ещё наступившие сроки, проверяем сразу
+            if processed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,133 @@
+import asyncio
+import uuid
+from typing import Awaitable, Callable
+
+from redis.exceptions import RedisError
+
+from Database.redis import get_async_redis_client
+
+# Захват аренды и выдача нового fencing-токена одной операцией
+ACQUIRE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    local token = redis.call('INCR', KEYS[2])
+    redis.call('SET', KEYS[1], ARGV[1] .. ':' .. token, 'PX', ARGV[2])
+    return token
+end
+return false
+"""
+
+# Продление и освобождение — только своей аренды
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLeaseLock:
+    """
+    Аренда лидерства в Redis: фоновую задачу выполняет только воркер, удерживающий аренду.
+    Аренда продлевается, пока задача жива; если лидер умер, она истекает и её забирает другой воркер.
+    Каждый захват получает возрастающий fencing-токен — задача сверяет его перед записью,
+    чтобы бывший лидер, потерявший аренду, не продолжал работу.
+    :param name: Имя задачи, общее для всех воркеров и хостов
+    :param lease_ms: Время жизни аренды без продления в миллисекундах
+    :param renew_interval: Как часто лидер продлевает аренду, в секундах
+    :param retry_interval: Как часто остальные воркеры пытаются её захватить, в секундах
+    """
+
+    def __init__(self, name: str, lease_ms: int = 30_000, renew_interval: float = 10, retry_interval: float = 5):
+        self.redis = get_async_redis_client()
+        self.key = f"lease:{name}"
+        self.fencing_key = f"lease:{name}:fencing"
+        self.lease_ms = lease_ms
+        self.renew_interval = renew_interval
+        self.retry_interval = retry_interval
+        self.owner = uuid.uuid4().hex
+        self.token: int | None = None
+        self._acquire = self.redis.register_script(ACQUIRE_SCRIPT)
+        self._renew = self.redis.register_script(RENEW_SCRIPT)
+        self._release = self.redis.register_script(RELEASE_SCRIPT)
+
+    @property
+    def _value(self) -> str:
+        return f"{self.owner}:{self.token}"
+
+    async def acquire(self) -> int | None:
+        token = await self._acquire(keys=[self.key, self.fencing_key], args=[self.owner, self.lease_ms])
+        self.token = int(token) if token else None
+        return self.token
+
+    async def renew(self) -> bool:
+        if self.token is None:
+            return False
+        renewed = bool(await self._renew(keys=[self.key], args=[self._value, self.lease_ms]))
+        if not renewed:
+            self.token = None
+        return renewed
+
+    async def release(self):
+        if self.token is not None:
+            await self._release(keys=[self.key], args=[self._value])
+            self.token = None
+
+    async def is_leader(self) -> bool:
+        """
+        Проверка fencing-токена: аренда всё ещё наша и её не перехватили после истечения.
+        """
+        if self.token is None:
+            return False
+        try:
+            return await self.redis.get(self.key) == self._value
+        except RedisError:
+            return False
+
+    async def run(self, job: Callable[[], Awaitable]):
+        """
+        Бесконечно борется за аренду и выполняет job, пока её удерживает. При потере аренды job отменяется.
+        """
+        while True:
+            try:
+                token = await self.acquire()
+            except RedisError as e:
+                print(f"[LeaseLock] {self.key} acquire failed: {e}")
+                token = None
+            if token is None:
+                await asyncio.sleep(self.retry_interval)
+                continue
+
+            print(f"[LeaseLock] {self.key} acquired, fencing token {token}")
+            task = asyncio.create_task(job())
+            try:
+                while not task.done():
+                    await asyncio.wait({task}, timeout=self.renew_interval)
+                    if task.done():
+                        break
+                    try:
+                        renewed = await self.renew()
+                    except RedisError as e:
+                        print(f"[LeaseLock] {self.key} renew failed: {e}")
+                        renewed = False
+                    if not renewed:
+                        print(f"[LeaseLock] {self.key} lost")
+                        break
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                try:
+                    await self.release()
+                except RedisError:
+                    # Аренда истечёт сама через lease_ms
+                    self.token = None
+
+            if task.done() and not task.cancelled() and task.exception():
+                print(f"[LeaseLock] {self.key} job failed: {task.exception()}")
+            await asyncio.sleep(self.retry_interval)
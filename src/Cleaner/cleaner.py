@@ -1,15 +1,22 @@
 import asyncio
 from service.UrlService import UrlService
+from Cleaner.LeaseLock import RedisLeaseLock
 
-url_service = UrlService()
-
-async def periodic_expired_cleanup(interval_seconds: int = 3600, unused_days: int = 10):
+async def periodic_expired_cleanup(
+    url_service: UrlService, interval_seconds: int = 3600, unused_days: int = 10, lease: RedisLeaseLock | None = None
+):
     """
     Периодически очищает устаревшие ссылки.
+    :param url_service: Сервис ссылок приложения, чтобы очистка работала с теми же кэшами и буфером
     :param interval_seconds: Интервал между проверками в секундах (по умолчанию 1 час)
+    :param lease: Аренда лидерства; если передана, перед каждой порцией удаления и архивации сверяется её fencing-токен
     """
+    still_leader = lease.is_leader if lease else None
     while True:
         print("[Cleaner] Checking for expired URLs...")
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, lambda: url_service.delete_expired(unused_days))
-        await asyncio.sleep(interval_seconds)  # <-- Добавляем это
\ No newline at end of file
+        await url_service.delete_expired(unused_days, still_leader=still_leader)
+        try:
+            await url_service.archive_expired(still_leader=still_leader)
+        except Exception as e:
+            print(f"[Cleaner] Archiving failed: {e}")
+        await asyncio.sleep(interval_seconds)  # <-- Добавляем это
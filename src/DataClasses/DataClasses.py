@@ -2,6 +2,9 @@ from pydantic import BaseModel, EmailStr, Field, ValidationError, field_validato
 import re
 from datetime import datetime
 
+# Сегменты путей /links/..., которые перекрыли бы ссылку с таким alias
+RESERVED_ALIASES = frozenset({"mine", "search"})
+
 class LongUrlDC(BaseModel):
     url: str
 
@@ -9,6 +12,8 @@ class CreateShortUrlDC(BaseModel):
     url: str
     expiresAt: datetime = None
     alias: str = ""
+    # Вернуть уже существующую ссылку пользователя на тот же адрес вместо создания новой
+    dedupe: bool = False
 
     @field_validator("alias")
     def validate_alias(cls, value):
@@ -18,16 +23,60 @@ class CreateShortUrlDC(BaseModel):
             raise ValueError("Alias must be at most 7 characters long.")
         if not re.fullmatch(r"^[a-zA-Z0-9_]+$", value):
             raise ValueError("Alias can only contain letters, digits and underscores: [a-zA-Z0-9_]")
+        if value in RESERVED_ALIASES:
+            raise ValueError(f"Alias '{value}' is reserved.")
         return value
 
 class ShortUrlDC(BaseModel):
     url: str
 
+class ShortenResultDC(BaseModel):
+    url: str | None = None
+    error: str | None = None
+
+class ResolveResultDC(BaseModel):
+    shortUrl: str
+    url: str | None = None
+    error: str | None = None
+
+class ClickBucketDC(BaseModel):
+    start: datetime
+    clicks: int
+    # Приблизительно, по HyperLogLog; для поминутных корзин не считается
+    uniqueVisitors: int | None = None
+
 class ShortUrlStatsDC(BaseModel):
     originalUrl: str
     visits: int
     lastTimeUsed: datetime
     createdAt: datetime
+    uniqueVisitors: int | None = None
+    # Переходы по корзинам времени — только если в запросе указан период
+    series: list[ClickBucketDC] | None = None
+    uniqueVisitorsInRange: int | None = None
+
+class StatsResultDC(BaseModel):
+    shortUrl: str
+    stats: ShortUrlStatsDC | None = None
+    error: str | None = None
+
+class UserLinkDC(BaseModel):
+    shortUrl: str
+    longUrl: str
+    visits: int
+    createdAt: datetime
+    lastVisited: datetime | None = None
+    expiresAt: datetime | None = None
+
+class UserLinksPageDC(BaseModel):
+    items: list[UserLinkDC]
+    # Передаётся в cursor для следующей страницы; None — страниц больше нет
+    nextCursor: int | None = None
+
+class TopLinkDC(BaseModel):
+    shortUrl: str
+    # Переходы с экспоненциальным затуханием за окно — величина для сравнения, а не точный счёт
+    score: float
 
 class UpdateUrlDC(BaseModel):
     newUrl: str
@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+
+
+def parse_dt(iso_str: str | None) -> datetime | None:
+    if not iso_str:
+        return None
+    if iso_str.endswith("Z"):
+        iso_str = iso_str.replace("Z", "+00:00")
+    return datetime.fromisoformat(iso_str).astimezone(timezone.utc)
+
+
+def _lazy_datetime(name: str) -> property:
+    slot = "_" + name
+
+    def getter(self):
+        value = getattr(self, slot)
+        if isinstance(value, str):
+            value = parse_dt(value)
+            setattr(self, slot, value)
+        return value
+
+    def setter(self, value):
+        setattr(self, slot, value)
+
+    return property(getter, setter)
+
+
+class ShortUrlRecord:
+    """
+    Лёгкая запись ссылки для чтения из кэша и выборок по колонкам — без инструментирования ORM.
+    Даты можно передать строкой ISO: они разбираются только при первом обращении.
+    """
+    __slots__ = ("shortUrl", "longUrl", "timesVisited", "owner_id", "_createdAt", "_lastVisited", "_expiresAt")
+
+    createdAt = _lazy_datetime("createdAt")
+    lastVisited = _lazy_datetime("lastVisited")
+    expiresAt = _lazy_datetime("expiresAt")
+
+    def __init__(
+        self,
+        shortUrl: str,
+        longUrl: str,
+        timesVisited: int = 0,
+        createdAt: datetime | str | None = None,
+        lastVisited: datetime | str | None = None,
+        expiresAt: datetime | str | None = None,
+        owner_id: int | None = None
+    ):
+        self.shortUrl = shortUrl
+        self.longUrl = longUrl
+        self.timesVisited = timesVisited
+        self.owner_id = owner_id
+        self._createdAt = createdAt
+        self._lastVisited = lastVisited
+        self._expiresAt = expiresAt
+
+    def __repr__(self) -> str:
+        return f"ShortUrlRecord(shortUrl={self.shortUrl!r}, longUrl={self.longUrl!r})"
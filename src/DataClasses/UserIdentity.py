@@ -0,0 +1,10 @@
+from typing import NamedTuple
+
+
+class UserIdentity(NamedTuple):
+    """
+    Пользователь, которому принадлежит токен, — без ORM-объекта и открытой сессии, поэтому его можно кэшировать.
+    """
+    id: int
+    email: str
+    is_active: bool
@@ -0,0 +1,104 @@
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+DEFAULT_DATABASE_URL = "sqlite:///urls.db"
+
+# Профиль SQLite: WAL позволяет читать параллельно с записью, NORMAL не делает fsync на каждый коммит
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "busy_timeout": 5000,
+}
+
+
+def get_database_url() -> str:
+    return _normalize_driver(os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL))
+
+
+def get_replica_database_url() -> str:
+    """
+    Адрес реплики для чтения из DATABASE_REPLICA_URL. Без реплики чтение идёт
+    через отдельный пул соединений к основной БД.
+    """
+    return _normalize_driver(os.getenv("DATABASE_REPLICA_URL") or get_database_url())
+
+
+def has_replica() -> bool:
+    return bool(os.getenv("DATABASE_REPLICA_URL"))
+
+
+def _normalize_driver(url: str) -> str:
+    # Один драйвер psycopg 3 работает и в синхронном, и в асинхронном движке
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix):]
+    return url
+
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    return url
+
+
+def engine_options(url: str, read_only: bool = False) -> dict:
+    """
+    Параметры create_engine для выбранной СУБД; размеры пула настраиваются переменными окружения.
+    """
+    options = {"echo": os.getenv("DB_ECHO", "").lower() in ("1", "true", "yes")}
+    if make_url(url).get_backend_name() == "postgresql":
+        options.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", 10)),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 20)),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", 1800)),
+            pool_pre_ping=True,
+        )
+        if read_only:
+            options["execution_options"] = {"postgresql_readonly": True}
+    return options
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def apply_sqlite_read_only(dbapi_connection, connection_record):
+    # Соединение «реплики» отклоняет любые записи
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(url: str | None = None, read_only: bool = False) -> Engine:
+    url = url or get_database_url()
+    engine = create_engine(url, **engine_options(url, read_only))
+    _listen_sqlite(engine, read_only)
+    return engine
+
+
+def create_async_db_engine(url: str | None = None, read_only: bool = False) -> AsyncEngine:
+    url = url or get_database_url()
+    engine = create_async_engine(to_async_url(url), **engine_options(url, read_only))
+    _listen_sqlite(engine.sync_engine, read_only)
+    return engine
+
+
+def _listen_sqlite(engine: Engine, read_only: bool):
+    if engine.dialect.name != "sqlite":
+        return
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+    if read_only:
+        event.listen(engine, "connect", apply_sqlite_read_only)
@@ -1,26 +1,77 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, func, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, func, Boolean, ForeignKey, Index
 from datetime import datetime
-from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+from hashlib import sha256
+from urllib.parse import urlsplit, urlunsplit
+from sqlalchemy.orm import declarative_base, sessionmaker, relationship, validates
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
-# Настройка подключения
-engine = create_engine('sqlite:///urls.db', echo=True)
+from Database.engine import create_db_engine, create_async_db_engine, get_replica_database_url
+
+# Настройка подключения: адрес БД берётся из DATABASE_URL (по умолчанию sqlite:///urls.db)
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронное подключение к той же БД для обработчиков запросов
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Только чтение: реплика из DATABASE_REPLICA_URL или отдельный пул к основной БД.
+# Сессии помечены в info, чтобы при промахе можно было перечитать с основной БД
+read_engine = create_db_engine(get_replica_database_url(), read_only=True)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine, info={"replica": True})
+async_read_engine = create_async_db_engine(get_replica_database_url(), read_only=True)
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine, autoflush=False, expire_on_commit=False, info={"replica": True}
+)
+
 Base = declarative_base()
 
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Приводит ссылку к каноническому виду: схема и хост в нижнем регистре, без порта по умолчанию.
+    Путь, запрос и фрагмент не меняются — они могут быть чувствительны к регистру.
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.username or parts.password:
+        # Учётные данные оставляем как есть, чтобы не склеить разные ссылки
+        host = parts.netloc.rsplit("@", 1)[0] + "@" + host
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    return urlunsplit((scheme, host, parts.path or ("/" if host else ""), parts.query, parts.fragment))
+
+
+def long_url_hash(url: str) -> str:
+    return sha256(normalize_url(url).encode()).hexdigest()
+
+
 class ShortUrl(Base):
     __tablename__ = 'urls'
     
     id = Column(Integer, primary_key=True, index=True)
     shortUrl = Column(String, name="short_url", nullable=False, unique=True)
     longUrl = Column(String, name="long_url", nullable=False)
+    # Хэш нормализованной ссылки фиксированной длины — по нему индексируется поиск по оригинальной ссылке
+    longUrlHash = Column(String(64), name="long_url_hash", nullable=True, index=True)
     timesVisited = Column(Integer, name="times_visited", default=0, nullable=False)
     createdAt = Column(DateTime, name="created_at", server_default=func.now(), nullable=False)
-    lastVisited = Column(DateTime, name="last_visited", server_default=func.now(), nullable=False)
-    expiresAt = Column(DateTime, name="expires_at", nullable=True)
+    lastVisited = Column(DateTime, name="last_visited", server_default=func.now(), nullable=False, index=True)
+    expiresAt = Column(DateTime, name="expires_at", nullable=True, index=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     owner = relationship("User", backref="urls")
 
+    # Список ссылок пользователя листается по id — составной индекс отдаёт страницу без сортировки
+    __table_args__ = (Index("ix_urls_owner_id_id", "owner_id", "id"),)
+
     def __init__(
         self,
         shortUrl: str,
@@ -39,6 +90,11 @@ class ShortUrl(Base):
         self.expiresAt = expiresAt
         self.owner_id = owner_id
 
+    @validates("longUrl")
+    def _update_long_url_hash(self, key, value):
+        self.longUrlHash = long_url_hash(value)
+        return value
+
 
 class User(Base):
     __tablename__ = "users"
@@ -64,4 +120,5 @@ class ExpiredUrl(Base):
     owner_id = Column(Integer, nullable=True)
 
 
+# Свежая БД создаётся сразу со всеми индексами, существующие обновляются миграциями: alembic upgrade head
 Base.metadata.create_all(engine)
\ No newline at end of file
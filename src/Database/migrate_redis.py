@@ -0,0 +1,10 @@
+"""
+Переносит кэш ссылок из старого формата (JSON-строка под ключом alias) в хэши url:{alias}.
+Запуск из каталога src: python -m Database.migrate_redis
+"""
+from DbManager.RedisDbManager import RedisDbManager
+
+
+if __name__ == "__main__":
+    migrated = RedisDbManager().migrate_json_records()
+    print(f"[Migration] Migrated {migrated} Redis records to hashes")
@@ -1,7 +1,13 @@
 import redis
+import redis.asyncio as aioredis
 import os
 
 def get_redis_client():
     host = os.getenv("REDIS_HOST", "localhost")
     port = int(os.getenv("REDIS_PORT", 6379))
-    return redis.StrictRedis(host=host, port=port, db=0, decode_responses=True)
\ No newline at end of file
+    return redis.StrictRedis(host=host, port=port, db=0, decode_responses=True)
+
+def get_async_redis_client():
+    host = os.getenv("REDIS_HOST", "localhost")
+    port = int(os.getenv("REDIS_PORT", 6379))
+    return aioredis.StrictRedis(host=host, port=port, db=0, decode_responses=True)
\ No newline at end of file
@@ -0,0 +1,80 @@
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from Database.main_db import ShortUrl, ExpiredUrl
+from DataClasses.ShortUrlRecord import ShortUrlRecord
+from DbManager.MainDbManager import MainDbManager
+
+
+class AsyncMainDbManager:
+    """
+    Асинхронный аналог MainDbManager.
+    Запросы остаются в MainDbManager и выполняются через AsyncSession.run_sync,
+    поэтому обращения к БД не блокируют event loop, а логика не дублируется.
+    """
+
+    def __init__(self, db_manager: MainDbManager | None = None):
+        self.sync_manager = db_manager or MainDbManager()
+
+    async def save(self, shortUrl: ShortUrl, db: AsyncSession):
+        return await db.run_sync(lambda session: self.sync_manager.save(shortUrl, session))
+
+    async def insert_many(self, short_urls: list[ShortUrlRecord], db: AsyncSession, chunk_size: int = 500) -> set[tuple[str, str]]:
+        return await db.run_sync(lambda session: self.sync_manager.insert_many(short_urls, session, chunk_size))
+
+    async def update_short_url(
+        self, short_url: str, new_full_url: str, db: AsyncSession, user_id: int | None = None
+    ) -> ShortUrlRecord | None:
+        return await db.run_sync(
+            lambda session: self.sync_manager.update_short_url(short_url, new_full_url, session, user_id)
+        )
+
+    async def delete_short_url(self, short_url: str, db: AsyncSession, user_id: int | None = None) -> ShortUrlRecord | None:
+        return await db.run_sync(lambda session: self.sync_manager.delete_short_url(short_url, session, user_id))
+
+    async def get_by_short_url(self, short_url: str, db: AsyncSession):
+        return await db.run_sync(lambda session: self.sync_manager.get_by_short_url(short_url, session))
+
+    async def get_record(self, short_url: str, db: AsyncSession) -> ShortUrlRecord | None:
+        return await db.run_sync(lambda session: self.sync_manager.get_record(short_url, session))
+
+    async def get_records(self, short_urls: list[str], db: AsyncSession) -> list[ShortUrlRecord]:
+        return await db.run_sync(lambda session: self.sync_manager.get_records(short_urls, session))
+
+    async def delete_expired_chunk(self, db: AsyncSession, limit: int = 1000) -> list[str]:
+        return await db.run_sync(lambda session: self.sync_manager.delete_expired_chunk(session, limit))
+
+    async def delete_expired_by_aliases(self, aliases: list[str], db: AsyncSession) -> list[str]:
+        return await db.run_sync(lambda session: self.sync_manager.delete_expired_by_aliases(aliases, session))
+
+    async def delete_unused_chunk(self, db: AsyncSession, days: int = 10, limit: int = 1000) -> list[str]:
+        return await db.run_sync(lambda session: self.sync_manager.delete_unused_chunk(session, days, limit))
+
+    async def apply_visits(self, visits: dict[str, list], db: AsyncSession):
+        return await db.run_sync(lambda session: self.sync_manager.apply_visits(visits, session))
+
+    async def get_by_long_url(self, long_url: str, db: AsyncSession):
+        return await db.run_sync(lambda session: self.sync_manager.get_by_long_url(long_url, session))
+
+    async def get_aliases_by_long_urls(self, long_urls: list[str], owner_id: int, db: AsyncSession) -> dict[str, str]:
+        return await db.run_sync(lambda session: self.sync_manager.get_aliases_by_long_urls(long_urls, owner_id, session))
+
+    async def get_short_url_page(self, db: AsyncSession, after_id: int = 0, limit: int = 10_000) -> list[tuple[int, str]]:
+        return await db.run_sync(lambda session: self.sync_manager.get_short_url_page(session, after_id, limit))
+
+    async def get_urls_page(self, db: AsyncSession, after_id: int = 0, limit: int = 1000) -> list:
+        return await db.run_sync(lambda session: self.sync_manager.get_urls_page(session, after_id, limit))
+
+    async def get_expired_urls_page(self, db: AsyncSession, after_id: int = 0, limit: int = 1000) -> list:
+        return await db.run_sync(lambda session: self.sync_manager.get_expired_urls_page(session, after_id, limit))
+
+    async def get_owner_urls_page(self, owner_id: int, db: AsyncSession, after_id: int = 0, limit: int = 50) -> list:
+        return await db.run_sync(
+            lambda session: self.sync_manager.get_owner_urls_page(owner_id, session, after_id, limit)
+        )
+
+    async def get_archivable_chunk(self, db: AsyncSession, cutoff: datetime, limit: int = 5000) -> list[ExpiredUrl]:
+        return await db.run_sync(lambda session: self.sync_manager.get_archivable_chunk(session, cutoff, limit))
+
+    async def delete_expired_records(self, ids: list[int], db: AsyncSession) -> int:
+        return await db.run_sync(lambda session: self.sync_manager.delete_expired_records(ids, session))
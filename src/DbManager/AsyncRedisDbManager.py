@@ -0,0 +1,88 @@
+from datetime import datetime, timezone
+
+from Database.redis import get_async_redis_client
+from Database.main_db import ShortUrl
+from DataClasses.ShortUrlRecord import ShortUrlRecord
+from DbManager.RedisDbManager import (
+    RedisDbManager, RESOLVE_SCRIPT, RECORD_VISITS_SCRIPT, CLAIM_EXPIRED_SCRIPT, UPDATE_LINK_SCRIPT, EXPIRY_KEY,
+    cache_key, queue_save, from_redis_hash, visits_to_args, format_dt
+)
+
+
+class AsyncRedisDbManager:
+    """
+    Асинхронный аналог RedisDbManager на redis.asyncio с тем же форматом записей.
+    """
+    LIVE_TIME = RedisDbManager.LIVE_TIME
+
+    def __init__(self):
+        self.redis = get_async_redis_client()
+        self._resolve = self.redis.register_script(RESOLVE_SCRIPT)
+        self._record_visits = self.redis.register_script(RECORD_VISITS_SCRIPT)
+        self._claim_expired = self.redis.register_script(CLAIM_EXPIRED_SCRIPT)
+        self._update_link = self.redis.register_script(UPDATE_LINK_SCRIPT)
+
+    async def save(self, short_url: ShortUrl | ShortUrlRecord):
+        async with self.redis.pipeline() as pipe:
+            queue_save(pipe, short_url, self.LIVE_TIME)
+            await pipe.execute()
+
+    async def update_link(self, short_url: ShortUrlRecord):
+        """
+        Обновляет адрес ссылки в кэше, сохраняя накопленные в Redis переходы; без записи в кэше — обычный save.
+        """
+        updated = await self._update_link(
+            keys=[cache_key(short_url.shortUrl)], args=[short_url.longUrl, format_dt(short_url.expiresAt) or ""]
+        )
+        if not updated:
+            await self.save(short_url)
+
+    async def save_many(self, short_urls: list[ShortUrl | ShortUrlRecord]):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for short_url in short_urls:
+                queue_save(pipe, short_url, self.LIVE_TIME)
+            await pipe.execute()
+
+    async def get(self, short_url: str):
+        data = await self.redis.hgetall(cache_key(short_url))
+        if not data:
+            return None
+        return from_redis_hash(data)
+
+    async def get_many(self, short_urls: list[str]) -> dict[str, ShortUrlRecord]:
+        """
+        Записи из кэша одним пайплайном; отсутствующих alias в ответе нет.
+        """
+        if not short_urls:
+            return {}
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for alias in short_urls:
+                pipe.hgetall(cache_key(alias))
+            replies = await pipe.execute()
+        return {alias: from_redis_hash(data) for alias, data in zip(short_urls, replies) if data}
+
+    async def resolve(self, short_url: str) -> ShortUrlRecord | None:
+        result = await self._resolve(keys=[cache_key(short_url)], args=[format_dt(datetime.now(timezone.utc))])
+        if not result:
+            return None
+        long_url, expires_at = result
+        return ShortUrlRecord(shortUrl=short_url, longUrl=long_url, expiresAt=expires_at)
+
+    async def record_visits(self, visits: dict[str, tuple[int, datetime]]):
+        if visits:
+            keys, args = visits_to_args(visits)
+            await self._record_visits(keys=keys, args=args)
+
+    async def delete(self, *short_urls: str):
+        if short_urls:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.delete(*(cache_key(alias) for alias in short_urls))
+                pipe.zrem(EXPIRY_KEY, *short_urls)
+                await pipe.execute()
+
+    async def claim_expired(self, now: datetime, limit: int = 500) -> list[str]:
+        return await self._claim_expired(keys=[EXPIRY_KEY], args=[now.timestamp(), limit])
+
+    async def schedule_expiry(self, expirations: dict[str, datetime]):
+        if expirations:
+            await self.redis.zadd(EXPIRY_KEY, {alias: at.timestamp() for alias, at in expirations.items()})
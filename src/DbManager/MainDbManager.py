@@ -1,85 +1,316 @@
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
-from Database.main_db import ShortUrl, ExpiredUrl
+from Database.main_db import ShortUrl, ExpiredUrl, long_url_hash
+from DataClasses.ShortUrlRecord import ShortUrlRecord
 from fastapi import HTTPException
 from datetime import datetime, timezone, timedelta
-from sqlalchemy import and_
+from sqlalchemy import and_, or_, bindparam, inspect, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+RECORD_COLUMNS = ("short_url", "long_url", "times_visited", "created_at", "last_visited", "expires_at", "owner_id")
+
+
+def short_url_row(short_url: ShortUrl | ShortUrlRecord, now: datetime) -> dict:
+    return {
+        "short_url": short_url.shortUrl,
+        "long_url": short_url.longUrl,
+        "long_url_hash": long_url_hash(short_url.longUrl),
+        "times_visited": short_url.timesVisited or 0,
+        "created_at": short_url.createdAt or now,
+        "last_visited": short_url.lastVisited or now,
+        "expires_at": short_url.expiresAt,
+        "owner_id": short_url.owner_id
+    }
+
 
 class MainDbManager:
 
     def save(self, shortUrl: ShortUrl, db: Session):
-        existing = db.query(ShortUrl).filter(ShortUrl.shortUrl == shortUrl.shortUrl).first()
-        if existing:
+        """
+        Один INSERT ... ON CONFLICT DO NOTHING RETURNING: занятость alias определяет уникальный индекс.
+        """
+        urls = ShortUrl.__table__
+        stmt = (
+            self._insert(db)(urls)
+            .values(short_url_row(shortUrl, datetime.now(timezone.utc)))
+            .on_conflict_do_nothing(index_elements=[urls.c.short_url])
+            .returning(urls.c.id, urls.c.times_visited, urls.c.created_at, urls.c.last_visited)
+        )
+        row = db.execute(stmt).first()
+        db.commit()
+        if row is None:
             raise HTTPException(
                 status_code=409,
                 detail=f"Alias '{shortUrl.shortUrl}' already exists"
             )
-        
-        try:
-            db.add(shortUrl)
-            db.commit()
-            db.refresh(shortUrl)
-            return shortUrl
-        except IntegrityError:
-            db.rollback()
-            return None
 
-    def update_short_url(self, short_url: str, new_full_url: str, db: Session):
-        db_entry = db.query(ShortUrl).filter(ShortUrl.shortUrl == short_url).first()
+        shortUrl.id = row.id
+        shortUrl.timesVisited = row.times_visited
+        shortUrl.createdAt = row.created_at
+        shortUrl.lastVisited = row.last_visited
+        return shortUrl
+
+    def insert_many(self, short_urls: list[ShortUrlRecord], db: Session, chunk_size: int = 500) -> set[tuple[str, str]]:
+        """
+        Вставляет пачку ссылок многострочными INSERT ... ON CONFLICT DO NOTHING в одной транзакции.
+        :param chunk_size: Количество строк в одном INSERT, чтобы не упереться в лимит параметров запроса
+        :return: Пары (alias, оригинальная ссылка) действительно вставленных строк; остальные alias уже заняты
+        """
+        urls = ShortUrl.__table__
+        insert = self._insert(db)
+        now = datetime.now(timezone.utc)
+        inserted = set()
+        for start in range(0, len(short_urls), chunk_size):
+            stmt = (
+                insert(urls)
+                .values([short_url_row(short_url, now) for short_url in short_urls[start:start + chunk_size]])
+                .on_conflict_do_nothing(index_elements=[urls.c.short_url])
+                .returning(urls.c.short_url, urls.c.long_url)
+            )
+            inserted.update((row.short_url, row.long_url) for row in db.execute(stmt))
+        db.commit()
+        return inserted
 
-        if db_entry:
-            db_entry.longUrl = new_full_url
-            db.commit()
-            db.refresh(db_entry)
-            return db_entry
-        else:
+    def update_short_url(
+        self, short_url: str, new_full_url: str, db: Session, user_id: int | None = None
+    ) -> ShortUrlRecord | None:
+        """
+        UPDATE ... RETURNING с проверкой владельца в условии.
+        :param user_id: Кто меняет ссылку; чужие ссылки не обновляются, ничьи может менять любой
+        :return: Обновлённая запись или None, если ссылки нет или она чужая
+        """
+        urls = ShortUrl.__table__
+        stmt = (
+            urls.update()
+            .where(urls.c.short_url == short_url, self._owned_by(user_id))
+            .values(long_url=new_full_url, long_url_hash=long_url_hash(new_full_url))
+            .returning(*(urls.c[name] for name in RECORD_COLUMNS))
+        )
+        row = db.execute(stmt).first()
+        db.commit()
+        return ShortUrlRecord(*row) if row else None
+
+    def delete_short_url(self, short_url: str, db: Session, user_id: int | None = None) -> ShortUrlRecord | None:
+        """
+        DELETE ... RETURNING с проверкой владельца в условии, удалённая строка сразу архивируется.
+        :return: Удалённая запись или None, если ссылки нет или она чужая
+        """
+        urls = ShortUrl.__table__
+        stmt = (
+            urls.delete()
+            .where(urls.c.short_url == short_url, self._owned_by(user_id))
+            .returning(*(urls.c[name] for name in RECORD_COLUMNS))
+        )
+        row = db.execute(stmt).first()
+        if row is None:
+            db.rollback()
             return None
 
-    def delete_short_url(self, short_url: str, db: Session):
-        db_entry = db.query(ShortUrl).filter(ShortUrl.shortUrl == short_url).first()
-        if db_entry:
-            self.move_to_expired(db_entry, db)  # Архивируем перед удалением
-            db.delete(db_entry)
-            db.commit()
-            return db_entry
-        return None
+        deleted = ShortUrlRecord(*row)
+        self.move_to_expired(deleted, db)  # Архивируем в той же транзакции
+        db.commit()
+        return deleted
 
     def get_by_short_url(self, short_url: str, db: Session):
         return db.query(ShortUrl).filter(ShortUrl.shortUrl == short_url).first()
 
-    def delete_all_expired(self, db: Session) -> list[str]:
+    def get_record(self, short_url: str, db: Session) -> ShortUrlRecord | None:
+        """
+        Выборка только нужных колонок без создания ORM-объекта — для путей чтения.
+        """
+        row = db.query(
+            ShortUrl.shortUrl, ShortUrl.longUrl, ShortUrl.timesVisited,
+            ShortUrl.createdAt, ShortUrl.lastVisited, ShortUrl.expiresAt, ShortUrl.owner_id
+        ).filter(ShortUrl.shortUrl == short_url).first()
+        return ShortUrlRecord(*row) if row else None
+
+    def get_records(self, short_urls: list[str], db: Session) -> list[ShortUrlRecord]:
+        """
+        Пакетный аналог get_record: один SELECT ... WHERE short_url IN (...).
+        """
+        if not short_urls:
+            return []
+        rows = db.query(
+            ShortUrl.shortUrl, ShortUrl.longUrl, ShortUrl.timesVisited,
+            ShortUrl.createdAt, ShortUrl.lastVisited, ShortUrl.expiresAt, ShortUrl.owner_id
+        ).filter(ShortUrl.shortUrl.in_(short_urls)).all()
+        return [ShortUrlRecord(*row) for row in rows]
+
+    def delete_expired_chunk(self, db: Session, limit: int = 1000) -> list[str]:
+        """
+        Архивирует и удаляет не больше limit просроченных ссылок в отдельной транзакции.
+        """
+        urls = ShortUrl.__table__
         curr_time = datetime.now(timezone.utc)
-        expired = db.query(ShortUrl).filter(
-            and_(ShortUrl.expiresAt.isnot(None), ShortUrl.expiresAt <= curr_time)
-        ).all()
+        return self._archive_chunk(and_(urls.c.expires_at.isnot(None), urls.c.expires_at <= curr_time), db, limit)
 
-        deleted_aliases = []
-        for entry in expired:
-            self.move_to_expired(entry, db)
-            deleted_aliases.append(entry.shortUrl)
-            db.delete(entry)
+    def delete_unused_chunk(self, db: Session, days: int = 10, limit: int = 1000) -> list[str]:
+        """
+        Архивирует и удаляет не больше limit ссылок без переходов за days дней в отдельной транзакции.
+        """
+        urls = ShortUrl.__table__
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        return self._archive_chunk(urls.c.last_visited <= cutoff, db, limit)
+
+    def delete_expired_by_aliases(self, aliases: list[str], db: Session) -> list[str]:
+        """
+        Архивирует и удаляет перечисленные ссылки, если их срок действительно истёк.
+        """
+        urls = ShortUrl.__table__
+        curr_time = datetime.now(timezone.utc)
+        condition = and_(urls.c.short_url.in_(aliases), urls.c.expires_at.isnot(None), urls.c.expires_at <= curr_time)
+        return self._archive_chunk(condition, db, len(aliases))
+
+    def delete_all_expired(self, db: Session, chunk_size: int = 1000) -> list[str]:
+        return self._drain(lambda: self.delete_expired_chunk(db, chunk_size), chunk_size)
 
+    def delete_unused_for_days(self, db: Session, days: int = 10, chunk_size: int = 1000) -> list[str]:
+        return self._drain(lambda: self.delete_unused_chunk(db, days, chunk_size), chunk_size)
+
+    def apply_visits(self, visits: dict[str, list], db: Session):
+        """
+        Применяет накопленные переходы одним пакетным UPDATE.
+        :param visits: alias -> (количество переходов, время последнего перехода)
+        """
+        urls = ShortUrl.__table__
+        stmt = (
+            urls.update()
+            .where(urls.c.short_url == bindparam("alias"))
+            .values(
+                times_visited=urls.c.times_visited + bindparam("delta"),
+                last_visited=bindparam("visited_at")
+            )
+        )
+        db.execute(stmt, [
+            {"alias": alias, "delta": count, "visited_at": visited_at}
+            for alias, (count, visited_at) in visits.items()
+        ])
         db.commit()
-        return deleted_aliases
 
+    def get_by_long_url(self, long_url: str, db: Session):
+        return db.query(ShortUrl).filter(ShortUrl.longUrlHash == long_url_hash(long_url)).first()
 
-    def delete_unused_for_days(self, db: Session, days: int = 10) -> list[str]:
-        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-        unused = db.query(ShortUrl).filter(ShortUrl.lastVisited <= cutoff).all()
+    def get_aliases_by_long_urls(self, long_urls: list[str], owner_id: int, db: Session) -> dict[str, str]:
+        """
+        Ищет действующие ссылки пользователя на те же (нормализованные) адреса одним запросом.
+        :return: хэш адреса -> alias
+        """
+        curr_time = datetime.now(timezone.utc)
+        rows = (
+            db.query(ShortUrl.longUrlHash, ShortUrl.shortUrl)
+            .filter(
+                ShortUrl.longUrlHash.in_({long_url_hash(url) for url in long_urls}),
+                ShortUrl.owner_id == owner_id,
+                (ShortUrl.expiresAt.is_(None)) | (ShortUrl.expiresAt > curr_time)
+            )
+            .order_by(ShortUrl.id.desc())
+            .all()
+        )
+        # При нескольких совпадениях остаётся самая старая ссылка
+        return {row.longUrlHash: row.shortUrl for row in rows}
 
-        deleted_aliases = []
-        for entry in unused:
-            self.move_to_expired(entry, db)
-            deleted_aliases.append(entry.shortUrl)
-            db.delete(entry)
+    def get_short_url_page(self, db: Session, after_id: int = 0, limit: int = 10_000) -> list[tuple[int, str]]:
+        rows = (
+            db.query(ShortUrl.id, ShortUrl.shortUrl)
+            .filter(ShortUrl.id > after_id)
+            .order_by(ShortUrl.id)
+            .limit(limit)
+            .all()
+        )
+        return [(row.id, row.shortUrl) for row in rows]
+
+    def get_urls_page(self, db: Session, after_id: int = 0, limit: int = 1000) -> list:
+        """
+        Страница ссылок по возрастанию id для выгрузки: keyset-пагинация вместо OFFSET,
+        каждая страница — один проход по индексу первичного ключа.
+        """
+        return self._page(ShortUrl, db, after_id, limit)
+
+    def get_expired_urls_page(self, db: Session, after_id: int = 0, limit: int = 1000) -> list:
+        return self._page(ExpiredUrl, db, after_id, limit)
+
+    def get_owner_urls_page(self, owner_id: int, db: Session, after_id: int = 0, limit: int = 50) -> list:
+        """
+        Страница ссылок пользователя по возрастанию id — один проход по индексу (owner_id, id).
+        """
+        return self._page(ShortUrl, db, after_id, limit, ShortUrl.owner_id == owner_id)
 
+    def get_archivable_chunk(self, db: Session, cutoff: datetime, limit: int = 5000) -> list[ExpiredUrl]:
+        """
+        Самые старые по id записи архива, удалённые не позже cutoff, — порция для выгрузки в холодный архив.
+        """
+        return (
+            db.query(ExpiredUrl)
+            .filter(ExpiredUrl.deletedAt <= cutoff)
+            .order_by(ExpiredUrl.id)
+            .limit(limit)
+            .all()
+        )
+
+    def delete_expired_records(self, ids: list[int], db: Session) -> int:
+        expired = ExpiredUrl.__table__
+        deleted = db.execute(expired.delete().where(expired.c.id.in_(ids))).rowcount
         db.commit()
-        return deleted_aliases
+        return deleted
 
-    def get_by_long_url(self, long_url: str, db: Session):
-        return db.query(ShortUrl).filter(ShortUrl.longUrl == long_url).first()
-    
-    def move_to_expired(self, entry: ShortUrl, db: Session):
+    def _archive_chunk(self, condition, db: Session, limit: int) -> list[str]:
+        # DELETE ... RETURNING отдаёт ровно удалённые строки, их же и архивируем — без гонки с обновлениями
+        urls = ShortUrl.__table__
+        expired = ExpiredUrl.__table__
+        chunk = select(urls.c.id).where(condition).limit(limit)
+        rows = db.execute(
+            urls.delete().where(urls.c.id.in_(chunk)).returning(*(urls.c[name] for name in RECORD_COLUMNS))
+        ).all()
+        if rows:
+            deleted_at = datetime.now(timezone.utc)
+            db.execute(expired.insert(), [
+                {
+                    "shortUrl": row.short_url,
+                    "longUrl": row.long_url,
+                    "timesVisited": row.times_visited,
+                    "createdAt": row.created_at,
+                    "lastVisited": row.last_visited,
+                    "expiresAt": row.expires_at,
+                    "deletedAt": deleted_at,
+                    "owner_id": row.owner_id
+                }
+                for row in rows
+            ])
+        db.commit()
+        return [row.short_url for row in rows]
+
+    @staticmethod
+    def _drain(delete_chunk, chunk_size: int) -> list[str]:
+        deleted_aliases = []
+        while True:
+            aliases = delete_chunk()
+            deleted_aliases.extend(aliases)
+            if len(aliases) < chunk_size:
+                return deleted_aliases
+
+    @staticmethod
+    def _page(model, db: Session, after_id: int, limit: int, *conditions) -> list:
+        # Только колонки, без ORM-объектов: страницы не копятся в identity map сессии
+        return db.execute(
+            select(*(getattr(model, attr.key) for attr in inspect(model).column_attrs))
+            .where(model.id > after_id, *conditions)
+            .order_by(model.id)
+            .limit(limit)
+        ).all()
+
+    @staticmethod
+    def _insert(db: Session):
+        # ON CONFLICT есть в обоих диалектах, но конструкторы запросов у них разные
+        return postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+
+    @staticmethod
+    def _owned_by(user_id: int | None):
+        urls = ShortUrl.__table__
+        if user_id is None:
+            return urls.c.owner_id.is_(None)
+        return or_(urls.c.owner_id.is_(None), urls.c.owner_id == user_id)
+
+    def move_to_expired(self, entry: ShortUrl | ShortUrlRecord, db: Session):
         archived = ExpiredUrl(
             shortUrl=entry.shortUrl,
             longUrl=entry.longUrl,
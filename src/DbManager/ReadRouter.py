@@ -0,0 +1,58 @@
+from typing import Iterable
+
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from Database.engine import has_replica
+from Database.main_db import AsyncSessionLocal, AsyncReadSessionLocal
+from Database.redis import get_async_redis_client
+
+
+class ReadRouter:
+    """
+    Выбирает, откуда читать: с реплики или с основной БД.
+    После записи ссылка и её владелец на window секунд «прикрепляются» к основной БД через метки в Redis,
+    поэтому пользователь сразу видит свои изменения, даже если реплика отстаёт.
+    Без DATABASE_REPLICA_URL отставания нет и метки не ставятся.
+    :param window: Сколько секунд после записи читать с основной БД
+    """
+    KEY_PREFIX = "ryw:"
+    WINDOW = 5
+
+    def __init__(self, window: int = WINDOW, enabled: bool | None = None):
+        self.redis = get_async_redis_client()
+        self.window = window
+        self.enabled = has_replica() if enabled is None else enabled
+
+    async def mark_written(self, aliases: Iterable[str] = (), user_id: int | None = None):
+        if not self.enabled:
+            return
+        keys = self._keys(aliases, user_id)
+        if not keys:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.set(key, 1, ex=self.window)
+                await pipe.execute()
+        except RedisError as e:
+            print(f"[ReadRouter] Failed to mark writes: {e}")
+
+    async def session_factory(self, alias: str | None = None, user_id: int | None = None) -> async_sessionmaker:
+        if not self.enabled:
+            return AsyncReadSessionLocal
+        keys = self._keys([alias] if alias else (), user_id)
+        if not keys:
+            return AsyncReadSessionLocal
+        try:
+            pinned = await self.redis.exists(*keys)
+        except RedisError:
+            # Не знаем, была ли недавняя запись, — читаем с основной БД
+            pinned = True
+        return AsyncSessionLocal if pinned else AsyncReadSessionLocal
+
+    def _keys(self, aliases: Iterable[str], user_id: int | None) -> list[str]:
+        keys = [f"{self.KEY_PREFIX}url:{alias}" for alias in aliases]
+        if user_id is not None:
+            keys.append(f"{self.KEY_PREFIX}user:{user_id}")
+        return keys
@@ -1,58 +1,213 @@
 from Database.redis import get_redis_client
 from Database.main_db import ShortUrl
+from DataClasses.ShortUrlRecord import ShortUrlRecord, parse_dt
 from datetime import datetime, timezone
 import json
+import math
+
+KEY_PREFIX = "url:"
+# ZSET alias -> момент истечения (unix time), по нему ссылки снимаются точно в срок
+EXPIRY_KEY = "links:expiry"
+
+# Возвращает {longUrl, expiresAt} и сразу учитывает переход — редирект стоит одну команду Redis
+RESOLVE_SCRIPT = """
+local url = redis.call('HGET', KEYS[1], 'longUrl')
+if not url then
+    return false
+end
+redis.call('HINCRBY', KEYS[1], 'timesVisited', 1)
+redis.call('HSET', KEYS[1], 'lastVisited', ARGV[1])
+return {url, redis.call('HGET', KEYS[1], 'expiresAt')}
+"""
+
+# Атомарно забирает из расписания наступившие истечения, чтобы каждую ссылку снял только один воркер
+CLAIM_EXPIRED_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+end
+return due
+"""
+
+# Добавляет пачку переходов только к существующим записям, чтобы не создавать неполные хэши без TTL
+RECORD_VISITS_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('HINCRBY', key, 'timesVisited', ARGV[i * 2 - 1])
+        redis.call('HSET', key, 'lastVisited', ARGV[i * 2])
+    end
+end
+return true
+"""
+
+
+# Меняет адрес и срок в существующей записи, не трогая счётчики: в хэше могут быть переходы,
+# которые ещё не дошли до БД, и запись строки из БД их бы затёрла
+UPDATE_LINK_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HSET', KEYS[1], 'longUrl', ARGV[1], 'expiresAt', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+def as_utc(dt: datetime) -> datetime:
+    # Даты из SQLite приходят без часового пояса, но хранятся в UTC
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def format_dt(dt: datetime | None) -> str | None:
+    if not dt:
+        return None
+    return as_utc(dt).isoformat().replace("+00:00", "Z")
+
+
+def cache_key(alias: str) -> str:
+    return KEY_PREFIX + alias
+
+
+def to_redis_hash(short_url: ShortUrl | ShortUrlRecord) -> dict:
+    # В хэше нельзя хранить None — отсутствующие даты пишем пустой строкой
+    return {
+        "shortUrl": short_url.shortUrl,
+        "longUrl": short_url.longUrl,
+        "timesVisited": short_url.timesVisited or 0,
+        "createdAt": format_dt(short_url.createdAt) or "",
+        "lastVisited": format_dt(short_url.lastVisited) or "",
+        "expiresAt": format_dt(short_url.expiresAt) or ""
+    }
+
+
+def cache_ttl(short_url: ShortUrl | ShortUrlRecord, live_time: int) -> int:
+    """
+    TTL записи в кэше: не больше live_time и не дольше оставшегося срока жизни ссылки.
+    """
+    if not short_url.expiresAt:
+        return live_time
+    remaining = (as_utc(short_url.expiresAt) - datetime.now(timezone.utc)).total_seconds()
+    return min(live_time, math.ceil(remaining))
+
+
+def queue_save(pipe, short_url: ShortUrl | ShortUrlRecord, live_time: int):
+    """
+    Добавляет в пайплайн запись ссылки в кэш и в расписание истечения; истёкшие ссылки не кэшируются.
+    """
+    key = cache_key(short_url.shortUrl)
+    ttl = cache_ttl(short_url, live_time)
+    if ttl <= 0:
+        pipe.delete(key)
+        pipe.zrem(EXPIRY_KEY, short_url.shortUrl)
+        return
+    pipe.hset(key, mapping=to_redis_hash(short_url))
+    pipe.expire(key, ttl)
+    if short_url.expiresAt:
+        pipe.zadd(EXPIRY_KEY, {short_url.shortUrl: as_utc(short_url.expiresAt).timestamp()})
+
+
+def from_redis_hash(data: dict) -> ShortUrlRecord:
+    # Даты остаются строками и разбираются, только если к ним обратятся
+    return ShortUrlRecord(
+        shortUrl=data["shortUrl"],
+        longUrl=data["longUrl"],
+        timesVisited=int(data.get("timesVisited") or 0),
+        createdAt=data.get("createdAt"),
+        lastVisited=data.get("lastVisited"),
+        expiresAt=data.get("expiresAt")
+    )
+
+
+def visits_to_args(visits: dict[str, tuple[int, datetime]]) -> tuple[list[str], list]:
+    keys, args = [], []
+    for alias, (count, visited_at) in visits.items():
+        keys.append(cache_key(alias))
+        args.extend([count, format_dt(visited_at)])
+    return keys, args
+
+
+def deserialize_short_url(serialized: str) -> ShortUrl:
+    """
+    Разбирает запись в старом JSON-формате (до перехода на хэши), используется миграцией.
+    """
+    data = json.loads(serialized)
+    return ShortUrl(
+        shortUrl=data["shortUrl"],
+        longUrl=data["longUrl"],
+        timesVisited=data["timesVisited"],
+        createdAt=parse_dt(data["createdAt"]),
+        lastVisited=parse_dt(data["lastVisited"]),
+        expiresAt=parse_dt(data["expiresAt"])
+    )
+
 
 class RedisDbManager:
     LIVE_TIME = 60 * 60 * 12
 
     def __init__(self):
         self.redis = get_redis_client()
+        self._resolve = self.redis.register_script(RESOLVE_SCRIPT)
+        self._record_visits = self.redis.register_script(RECORD_VISITS_SCRIPT)
 
-    def save(self, short_url: ShortUrl):
-
-        def format_dt(dt: datetime | None) -> str | None:
-            if not dt:
-                return None
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=timezone.utc)
-            return dt.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
-
-        data = {
-            "shortUrl": short_url.shortUrl,
-            "longUrl": short_url.longUrl,
-            "timesVisited": short_url.timesVisited,
-            "createdAt": format_dt(short_url.createdAt),
-            "lastVisited": format_dt(short_url.lastVisited),
-            "expiresAt": format_dt(short_url.expiresAt)
-        }
-        serialized = json.dumps(data)
-        self.redis.set(short_url.shortUrl, serialized)
-        self.redis.expire(short_url.shortUrl, self.LIVE_TIME)
+    def save(self, short_url: ShortUrl | ShortUrlRecord):
+        pipe = self.redis.pipeline()
+        queue_save(pipe, short_url, self.LIVE_TIME)
+        pipe.execute()
+
+    def save_many(self, short_urls: list[ShortUrl | ShortUrlRecord]):
+        pipe = self.redis.pipeline(transaction=False)
+        for short_url in short_urls:
+            queue_save(pipe, short_url, self.LIVE_TIME)
+        pipe.execute()
 
     def get(self, short_url: str):
-        serialized = self.redis.get(short_url)
-        if not serialized:
+        data = self.redis.hgetall(cache_key(short_url))
+        if not data:
+            return None
+        return from_redis_hash(data)
+
+    def resolve(self, short_url: str) -> ShortUrlRecord | None:
+        result = self._resolve(keys=[cache_key(short_url)], args=[format_dt(datetime.now(timezone.utc))])
+        if not result:
             return None
-        
-        data = json.loads(serialized)
-        
-        # Создание объекта ShortUrl
-        def parse_dt(iso_str: str | None) -> datetime | None:
-            if not iso_str:
-                return None
-            if iso_str.endswith("Z"):
-                iso_str = iso_str.replace("Z", "+00:00")
-            return datetime.fromisoformat(iso_str).astimezone(timezone.utc)
-
-        return ShortUrl(
-            shortUrl=data["shortUrl"],
-            longUrl=data["longUrl"],
-            timesVisited=data["timesVisited"],
-            createdAt=parse_dt(data["createdAt"]),
-            lastVisited=parse_dt(data["lastVisited"]),
-            expiresAt=parse_dt(data["expiresAt"])
-        )
-    
-    def delete(self, short_url: str):
-        self.redis.delete(short_url)
\ No newline at end of file
+        long_url, expires_at = result
+        return ShortUrlRecord(shortUrl=short_url, longUrl=long_url, expiresAt=expires_at)
+
+    def record_visits(self, visits: dict[str, tuple[int, datetime]]):
+        if visits:
+            keys, args = visits_to_args(visits)
+            self._record_visits(keys=keys, args=args)
+
+    def delete(self, *short_urls: str):
+        if short_urls:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.delete(*(cache_key(alias) for alias in short_urls))
+            pipe.zrem(EXPIRY_KEY, *short_urls)
+            pipe.execute()
+
+    def migrate_json_records(self, batch_size: int = 500) -> int:
+        """
+        Переносит записи старого формата (строка JSON под ключом alias) в хэши url:{alias}, сохраняя остаток TTL.
+        """
+        migrated = 0
+        for key in self.redis.scan_iter(count=batch_size, _type="string"):
+            if ":" in key:
+                continue
+            serialized = self.redis.get(key)
+            try:
+                short_url = deserialize_short_url(serialized)
+            except (TypeError, ValueError, KeyError):
+                continue
+
+            ttl = self.redis.pttl(key)
+            new_key = cache_key(short_url.shortUrl)
+            pipe = self.redis.pipeline()
+            pipe.hset(new_key, mapping=to_redis_hash(short_url))
+            if ttl > 0:
+                pipe.pexpire(new_key, ttl)
+            else:
+                pipe.expire(new_key, self.LIVE_TIME)
+            pipe.delete(key)
+            pipe.execute()
+            migrated += 1
+        return migrated
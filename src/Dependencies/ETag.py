@@ -0,0 +1,20 @@
+from hashlib import blake2b
+
+from fastapi import Request
+from pydantic import BaseModel
+
+
+def etag_for(model: BaseModel) -> str:
+    return '"' + blake2b(model.model_dump_json().encode(), digest_size=16).hexdigest() + '"'
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """
+    Совпадает ли ETag с одним из If-None-Match запроса (слабое сравнение, как для GET).
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in {tag.strip().removeprefix("W/") for tag in header.split(",")}
@@ -0,0 +1,65 @@
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+COMPRESSIONS = ("gzip", "zstd")
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def to_ndjson(records: list[dict]) -> bytes:
+    return "".join(json.dumps(record, default=_default, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+
+
+def make_compressor(compression: str | None):
+    """
+    Потоковый компрессор с методами compress/flush или None, если сжатие не запрошено.
+    :param compression: gzip, zstd или None
+    """
+    if compression is None:
+        return None
+    if compression == "gzip":
+        # wbits=31 — zlib-поток с заголовком gzip
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if compression == "zstd":
+        if zstandard is None:
+            raise HTTPException(status_code=400, detail="zstd compression is not available")
+        return zstandard.ZstdCompressor().compressobj()
+    raise HTTPException(status_code=400, detail=f"Unsupported compression: {compression}")
+
+
+async def encode_pages(pages: AsyncIterable[list[dict]], compressor=None) -> AsyncIterator[bytes]:
+    """
+    Превращает страницы записей в куски NDJSON, в памяти держится не больше одной страницы.
+    """
+    async for page in pages:
+        chunk = to_ndjson(page)
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def ndjson_response(pages: AsyncIterable[list[dict]], compression: str | None = None) -> StreamingResponse:
+    """
+    Потоковая выгрузка NDJSON. Сжатый поток помечается Content-Encoding, клиенты распаковывают его сами.
+    """
+    compressor = make_compressor(compression)
+    headers = {"Content-Encoding": compression} if compression else None
+    return StreamingResponse(encode_pages(pages, compressor), media_type=NDJSON_MEDIA_TYPE, headers=headers)
@@ -8,19 +8,35 @@ from fastapi import Request
 from contextlib import asynccontextmanager
 import asyncio
 
-from router.UrlRouter import router
-from router.AuthRouter import router as auth_router
+from router.UrlRouter import router, url_service
+from router.AuthRouter import router as auth_router, auth_service
 from Cleaner.cleaner import periodic_expired_cleanup
+from Cleaner.LeaseLock import RedisLeaseLock
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Запуск фоновой задачи
-    task = asyncio.create_task(periodic_expired_cleanup(3600))
+    # Запуск фоновой задачи: очистку выполняет только воркер-лидер во всём кластере
+    cleaner_lease = RedisLeaseLock("cleaner")
+    task = asyncio.create_task(cleaner_lease.run(lambda: periodic_expired_cleanup(url_service, 3600, lease=cleaner_lease)))
     print("[Lifespan] Background cleaner started.")
+    url_service.cache_invalidator.start()
+    auth_service.invalidator.start()
+    visit_flusher = asyncio.create_task(url_service.visit_buffer.run())
+    expiry_task = asyncio.create_task(url_service.expiry_scheduler.run())
+    prewarm_task = asyncio.create_task(url_service.run_prewarm())
     yield
     # Здесь можно завершить задачу по shutdown, если надо
     task.cancel()
+    expiry_task.cancel()
+    prewarm_task.cancel()
+    # Дожидаемся освобождения аренды, чтобы другой воркер сразу подхватил очистку
+    await asyncio.gather(task, return_exceptions=True)
     print("[Lifespan] Shutting down cleaner.")
+    await url_service.cache_invalidator.stop()
+    await auth_service.invalidator.stop()
+    # Сбрасываем накопленные переходы перед остановкой воркера
+    visit_flusher.cancel()
+    await asyncio.gather(visit_flusher, return_exceptions=True)
 
 app = FastAPI(lifespan=lifespan)
 
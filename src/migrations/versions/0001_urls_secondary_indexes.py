@@ -0,0 +1,44 @@
+"""Индексы urls по expires_at, last_visited и owner_id
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Очистка ищет по диапазонам дат, проверки владельца — по owner_id
+INDEXES = {
+    "ix_urls_expires_at": "expires_at",
+    "ix_urls_last_visited": "last_visited",
+    "ix_urls_owner_id": "owner_id",
+}
+
+
+def existing_indexes(table: str) -> set[str]:
+    inspector = sa.inspect(op.get_bind())
+    if table not in inspector.get_table_names():
+        return set()
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    # Свежая БД уже создана create_all со всеми индексами — ревизия идемпотентна
+    if not sa.inspect(op.get_bind()).has_table("urls"):
+        return
+    present = existing_indexes("urls")
+    for name, column in INDEXES.items():
+        if name not in present:
+            op.create_index(name, "urls", [column])
+
+
+def downgrade():
+    present = existing_indexes("urls")
+    for name in INDEXES:
+        if name in present:
+            op.drop_index(name, table_name="urls")
@@ -0,0 +1,55 @@
+"""Колонка long_url_hash с индексом для поиска по оригинальной ссылке
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from Database.main_db import long_url_hash
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+BACKFILL_CHUNK = 1000
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("urls"):
+        return
+
+    if "long_url_hash" not in {column["name"] for column in inspector.get_columns("urls")}:
+        op.add_column("urls", sa.Column("long_url_hash", sa.String(64), nullable=True))
+    if "ix_urls_long_url_hash" not in {index["name"] for index in inspector.get_indexes("urls")}:
+        op.create_index("ix_urls_long_url_hash", "urls", ["long_url_hash"])
+
+    # Заполняем хэши порциями по первичному ключу
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.text(
+                "SELECT id, long_url FROM urls WHERE id > :last_id AND long_url_hash IS NULL "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BACKFILL_CHUNK}
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            sa.text("UPDATE urls SET long_url_hash = :hash WHERE id = :id"),
+            [{"id": row.id, "hash": long_url_hash(row.long_url)} for row in rows]
+        )
+        last_id = rows[-1].id
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if "ix_urls_long_url_hash" in {index["name"] for index in inspector.get_indexes("urls")}:
+        op.drop_index("ix_urls_long_url_hash", table_name="urls")
+    with op.batch_alter_table("urls") as batch:
+        batch.drop_column("long_url_hash")
@@ -0,0 +1,40 @@
+"""Составной индекс urls (owner_id, id) для постраничного списка ссылок пользователя
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# Страница «мои ссылки» — WHERE owner_id = ? AND id > ? ORDER BY id: один проход по составному индексу.
+# Одиночный индекс по owner_id покрывается его префиксом и больше не нужен
+OWNER_INDEX = "ix_urls_owner_id_id"
+OLD_OWNER_INDEX = "ix_urls_owner_id"
+
+
+def existing_indexes() -> set[str]:
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("urls")}
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table("urls"):
+        return
+    present = existing_indexes()
+    if OWNER_INDEX not in present:
+        op.create_index(OWNER_INDEX, "urls", ["owner_id", "id"])
+    if OLD_OWNER_INDEX in present:
+        op.drop_index(OLD_OWNER_INDEX, table_name="urls")
+
+
+def downgrade():
+    present = existing_indexes()
+    if OLD_OWNER_INDEX not in present:
+        op.create_index(OLD_OWNER_INDEX, "urls", ["owner_id"])
+    if OWNER_INDEX in present:
+        op.drop_index(OWNER_INDEX, table_name="urls")
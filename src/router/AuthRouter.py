@@ -1,11 +1,14 @@
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.security import OAuth2PasswordRequestForm
+from typing import Literal
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from starlette.concurrency import iterate_in_threadpool
 from sqlalchemy.orm import Session
 
-from Database.main_db import SessionLocal
+from Database.main_db import SessionLocal, ReadSessionLocal
 from DataClasses.DataClasses import UserCreateDC, TokenDC
 from service.AuthService import AuthService
+from Export.NdjsonStream import ndjson_response
 from Dependencies.AuthScheme import optional_oauth2_scheme
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -18,12 +21,19 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 @router.post("/register", response_model=TokenDC)
 def register(user: UserCreateDC, db: Session = Depends(get_db)):
     return auth_service.register_user(user, db)
 
 @router.post("/login", response_model=TokenDC)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_read_db)):
     user_data = UserCreateDC(email=form_data.username, password=form_data.password)
     return auth_service.login_user(user_data, db)
 
@@ -48,5 +58,5 @@ def check_token(token: str = Depends(optional_oauth2_scheme)):
         return {"valid": False}
 
 @router.get("/admin/users")
-def get_all_users(db: Session = Depends(get_db)):
-    return auth_service.get_all_users(db)
\ No newline at end of file
+def get_all_users(compression: Literal["gzip", "zstd"] | None = None):
+    return ndjson_response(iterate_in_threadpool(auth_service.iter_users(ReadSessionLocal)), compression)
\ No newline at end of file
@@ -1,19 +1,29 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from Dependencies.AuthScheme import optional_oauth2_scheme
-from Database.main_db import User
+from Dependencies.ETag import etag_for, not_modified
+from DataClasses.UserIdentity import UserIdentity
 from sqlalchemy.orm import Session
 
 from Database.main_db import SessionLocal
-from fastapi.responses import RedirectResponse
-from DataClasses.DataClasses import LongUrlDC, CreateShortUrlDC, ShortUrlDC, ShortUrlStatsDC, UpdateUrlDC
+from fastapi.responses import RedirectResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from datetime import date, datetime
+from typing import Literal
+from DataClasses.DataClasses import (
+    LongUrlDC, CreateShortUrlDC, ShortUrlDC, ShortUrlStatsDC, UpdateUrlDC, ShortenResultDC, UserLinksPageDC, TopLinkDC,
+    ResolveResultDC, StatsResultDC
+)
 from service.UrlService import UrlService
-from service.AuthService import AuthService
+from Analytics.UniqueVisitors import visitor_fingerprint
+from router.AuthRouter import auth_service
+from Export.NdjsonStream import ndjson_response, NDJSON_MEDIA_TYPE
 
 router = APIRouter()
 url_service = UrlService()
-auth_service = AuthService()
 
 def get_db():
+    # Пользователь по токену читается с основной БД: с отстающей реплики в кэш могла бы попасть
+    # уже деактивированная учётная запись. Сессия открывает соединение только при промахе кэша
     db = SessionLocal()
     try:
         yield db
@@ -24,7 +34,7 @@ def get_db():
 def get_current_user_or_none(
     token: str = Depends(optional_oauth2_scheme),
     db: Session = Depends(get_db)
-) -> User | None:
+) -> UserIdentity | None:
     if not token:
         return None
     try:
@@ -35,43 +45,105 @@ def get_current_user_or_none(
 @router.post("/links/shorten", response_model=ShortUrlDC)
 async def shorten_url(
     create_dto: CreateShortUrlDC,
-    user: User = Depends(get_current_user_or_none)
+    user: UserIdentity | None = Depends(get_current_user_or_none)
 ):
-    return url_service.make_short_url(create_dto, user)
+    return await url_service.make_short_url(create_dto, user)
+
+@router.post("/links/shorten/batch", response_model=list[ShortenResultDC])
+async def shorten_urls_batch(
+    create_dtos: list[CreateShortUrlDC],
+    user: UserIdentity | None = Depends(get_current_user_or_none)
+):
+    return await url_service.make_short_urls(create_dtos, user)
+
+@router.post("/links/resolve", response_model=list[ResolveResultDC])
+async def resolve_urls(aliases: list[str]):
+    return await url_service.resolve_many(aliases)
+
+@router.post("/links/stats/batch", response_model=list[StatsResultDC])
+async def get_urls_stats_batch(aliases: list[str]):
+    return await url_service.get_many_stats(aliases)
 
 @router.get("/links/search", response_model=ShortUrlDC)
 async def search_by_original_url(original_url: str):
-    return url_service.find_by_original_url(original_url)
+    return await url_service.find_by_original_url(original_url)
+
+@router.get("/links/mine", response_model=UserLinksPageDC)
+async def get_my_links(
+    cursor: int = Query(0, ge=0),
+    limit: int | None = Query(None, ge=1),
+    user: UserIdentity | None = Depends(get_current_user_or_none)
+):
+    if user is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return await url_service.get_user_links(user.id, cursor, limit)
 
 @router.get("/links/{short_url}")
-async def get_full_url(short_url: str):
-    long_url = url_service.get_full_url(short_url)
+async def get_full_url(short_url: str, request: Request):
+    visitor = visitor_fingerprint(request.client.host if request.client else None, request.headers.get("user-agent"))
+    long_url = await url_service.get_full_url(short_url, visitor)
     if not long_url:
         raise HTTPException(status_code=404, detail="URL not found")
     return RedirectResponse(url=long_url, status_code=302)
 
 @router.get("/links/{short_url}/stats", response_model=ShortUrlStatsDC)
-async def get_url_stats(short_url: str):
-    return url_service.get_short_url_stats(short_url)
+async def get_url_stats(
+    short_url: str,
+    request: Request,
+    response: Response,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    granularity: Literal["minute", "hour", "day"] = "hour"
+):
+    stats = await url_service.get_short_url_stats(short_url, since, until, granularity)
+    # Опрашивающие дашборды получают 304, пока статистика не изменилась
+    headers = {"ETag": etag_for(stats), "Cache-Control": f"private, max-age={int(url_service.STATS_FRESHNESS)}"}
+    if not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return stats
 
 @router.delete("/links/{short_url}", response_model=LongUrlDC)
-async def delete_url(short_url: str, user: User = Depends(get_current_user_or_none)):
-    success = url_service.delete_by_short_url(short_url, user)
+async def delete_url(short_url: str, user: UserIdentity | None = Depends(get_current_user_or_none)):
+    success = await url_service.delete_by_short_url(short_url, user)
     if not success:
         raise HTTPException(status_code=404, detail="URL not found or not allowed")
     return LongUrlDC(url="Deleted")
 
 @router.put("/links/{short_url}", response_model=LongUrlDC)
-async def update_url(short_url: str, dto: UpdateUrlDC, user: User = Depends(get_current_user_or_none)):
-    updated = url_service.update_long_url(short_url, dto.newUrl, user)
+async def update_url(short_url: str, dto: UpdateUrlDC, user: UserIdentity | None = Depends(get_current_user_or_none)):
+    updated = await url_service.update_long_url(short_url, dto.newUrl, user)
     if not updated:
         raise HTTPException(status_code=404, detail="URL not found or not updated")
     return LongUrlDC(url=dto.newUrl)
 
 @router.get("/admin/dump-db")
-async def dump_database():
-    return url_service.get_all_urls()
+async def dump_database(compression: Literal["gzip", "zstd"] | None = None):
+    return ndjson_response(url_service.iter_urls(), compression)
 
 @router.get("/admin/dump-expired")
-async def dump_expired_database():
-    return url_service.get_all_expired_urls()
\ No newline at end of file
+async def dump_expired_database(
+    archived: bool = False,
+    since: date | None = None,
+    until: date | None = None,
+    compression: Literal["gzip", "zstd"] | None = None
+):
+    if archived:
+        # Холодный архив отдаётся потоком NDJSON по дням удаления
+        return StreamingResponse(
+            iterate_in_threadpool(url_service.stream_archived_urls(since, until)),
+            media_type=NDJSON_MEDIA_TYPE
+        )
+    return ndjson_response(url_service.iter_expired_urls(), compression)
+
+@router.get("/admin/users/{user_id}/links", response_model=UserLinksPageDC)
+async def get_user_links(user_id: int, cursor: int = Query(0, ge=0), limit: int | None = Query(None, ge=1)):
+    return await url_service.get_user_links(user_id, cursor, limit)
+
+@router.get("/admin/top", response_model=list[TopLinkDC])
+async def top_links(window: Literal["5m", "1h", "1d"] = "1h", k: int = Query(100, ge=1, le=1000)):
+    return await url_service.get_top_links(window, k)
+
+@router.get("/admin/cache-stats")
+async def cache_stats():
+    return url_service.get_cache_stats()
\ No newline at end of file
@@ -0,0 +1,85 @@
+import asyncio
+import string
+
+from DataClasses.DataClasses import RESERVED_ALIASES
+from Database.redis import get_async_redis_client
+
+VALID_ALIAS_CHARS = string.ascii_letters + string.digits + "_"
+BASE = len(VALID_ALIAS_CHARS)
+
+
+def encode_alias(value: int) -> str:
+    """
+    Переводит номер в alias в системе счисления по алфавиту VALID_ALIAS_CHARS.
+    """
+    if value < 0:
+        raise ValueError("Alias id must be non-negative")
+    chars = []
+    while True:
+        value, digit = divmod(value, BASE)
+        chars.append(VALID_ALIAS_CHARS[digit])
+        if not value:
+            return "".join(reversed(chars))
+
+
+class AliasAllocator:
+    """
+    Выдаёт alias по глобальному счётчику без обращений к БД.
+    Воркер резервирует в Redis блок номеров одним INCRBY и раздаёт его из памяти,
+    длина alias растёт сама, когда номера перестают помещаться в текущую.
+    :param block_size: Сколько номеров воркер резервирует за одно обращение к Redis
+    """
+    COUNTER_KEY = "alias:counter"
+    BLOCK_SIZE = 1000
+    # Начинаем с первого шестисимвольного номера — alias той же длины, что и раньше
+    FIRST_ID = BASE ** 5
+
+    def __init__(self, block_size: int = BLOCK_SIZE):
+        self.redis = get_async_redis_client()
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    async def allocate(self) -> str:
+        while True:
+            async with self._lock:
+                if self._next >= self._end:
+                    await self._reserve_block()
+                value = self._next
+                self._next += 1
+            alias = encode_alias(value)
+            # Номер, совпавший с зарезервированным путём, просто пропускается
+            if alias not in RESERVED_ALIASES:
+                return alias
+
+    async def allocate_many(self, count: int) -> list[str]:
+        """
+        Выдаёт сразу count alias: остаток текущего блока плюс не более одного нового резерва.
+        """
+        async with self._lock:
+            values = list(range(self._next, min(self._end, self._next + count)))
+            self._next += len(values)
+            missing = count - len(values)
+            if missing:
+                await self._reserve_block(max(missing, self.block_size))
+                values.extend(range(self._next, self._next + missing))
+                self._next += missing
+        aliases = [encode_alias(value) for value in values]
+        if RESERVED_ALIASES.intersection(aliases):
+            aliases = [alias for alias in aliases if alias not in RESERVED_ALIASES]
+            aliases += await self.allocate_many(count - len(aliases))
+        return aliases
+
+    def skip_block(self):
+        """
+        Бросает остаток блока. Вызывается при конфликте alias: если счётчик в Redis был потерян,
+        так мы догоняем занятые номера блоками, а не по одному.
+        """
+        self._next = self._end
+
+    async def _reserve_block(self, size: int | None = None):
+        size = size or self.block_size
+        end = await self.redis.incrby(self.COUNTER_KEY, size)
+        self._end = self.FIRST_ID + end
+        self._next = self._end - size
@@ -1,4 +1,5 @@
 import uuid
+from typing import Callable, Iterator
 from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
@@ -7,17 +8,27 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 
-from Database.main_db import User
+from Database.main_db import User, SessionLocal
 from DataClasses.DataClasses import UserCreateDC, TokenDC
+from DataClasses.UserIdentity import UserIdentity
 from Database.redis import get_redis_client
+from Cache.LocalCache import LocalCache
+from Cache.AuthInvalidator import AuthInvalidator
 
 class AuthService:
     SECRET_KEY = "your_secret_key"
     ALGORITHM = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
+    DUMP_PAGE_SIZE = 1000
+    IDENTITY_CACHE_SIZE = 10_000
+    IDENTITY_CACHE_TTL = 60
 
     def __init__(self):
         self.redis = get_redis_client()
+        # jti -> UserIdentity: повторные запросы с тем же токеном не ходят ни в Redis, ни в БД
+        self.identity_cache = LocalCache(self.IDENTITY_CACHE_SIZE, self.IDENTITY_CACHE_TTL)
+        self.invalidator = AuthInvalidator(self.identity_cache, self.redis)
+        self.invalidator.on_event(AuthInvalidator.DEACTIVATED_CHANNEL, self._forget_user)
 
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -50,17 +61,19 @@ class AuthService:
         return TokenDC(access_token=token)
 
     def login_user(self, user_data: UserCreateDC, db: Session) -> TokenDC:
-        user = db.query(User).filter(User.email == user_data.email).first()
+        user = self._find_by_email(user_data.email, db)
         if not user or not self.verify_password(user_data.password, user.password_hash):
             raise HTTPException(status_code=401, detail="Invalid credentials")
+        if not user.is_active:
+            raise HTTPException(status_code=403, detail="User is deactivated")
 
         token = self.create_access_token({"sub": user.email})
         return TokenDC(access_token=token)
     
-    def get_current_user(self, token: str, db: Session) -> User:
-        if self.is_token_blacklisted(token):
-            raise HTTPException(status_code=401, detail="Token is blacklisted (logged out)")
-
+    def get_current_user(self, token: str, db: Session) -> UserIdentity:
+        """
+        :param db: Сессия основной БД — при промахе кэша пользователь читается из неё
+        """
         try:
             payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
             email: str = payload.get("sub")
@@ -69,9 +82,33 @@ class AuthService:
         except JWTError:
             raise HTTPException(status_code=401, detail="Invalid token")
 
+        jti = payload.get("jti")
+        identity = self.identity_cache.get(jti) if jti else None
+        if identity is None:
+            if self.is_token_blacklisted(token):
+                raise HTTPException(status_code=401, detail="Token is blacklisted (logged out)")
+
+            user = self._find_by_email(email, db)
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
+            identity = UserIdentity(user.id, user.email, bool(user.is_active))
+            if jti:
+                # Запись не переживает сам токен
+                self.identity_cache.set(jti, identity, payload["exp"] - datetime.now(timezone.utc).timestamp())
+
+        if not identity.is_active:
+            raise HTTPException(status_code=403, detail="User is deactivated")
+        return identity
+
+    def _find_by_email(self, email: str, db: Session) -> User | None:
+        """
+        Поиск пользователя; при промахе на реплике перечитывает с основной БД —
+        только что зарегистрированный пользователь может ещё не дойти до реплики.
+        """
         user = db.query(User).filter(User.email == email).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        if user is None and db.info.get("replica"):
+            with SessionLocal() as primary:
+                user = primary.query(User).filter(User.email == email).first()
         return user
 
     def logout_token(self, token: str):
@@ -82,6 +119,22 @@ class AuthService:
             self.redis.set(f"blacklist:{token}", "true", ex=ttl)
         except JWTError:
             raise HTTPException(status_code=401, detail="Invalid token")
+        if payload.get("jti"):
+            self.invalidator.publish_sync(payload["jti"], AuthInvalidator.LOGOUT_CHANNEL)
+
+    def deactivate_user(self, user_id: int, db: Session):
+        """
+        Деактивирует пользователя и сбрасывает его токены из кэша во всех воркерах.
+        """
+        user = db.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user.is_active = False
+        db.commit()
+        self.invalidator.publish_sync(str(user_id), AuthInvalidator.DEACTIVATED_CHANNEL)
+
+    def _forget_user(self, user_id: str):
+        self.identity_cache.invalidate_where(lambda identity: str(identity.id) == user_id)
 
     def is_token_blacklisted(self, token: str) -> bool:
         return self.redis.exists(f"blacklist:{token}") == 1
@@ -89,8 +142,14 @@ class AuthService:
     def decode_token(self, token: str) -> dict:
         return jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
 
-    def get_all_users(self, db: Session) -> list[dict]:
-        users = db.query(User).all()
+    def get_users_page(self, db: Session, after_id: int = 0, limit: int = 1000) -> list[dict]:
+        users = (
+            db.query(User.id, User.email, User.is_active, User.created_at)
+            .filter(User.id > after_id)
+            .order_by(User.id)
+            .limit(limit)
+            .all()
+        )
         return [
             {
                 "id": u.id,
@@ -100,3 +159,19 @@ class AuthService:
             }
             for u in users
         ]
+
+    def iter_users(self, session_factory: Callable[[], Session]) -> Iterator[list[dict]]:
+        """
+        Все пользователи страницами по id; на каждую страницу открывается своя сессия.
+        :param session_factory: Фабрика сессий, например SessionLocal
+        """
+        after_id = 0
+        while True:
+            with session_factory() as db:
+                page = self.get_users_page(db, after_id, self.DUMP_PAGE_SIZE)
+            if not page:
+                return
+            yield page
+            if len(page) < self.DUMP_PAGE_SIZE:
+                return
+            after_id = page[-1]["id"]
@@ -1,229 +1,780 @@
 import base64
+import os
 import uuid
 import asyncio
 import random
-import string
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Iterator
 from fastapi.exceptions import HTTPException
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
-
-from DataClasses.DataClasses import LongUrlDC, CreateShortUrlDC, ShortUrlDC, ShortUrlStatsDC
-from Database.main_db import SessionLocal, User, ExpiredUrl
-from DbManager.MainDbManager import MainDbManager, ShortUrl
-from DbManager.RedisDbManager import RedisDbManager
-
-VALID_ALIAS_CHARS = string.ascii_letters + string.digits + "_"
+from sqlalchemy.ext.asyncio import AsyncSession
+from redis.exceptions import RedisError
+
+from DataClasses.DataClasses import (
+    LongUrlDC, CreateShortUrlDC, ShortUrlDC, ShortUrlStatsDC, ShortenResultDC, UserLinkDC, UserLinksPageDC,
+    ClickBucketDC, TopLinkDC, ResolveResultDC, StatsResultDC
+)
+from DataClasses.ShortUrlRecord import ShortUrlRecord
+from DataClasses.UserIdentity import UserIdentity
+from Database.main_db import AsyncSessionLocal, AsyncReadSessionLocal, ExpiredUrl, long_url_hash
+from DbManager.MainDbManager import ShortUrl
+from DbManager.AsyncMainDbManager import AsyncMainDbManager
+from DbManager.AsyncRedisDbManager import AsyncRedisDbManager
+from DbManager.RedisDbManager import as_utc
+from DbManager.ReadRouter import ReadRouter
+from Cache.LocalCache import LocalCache
+from Cache.CacheInvalidator import CacheInvalidator
+from Cache.BloomFilter import AliasBloomFilter
+from Analytics.VisitBuffer import VisitBuffer
+from Analytics.ClickRollup import ClickRollup
+from Analytics.UniqueVisitors import UniqueVisitors, WINDOWS
+from Analytics.TrendingLinks import TrendingLinks
+from Cleaner.ExpiryScheduler import ExpiryScheduler
+from Archive.ColdArchive import ColdArchive
+from service.AliasAllocator import AliasAllocator, VALID_ALIAS_CHARS
 
 
 class UrlService:
-    def __init__(self):
-        self.db_manager = MainDbManager()
-        self.redis_manager = RedisDbManager()
-
-    def make_short_url(self, create_short_info: CreateShortUrlDC, user: User | None = None) -> ShortUrlDC:
-        db = SessionLocal()
-        try:
-            alias = create_short_info.alias or self.create_alias(db)
-
-            # Если пользователь не авторизован — устанавливаем макс время жизни 12 часов
-            expires_at = create_short_info.expiresAt
-            if not user:
-                if expires_at:
-                    expires_at = min(datetime.now(timezone.utc) + timedelta(hours=12), expires_at)
-                else:
-                    expires_at = datetime.now(timezone.utc) + timedelta(hours=12)
+    LOCAL_CACHE_SIZE = 10_000
+    LOCAL_CACHE_TTL = 30
+    VISIT_FLUSH_INTERVAL = 5
+    VISIT_FLUSH_SIZE = 1000
+    NEGATIVE_CACHE_SIZE = 100_000
+    NEGATIVE_CACHE_TTL = 10
+    BLOOM_FILTER_ENABLED = True
+    BLOOM_FILTER_CAPACITY = 1_000_000
+    BLOOM_FILTER_ERROR_RATE = 0.01
+    BLOOM_FILTER_PAGE_SIZE = 10_000
+    ALIAS_BLOCK_SIZE = 1000
+    ALIAS_ATTEMPTS = 5
+    BATCH_MAX_SIZE = 10_000
+    BATCH_INSERT_CHUNK = 500
+    CLEANUP_CHUNK_SIZE = 1000
+    CLEANUP_CHUNK_PAUSE = 0
+    EXPIRY_POLL_INTERVAL = 1
+    EXPIRY_BATCH_SIZE = 500
+    ARCHIVE_AFTER_DAYS = 7
+    ARCHIVE_CHUNK_SIZE = 5000
+    DUMP_PAGE_SIZE = 1000
+    USER_LINKS_PAGE_SIZE = 50
+    USER_LINKS_PAGE_MAX = 500
+    STATS_DEFAULT_RANGE = timedelta(days=1)
+    # Сколько секунд воркер может отдавать статистику ссылки без повторного чтения, 0 — всегда читать заново
+    STATS_FRESHNESS = float(os.getenv("STATS_FRESHNESS", 2))
+    STATS_CACHE_SIZE = 10_000
+    TRENDING_SIZE = 10_000
+    PREWARM_WINDOW = "1h"
+    PREWARM_SIZE = 500
+    # Прогрев повторяется раньше, чем истекают прогретые записи локального кэша
+    PREWARM_INTERVAL = LOCAL_CACHE_TTL * 2 // 3
+    BULK_LOOKUP_MAX_SIZE = 1000
 
-
-            short_url = ShortUrl(
-                shortUrl=alias,
-                longUrl=create_short_info.url,
-                expiresAt=expires_at,
+    def __init__(self):
+        self.db_manager = AsyncMainDbManager()
+        self.redis_manager = AsyncRedisDbManager()
+        self.read_router = ReadRouter()
+        self.alias_allocator = AliasAllocator(self.ALIAS_BLOCK_SIZE)
+        self.local_cache = LocalCache(self.LOCAL_CACHE_SIZE, self.LOCAL_CACHE_TTL)
+        self.cold_archive = ColdArchive()
+        self.expiry_scheduler = ExpiryScheduler(
+            self.redis_manager, self.expire_links, self.EXPIRY_POLL_INTERVAL, self.EXPIRY_BATCH_SIZE
+        )
+        self.cache_invalidator = CacheInvalidator(self.local_cache)
+        self.click_rollup = ClickRollup()
+        self.unique_visitors = UniqueVisitors()
+        self.trending = TrendingLinks(self.TRENDING_SIZE)
+        self.visit_buffer = VisitBuffer(
+            self.db_manager, self.redis_manager, self.VISIT_FLUSH_INTERVAL, self.VISIT_FLUSH_SIZE,
+            self.click_rollup, self.unique_visitors, self.trending
+        )
+
+        # Кэш отсутствующих alias и фильтр существующих, чтобы 404 не доходили до БД
+        self.negative_cache = LocalCache(self.NEGATIVE_CACHE_SIZE, self.NEGATIVE_CACHE_TTL)
+        self.stats_cache = LocalCache(self.STATS_CACHE_SIZE, self.STATS_FRESHNESS)
+        self.cache_invalidator.on_event(CacheInvalidator.CHANNEL, self.stats_cache.invalidate)
+        self.cache_invalidator.on_event(CacheInvalidator.DELETED_CHANNEL, self.stats_cache.invalidate)
+        self.alias_filter = AliasBloomFilter(self.BLOOM_FILTER_CAPACITY, self.BLOOM_FILTER_ERROR_RATE)
+        self._alias_filter_task: asyncio.Task | None = None
+        self.cache_invalidator.on_event(CacheInvalidator.CREATED_CHANNEL, self.negative_cache.invalidate)
+        self.cache_invalidator.on_event(CacheInvalidator.CREATED_CHANNEL, self.alias_filter.add)
+        self.cache_invalidator.on_event(CacheInvalidator.DELETED_CHANNEL, self.alias_filter.remove)
+        self.cache_invalidator.on_event(CacheInvalidator.DELETED_CHANNEL, self.visit_buffer.discard)
+        self.cache_invalidator.on_subscribe(self.negative_cache.clear)
+        self.cache_invalidator.on_disconnect(self.negative_cache.clear)
+        if self.BLOOM_FILTER_ENABLED:
+            self.cache_invalidator.on_subscribe(self.schedule_alias_filter_rebuild)
+            self.cache_invalidator.on_disconnect(self.alias_filter.reset)
+
+    async def make_short_url(self, create_short_info: CreateShortUrlDC, user: UserIdentity | None = None) -> ShortUrlDC:
+        async with AsyncSessionLocal() as db:
+            # Дедупликация только для авторизованных: у анонимного запроса нет «своих» ссылок
+            if create_short_info.dedupe and user and not create_short_info.alias:
+                existing = await self.db_manager.get_aliases_by_long_urls([create_short_info.url], user.id, db)
+                if existing:
+                    return ShortUrlDC(url=next(iter(existing.values())))
+
+            expires_at = self._effective_expiry(create_short_info.expiresAt, user)
+
+            def build(alias: str) -> ShortUrl:
+                return ShortUrl(
+                    shortUrl=alias,
+                    longUrl=create_short_info.url,
+                    expiresAt=expires_at,
+                    owner_id=user.id if user else None
+                )
+
+            if create_short_info.alias:
+                short_url = build(create_short_info.alias)
+                await self.db_manager.save(shortUrl=short_url, db=db)
+            else:
+                short_url = await self._save_with_generated_alias(build, db)
+
+            await self.redis_manager.save(short_url=short_url)
+            await self.read_router.mark_written([short_url.shortUrl], user.id if user else None)
+            await self.cache_invalidator.publish(short_url.shortUrl, channel=CacheInvalidator.CREATED_CHANNEL)
+
+            return ShortUrlDC(url=short_url.shortUrl)
+
+    async def make_short_urls(self, create_infos: list[CreateShortUrlDC], user: UserIdentity | None = None) -> list[ShortenResultDC]:
+        """
+        Пакетное создание ссылок: alias выдаются разом, вставка идёт многострочными INSERT в одной транзакции,
+        кэш заполняется одним пайплайном. Результаты возвращаются в порядке запроса.
+        """
+        if len(create_infos) > self.BATCH_MAX_SIZE:
+            raise HTTPException(status_code=413, detail=f"Batch is limited to {self.BATCH_MAX_SIZE} items")
+
+        now = datetime.now(timezone.utc)
+        results: list[ShortenResultDC | None] = [None] * len(create_infos)
+        records: dict[int, ShortUrlRecord] = {}
+        custom_aliases = set()
+        for index, info in enumerate(create_infos):
+            if info.alias:
+                if info.alias in custom_aliases:
+                    results[index] = ShortenResultDC(error=f"Alias '{info.alias}' already exists")
+                    continue
+                custom_aliases.add(info.alias)
+            records[index] = ShortUrlRecord(
+                shortUrl=info.alias,
+                longUrl=info.url,
+                createdAt=now,
+                lastVisited=now,
+                expiresAt=self._effective_expiry(info.expiresAt, user),
                 owner_id=user.id if user else None
             )
 
-            self.db_manager.save(shortUrl=short_url, db=db)
-            self.redis_manager.save(short_url=short_url)
+        created = []
+        pending = dict(records)
+        async with AsyncSessionLocal() as db:
+            deduped = [index for index in pending if create_infos[index].dedupe and user and not create_infos[index].alias]
+            if deduped:
+                existing = await self.db_manager.get_aliases_by_long_urls(
+                    [create_infos[index].url for index in deduped], user.id, db
+                )
+                for index in deduped:
+                    alias = existing.get(long_url_hash(create_infos[index].url))
+                    if alias:
+                        results[index] = ShortenResultDC(url=alias)
+                        del pending[index]
+
+            for _ in range(self.ALIAS_ATTEMPTS):
+                generated = [index for index, info in pending.items() if not create_infos[index].alias]
+                for index, alias in zip(generated, await self._create_aliases(len(generated))):
+                    pending[index].shortUrl = alias
+
+                # Сгенерированный alias, совпавший с пользовательским из той же пачки или с другим
+                # сгенерированным, не вставляется: такой элемент получит новый alias на следующем круге
+                batch_aliases = set(custom_aliases)
+                batch = []
+                for index, record in pending.items():
+                    if create_infos[index].alias or record.shortUrl not in batch_aliases:
+                        batch_aliases.add(record.shortUrl)
+                        batch.append(record)
+
+                inserted = await self.db_manager.insert_many(batch, db, self.BATCH_INSERT_CHUNK)
+                for index, record in list(pending.items()):
+                    if (record.shortUrl, record.longUrl) in inserted:
+                        created.append(record)
+                        results[index] = ShortenResultDC(url=record.shortUrl)
+                        del pending[index]
+                    elif create_infos[index].alias:
+                        results[index] = ShortenResultDC(error=f"Alias '{record.shortUrl}' already exists")
+                        del pending[index]
+                if not pending:
+                    break
+                self.alias_allocator.skip_block()
+
+        for index in pending:
+            results[index] = ShortenResultDC(error="Could not allocate alias, try again")
+
+        if created:
+            await self.redis_manager.save_many(created)
+            await self.read_router.mark_written([record.shortUrl for record in created], user.id if user else None)
+            await self.cache_invalidator.publish(
+                *(record.shortUrl for record in created), channel=CacheInvalidator.CREATED_CHANNEL
+            )
+        return results
 
-            return ShortUrlDC(url=alias)
-        finally:
-            db.close()
+    async def _create_aliases(self, count: int) -> list[str]:
+        if not count:
+            return []
+        try:
+            return await self.alias_allocator.allocate_many(count)
+        except RedisError as e:
+            # Конфликты случайных alias отсеет ON CONFLICT, поэтому без проверки в БД
+            print(f"[UrlService] Alias allocator unavailable, using random aliases: {e}")
+            return [''.join(random.choices(VALID_ALIAS_CHARS, k=6)) for _ in range(count)]
+
+    @staticmethod
+    def _effective_expiry(expires_at: datetime | None, user: UserIdentity | None) -> datetime | None:
+        # Если пользователь не авторизован — устанавливаем макс время жизни 12 часов
+        if user:
+            return expires_at
+        limit = datetime.now(timezone.utc) + timedelta(hours=12)
+        return min(limit, expires_at) if expires_at else limit
+
+    async def _save_with_generated_alias(self, build, db: AsyncSession) -> ShortUrl:
+        # Сгенерированный номер может совпасть с пользовательским alias — тогда берём следующий
+        for _ in range(self.ALIAS_ATTEMPTS):
+            short_url = build(await self.create_alias(db))
+            try:
+                if await self.db_manager.save(shortUrl=short_url, db=db) is not None:
+                    return short_url
+            except HTTPException as e:
+                if e.status_code != 409:
+                    raise
+            self.alias_allocator.skip_block()
+        raise HTTPException(status_code=503, detail="Could not allocate alias, try again")
+
+    async def create_alias(self, db: AsyncSession) -> str:
+        try:
+            return await self.alias_allocator.allocate()
+        except RedisError as e:
+            # Без Redis возвращаемся к случайным alias с проверкой в БД
+            print(f"[UrlService] Alias allocator unavailable, using random alias: {e}")
 
-    def create_alias(self, db: Session) -> str:
         while True:
             raw_alias = ''.join(random.choices(VALID_ALIAS_CHARS, k=6))
-            exists = self.db_manager.get_by_short_url(raw_alias, db)
+            exists = await self.db_manager.get_by_short_url(raw_alias, db)
             if not exists:
                 return raw_alias
 
-    def get_short_url(self, alias: str) -> str:
-        db = SessionLocal()
-        try:
-            short_url = self.redis_manager.get(alias)
-            if not short_url:
-                short_url = self.db_manager.get_by_short_url(alias, db)
-                if not short_url:
-                    raise HTTPException(status_code=404, detail="Short URL not found")
-                self.redis_manager.save(short_url)
-
-            short_url.timesVisited += 1
-            short_url.lastVisited = datetime.now(timezone.utc)
-            db.commit()
-
-            self.redis_manager.save(short_url)
-
-            return short_url.longUrl
-        finally:
-            db.close()
-
-    def get_short_url_stats(self, alias: str) -> ShortUrlStatsDC:
-        db = SessionLocal()
-        try:
-            short_url = self.db_manager.get_by_short_url(alias, db)
-            if not short_url:
+    async def get_short_url_stats(
+        self,
+        alias: str,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        granularity: str = "hour"
+    ) -> ShortUrlStatsDC:
+        """
+        Статистика ссылки; если задан since или until, добавляется ряд переходов по корзинам granularity.
+        Без since берутся последние STATS_DEFAULT_RANGE, без until — до текущего момента.
+        """
+        if self._known_missing(alias):
+            raise HTTPException(status_code=404, detail="Short URL not found")
+
+        stats = self.stats_cache.get(alias)
+        if stats is None:
+            stats = await self._base_stats(alias)
+            self.stats_cache.set(alias, stats)
+        if since or until:
+            stats = stats.model_copy()
+            stats.series, stats.uniqueVisitorsInRange = await self._range_stats(alias, since, until, granularity)
+        return stats
+
+    async def _base_stats(self, alias: str) -> ShortUrlStatsDC:
+        """
+        Счётчики берутся из хэша ссылки в Redis, где переходы учитываются сразу, плюс ещё не отправленные
+        туда переходы из буфера этого воркера. В БД идём, только если ссылки нет в кэше.
+        """
+        record = await self._cached_record(alias)
+        if record is None:
+            # Статистика читается с реплики, кроме только что изменённых ссылок
+            session_factory = await self.read_router.session_factory(alias)
+            async with session_factory() as db:
+                record = await self.db_manager.get_record(alias, db)
+            if not record:
+                self.negative_cache.set(alias, True)
                 raise HTTPException(status_code=404, detail="Short URL not found")
+            try:
+                await self.redis_manager.save(record)
+            except RedisError as e:
+                print(f"[UrlService] Failed to cache link for stats: {e}")
 
-            return ShortUrlStatsDC(
-                originalUrl=short_url.longUrl,
-                visits=short_url.timesVisited,
-                lastTimeUsed=short_url.lastVisited,
-                createdAt=short_url.createdAt
-            )
-        finally:
-            db.close()
-
-    def delete_by_short_url(self, alias: str, user: User | None = None) -> bool:
-        db = SessionLocal()
+        stats = self._stats_from_record(alias, record)
         try:
-            entry = self.db_manager.get_by_short_url(alias, db)
-            if not entry:
-                return False
-            if entry.owner_id and entry.owner_id != user.id:
-                raise HTTPException(status_code=403, detail="Not your link")
-            deleted = self.db_manager.delete_short_url(alias, db)
-            self.redis_manager.delete(alias)
-            return deleted is not None
-        finally:
-            db.close()
-
-    def get_by_long_url(self, long_url: str, db: Session):
-        return db.query(ShortUrl).filter(ShortUrl.longUrl == long_url).first()
-    
-    def update_long_url(self, alias: str, new_url: str, user: User | None = None) -> bool:
-        db = SessionLocal()
+            stats.uniqueVisitors = await self.unique_visitors.count(alias)
+        except RedisError as e:
+            print(f"[UrlService] Unique visitors unavailable: {e}")
+        return stats
+
+    def _stats_from_record(self, alias: str, record: ShortUrlRecord) -> ShortUrlStatsDC:
+        pending, pending_at = self.visit_buffer.pending_uncached(alias)
+        last_visited = record.lastVisited
+        if pending_at and (last_visited is None or pending_at > as_utc(last_visited)):
+            last_visited = pending_at
+        return ShortUrlStatsDC(
+            originalUrl=record.longUrl,
+            visits=record.timesVisited + pending,
+            lastTimeUsed=last_visited,
+            createdAt=record.createdAt
+        )
+
+    async def _cached_record(self, alias: str) -> ShortUrlRecord | None:
         try:
-            entry = self.db_manager.get_by_short_url(alias, db)
-            if not entry:
-                raise HTTPException(status_code=404, detail="Short URL not found")
-
-            if entry.owner_id and (not user or entry.owner_id != user.id):
+            record = await self.redis_manager.get(alias)
+        except RedisError as e:
+            print(f"[UrlService] Redis unavailable for stats: {e}")
+            return None
+        return record if record and self._has_stats(record) else None
+
+    @staticmethod
+    def _has_stats(record: ShortUrlRecord) -> bool:
+        # Неполный хэш (например, без дат) перечитываем из БД
+        return bool(record.createdAt and record.lastVisited)
+
+    async def get_many_stats(self, aliases: list[str]) -> list[StatsResultDC]:
+        """
+        Статистика сразу по многим ссылкам: кэш Redis читается одним пайплайном, промахи — одним
+        SELECT ... IN, уникальные посетители — ещё одним пайплайном. Ответ в порядке запроса.
+        """
+        self._check_bulk_size(aliases)
+        stats = {}
+        for alias in dict.fromkeys(aliases):
+            cached = self.stats_cache.get(alias)
+            if cached is not None:
+                stats[alias] = cached
+        wanted = [alias for alias in dict.fromkeys(aliases) if alias not in stats and not self._known_missing(alias)]
+        records = await self._load_records(wanted, self._has_stats)
+
+        found = [alias for alias in wanted if alias in records]
+        try:
+            uniques = await self.unique_visitors.count_many(found) if found else []
+        except RedisError as e:
+            print(f"[UrlService] Unique visitors unavailable: {e}")
+            uniques = [None] * len(found)
+        for alias, unique in zip(found, uniques):
+            stats[alias] = self._stats_from_record(alias, records[alias])
+            stats[alias].uniqueVisitors = unique
+            self.stats_cache.set(alias, stats[alias])
+
+        return [
+            StatsResultDC(shortUrl=alias, stats=stats[alias]) if alias in stats
+            else StatsResultDC(shortUrl=alias, error="Short URL not found")
+            for alias in aliases
+        ]
+
+    async def _range_stats(
+        self, alias: str, since: datetime | None, until: datetime | None, granularity: str
+    ) -> tuple[list[ClickBucketDC], int]:
+        until = as_utc(until) if until else datetime.now(timezone.utc)
+        since = as_utc(since) if since else until - self.STATS_DEFAULT_RANGE
+        if since > until:
+            raise HTTPException(status_code=400, detail="since must not be later than until")
+        # Уникальные за период считаются по часовым HLL, а за пределами их хранения — по дневным
+        window = "hour" if granularity != "day" and since >= datetime.now(timezone.utc) - WINDOWS["hour"] else "day"
+        try:
+            points = await self.click_rollup.series(alias, since, until, granularity)
+            uniques = [None] * len(points)
+            if granularity in WINDOWS:
+                buckets = [int(start.timestamp()) for start, _ in points]
+                uniques = await self.unique_visitors.count_buckets(alias, buckets, granularity)
+            unique_in_range = await self.unique_visitors.count_range(alias, since, until, window)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except RedisError as e:
+            print(f"[UrlService] Click analytics unavailable: {e}")
+            raise HTTPException(status_code=503, detail="Click analytics is temporarily unavailable")
+        series = [
+            ClickBucketDC(start=start, clicks=clicks, uniqueVisitors=unique)
+            for (start, clicks), unique in zip(points, uniques)
+        ]
+        return series, unique_in_range
+
+    async def delete_by_short_url(self, alias: str, user: UserIdentity | None = None) -> bool:
+        async with AsyncSessionLocal() as db:
+            # Проверка владельца — в условии DELETE; различаем 404 и 403 только при неудаче
+            deleted = await self.db_manager.delete_short_url(alias, db, user.id if user else None)
+            if not deleted:
+                if await self.db_manager.get_record(alias, db):
+                    raise HTTPException(status_code=403, detail="Not your link")
+                return False
+            await self._drop_from_redis([alias])
+            await self.read_router.mark_written([alias], user.id if user else None)
+            await self.cache_invalidator.publish(alias, channel=CacheInvalidator.DELETED_CHANNEL)
+            return True
+
+    async def get_by_long_url(self, long_url: str, db: AsyncSession):
+        return await self.db_manager.get_by_long_url(long_url, db)
+
+    async def update_long_url(self, alias: str, new_url: str, user: UserIdentity | None = None) -> bool:
+        async with AsyncSessionLocal() as db:
+            updated = await self.db_manager.update_short_url(alias, new_url, db, user.id if user else None)
+            if not updated:
+                if not await self.db_manager.get_record(alias, db):
+                    raise HTTPException(status_code=404, detail="Short URL not found")
                 raise HTTPException(status_code=403, detail="You are not the owner of this link")
 
-            updated = self.db_manager.update_short_url(alias, new_url, db)
-            if updated:
-                self.redis_manager.save(updated)
-                return True
-            return False
-        finally:
-            db.close()
-
-    def delete_expired(self, unused_days: int = 10):
-        db = SessionLocal()
+            await self.redis_manager.update_link(updated)
+            await self.read_router.mark_written([alias], user.id if user else None)
+            await self.cache_invalidator.publish(alias)
+            return True
+
+    async def delete_expired(self, unused_days: int = 10, still_leader: Callable[[], Awaitable[bool]] | None = None) -> int:
+        """
+        Очистка порциями: каждая порция — своя короткая транзакция, между порциями управление
+        отдаётся event loop, чтобы редиректы не ждали окончания всей очистки.
+        :param still_leader: Проверка аренды лидерства перед каждой порцией; при её потере очистка прекращается
+        """
+        deleted = 0
+        async with AsyncSessionLocal() as db:
+            for delete_chunk in (
+                lambda: self.db_manager.delete_expired_chunk(db, self.CLEANUP_CHUNK_SIZE),
+                lambda: self.db_manager.delete_unused_chunk(db, unused_days, self.CLEANUP_CHUNK_SIZE),
+            ):
+                while True:
+                    if still_leader and not await still_leader():
+                        print("[UrlService] Cleanup stopped: leadership lost")
+                        return deleted
+                    aliases = await delete_chunk()
+                    if aliases:
+                        # Очистка кэша и аналитики
+                        await self._drop_from_redis(aliases)
+                        await self.cache_invalidator.publish(*aliases, channel=CacheInvalidator.DELETED_CHANNEL)
+                        deleted += len(aliases)
+                    if len(aliases) < self.CLEANUP_CHUNK_SIZE:
+                        break
+                    await asyncio.sleep(self.CLEANUP_CHUNK_PAUSE)
+        return deleted
+
+    async def expire_links(self, aliases: list[str]) -> list[str]:
+        """
+        Снимает истёкшие ссылки из расписания: архивирует в БД и чистит кэши всех воркеров.
+        """
+        async with AsyncSessionLocal() as db:
+            expired = await self.db_manager.delete_expired_by_aliases(aliases, db)
+        if expired:
+            await self._drop_from_redis(expired)
+            await self.cache_invalidator.publish(*expired, channel=CacheInvalidator.DELETED_CHANNEL)
+        return expired
+
+    async def _drop_from_redis(self, aliases: list[str]):
+        """
+        Удаляет из Redis кэш удалённых ссылок и их аналитику: корзины переходов, HLL посетителей и место в топе.
+        Иначе ключи копились бы бессрочно, а заново созданный alias унаследовал бы чужую статистику.
+        """
+        await self.redis_manager.delete(*aliases)
         try:
-            expired_aliases = self.db_manager.delete_all_expired(db)
-            unused_aliases = self.db_manager.delete_unused_for_days(db=db, days=unused_days)
-
-            # Очистка кэша
-            for alias in expired_aliases + unused_aliases:
-                self.redis_manager.delete(alias)
-        finally:
-            db.close()
-
-    def get_full_url(self, alias: str) -> str:
-        short_url = self.redis_manager.get(alias)
+            await self.click_rollup.forget(aliases)
+            await self.unique_visitors.forget(aliases)
+            await self.trending.forget(aliases)
+        except RedisError as e:
+            print(f"[UrlService] Failed to drop analytics of deleted links: {e}")
+
+    async def get_full_url(self, alias: str, visitor: str | None = None) -> str:
+        """
+        :param visitor: Отпечаток посетителя для подсчёта уникальных, см. visitor_fingerprint
+        """
+        long_url = self.local_cache.get(alias)
+        counted_in_cache = False
+
+        if long_url is None:
+            if self._known_missing(alias):
+                raise HTTPException(status_code=404, detail="Short URL not found")
 
-        if not short_url:
-            # Попытка достать из БД и кэшировать
-            db = SessionLocal()
-            try:
-                short_url = self.db_manager.get_by_short_url(alias, db)
+            # Скрипт в Redis возвращает ссылку и сразу учитывает переход
+            short_url = await self.redis_manager.resolve(alias)
+            if short_url:
+                counted_in_cache = True
+            else:
+                # Попытка достать из БД и кэшировать
+                async with AsyncSessionLocal() as db:
+                    short_url = await self.db_manager.get_record(alias, db)
                 if not short_url:
+                    self.negative_cache.set(alias, True)
                     raise HTTPException(status_code=404, detail="Short URL not found")
-                self.redis_manager.save(short_url)
-            finally:
-                db.close()
-
-        # Если нашли — запускаем фоновую задачу
-        asyncio.create_task(self._update_usage_stats(alias))
-
-        return short_url.longUrl
-    
-    async def _update_usage_stats(self, alias: str):
-        def sync_update():
-            db = SessionLocal()
-            try:
-                entry = self.db_manager.get_by_short_url(alias, db)
-                if entry:
-                    entry.timesVisited += 1
-                    entry.lastVisited = datetime.now(timezone.utc)
-                    db.commit()
-                    self.redis_manager.save(entry)
-            finally:
-                db.close()
-
-        loop = asyncio.get_running_loop()
-        await loop.run_in_executor(None, sync_update)
-
-    def find_by_original_url(self, url: str) -> ShortUrlDC:
-        db = SessionLocal()
-        print('===========================')
-        print(url)
+                await self.redis_manager.save(short_url)
+
+            # Ссылка могла истечь, но ещё не быть снята планировщиком
+            lifetime = self._remaining_lifetime(short_url.expiresAt)
+            if lifetime is not None and lifetime <= 0:
+                raise HTTPException(status_code=404, detail="Short URL has expired")
+
+            long_url = short_url.longUrl
+            self.local_cache.set(alias, long_url, lifetime)
+
+        # Переход учитывается в памяти и попадёт в БД при ближайшем сбросе буфера
+        self.visit_buffer.record(alias, counted_in_cache, visitor)
+
+        return long_url
+
+    async def resolve_many(self, aliases: list[str]) -> list[ResolveResultDC]:
+        """
+        Оригинальные ссылки сразу для многих alias, в порядке запроса. Сначала локальный кэш,
+        затем один пайплайн в Redis и один SELECT ... IN для промахов. Переходы не учитываются —
+        это справочный запрос, а не редирект.
+        """
+        self._check_bulk_size(aliases)
+        long_urls = {}
+        expired = set()
+        for alias in dict.fromkeys(aliases):
+            long_url = self.local_cache.get(alias)
+            if long_url is not None:
+                long_urls[alias] = long_url
+        wanted = [alias for alias in dict.fromkeys(aliases) if alias not in long_urls and not self._known_missing(alias)]
+        records = await self._load_records(wanted)
+        for alias, record in records.items():
+            lifetime = self._remaining_lifetime(record.expiresAt)
+            if lifetime is not None and lifetime <= 0:
+                expired.add(alias)
+                continue
+            long_urls[alias] = record.longUrl
+            self.local_cache.set(alias, record.longUrl, lifetime)
+
+        results = []
+        for alias in aliases:
+            if alias in long_urls:
+                results.append(ResolveResultDC(shortUrl=alias, url=long_urls[alias]))
+            elif alias in expired:
+                results.append(ResolveResultDC(shortUrl=alias, error="Short URL has expired"))
+            else:
+                results.append(ResolveResultDC(shortUrl=alias, error="Short URL not found"))
+        return results
+
+    async def _load_records(
+        self, aliases: list[str], usable: Callable[[ShortUrlRecord], bool] | None = None
+    ) -> dict[str, ShortUrlRecord]:
+        """
+        Записи по списку alias: кэш Redis одним пайплайном, промахи — одним SELECT ... IN,
+        найденные в БД снова кладутся в Redis. Ненайденные попадают в кэш отсутствующих alias.
+        :param usable: Какие записи из Redis подходят; остальные перечитываются из БД
+        """
+        if not aliases:
+            return {}
         try:
-            entry = self.db_manager.get_by_long_url(url, db)
-            if not entry:
-                raise HTTPException(status_code=404, detail="Not found")
-            return ShortUrlDC(url=entry.shortUrl)
-        finally:
-            db.close()
+            records = await self.redis_manager.get_many(aliases)
+        except RedisError as e:
+            print(f"[UrlService] Redis unavailable for bulk lookup: {e}")
+            records = {}
+        if usable:
+            records = {alias: record for alias, record in records.items() if usable(record)}
+
+        missing = [alias for alias in aliases if alias not in records]
+        if missing:
+            async with AsyncReadSessionLocal() as db:
+                loaded = await self.db_manager.get_records(missing, db)
+            if self.read_router.enabled and len(loaded) < len(missing):
+                # Ссылки могли быть созданы только что и ещё не дойти до реплики
+                found = {record.shortUrl for record in loaded}
+                async with AsyncSessionLocal() as db:
+                    loaded += await self.db_manager.get_records([a for a in missing if a not in found], db)
+            if loaded:
+                try:
+                    await self.redis_manager.save_many(loaded)
+                except RedisError as e:
+                    print(f"[UrlService] Failed to cache bulk lookup: {e}")
+            records.update((record.shortUrl, record) for record in loaded)
+
+        for alias in aliases:
+            if alias not in records:
+                self.negative_cache.set(alias, True)
+        return records
+
+    def _check_bulk_size(self, aliases: list[str]):
+        if len(aliases) > self.BULK_LOOKUP_MAX_SIZE:
+            raise HTTPException(status_code=413, detail=f"Batch is limited to {self.BULK_LOOKUP_MAX_SIZE} aliases")
+
+    def _known_missing(self, alias: str) -> bool:
+        return self.negative_cache.get(alias) is not None or not self.alias_filter.might_exist(alias)
+
+    def schedule_alias_filter_rebuild(self):
+        if self._alias_filter_task and not self._alias_filter_task.done():
+            self._alias_filter_task.cancel()
+        self._alias_filter_task = asyncio.create_task(self.rebuild_alias_filter())
+
+    async def rebuild_alias_filter(self):
+        async def alias_pages():
+            last_id = 0
+            async with AsyncSessionLocal() as db:
+                while True:
+                    rows = await self.db_manager.get_short_url_page(db, last_id, self.BLOOM_FILTER_PAGE_SIZE)
+                    if not rows:
+                        return
+                    last_id = rows[-1][0]
+                    yield [alias for _, alias in rows]
 
-
-    def get_all_urls(self) -> list[dict]:
-        db = SessionLocal()
-        try:
-            entries = db.query(ShortUrl).all()
-            return [
-                {
-                    "id": e.id,
-                    "shortUrl": e.shortUrl,
-                    "longUrl": e.longUrl,
-                    "visits": e.timesVisited,
-                    "createdAt": e.createdAt,
-                    "lastVisited": e.lastVisited,
-                    "expiresAt": e.expiresAt
-                }
-                for e in entries
-            ]
-        finally:
-            db.close()
-
-
-    def get_all_expired_urls(self) -> list[dict]:
-        db = SessionLocal()
         try:
-            entries = db.query(ExpiredUrl).all()
-            return [
-                {
-                    "id": e.id,
-                    "shortUrl": e.shortUrl,
-                    "longUrl": e.longUrl,
-                    "visits": e.timesVisited,
-                    "createdAt": e.createdAt,
-                    "lastVisited": e.lastVisited,
-                    "expiresAt": e.expiresAt,
-                    "deletedAt": e.deletedAt,
-                    "owner_id": e.owner_id
-                }
-                for e in entries
-            ]
-        finally:
-            db.close()
+            await self.alias_filter.rebuild(alias_pages())
+            print(f"[UrlService] Alias filter rebuilt: {self.alias_filter.stats()['items']} aliases")
+        except Exception as e:
+            print(f"[UrlService] Alias filter rebuild failed: {e}")
+
+    @staticmethod
+    def _remaining_lifetime(expires_at: datetime | None) -> float | None:
+        if not expires_at:
+            return None
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return (expires_at - datetime.now(timezone.utc)).total_seconds()
+
+    async def find_by_original_url(self, url: str) -> ShortUrlDC:
+        async with AsyncReadSessionLocal() as db:
+            entry = await self.db_manager.get_by_long_url(url, db)
+        if not entry and self.read_router.enabled:
+            # Ссылка могла быть создана только что и ещё не дойти до реплики
+            async with AsyncSessionLocal() as db:
+                entry = await self.db_manager.get_by_long_url(url, db)
+        if not entry:
+            raise HTTPException(status_code=404, detail="Not found")
+        return ShortUrlDC(url=entry.shortUrl)
+
+    async def get_user_links(self, owner_id: int, cursor: int = 0, limit: int | None = None) -> UserLinksPageDC:
+        """
+        Страница ссылок пользователя по курсору (id последней ссылки предыдущей страницы).
+        Запрашивается на одну запись больше, чтобы узнать о следующей странице без COUNT.
+        """
+        limit = min(limit or self.USER_LINKS_PAGE_SIZE, self.USER_LINKS_PAGE_MAX)
+        session_factory = await self.read_router.session_factory(user_id=owner_id)
+        async with session_factory() as db:
+            rows = await self.db_manager.get_owner_urls_page(owner_id, db, cursor, limit + 1)
+        page = rows[:limit]
+        return UserLinksPageDC(
+            items=[
+                UserLinkDC(
+                    shortUrl=row.shortUrl,
+                    longUrl=row.longUrl,
+                    visits=row.timesVisited,
+                    createdAt=row.createdAt,
+                    lastVisited=row.lastVisited,
+                    expiresAt=row.expiresAt
+                )
+                for row in page
+            ],
+            nextCursor=page[-1].id if len(rows) > limit else None
+        )
+
+    async def get_top_links(self, window: str = "1h", k: int = 100) -> list[TopLinkDC]:
+        return [TopLinkDC(shortUrl=alias, score=score) for alias, score in await self.trending.top(window, k)]
+
+    async def prewarm_cache(self, limit: int | None = None) -> int:
+        """
+        Загружает самые горячие ссылки окна PREWARM_WINDOW в локальный кэш воркера,
+        а отсутствующие в Redis — заново кладёт и туда. Старт воркера не начинается с промахов по топу.
+        """
+        top = await self.trending.top(self.PREWARM_WINDOW, limit or self.PREWARM_SIZE)
+        aliases = [alias for alias, _ in top]
+        records = await self._load_records(aliases)
+
+        warmed = 0
+        for alias in aliases:
+            record = records.get(alias)
+            if not record:
+                continue
+            lifetime = self._remaining_lifetime(record.expiresAt)
+            if lifetime is not None and lifetime <= 0:
+                continue
+            self.local_cache.set(alias, record.longUrl, lifetime)
+            warmed += 1
+        return warmed
+
+    async def run_prewarm(self):
+        """
+        Прогрев при старте и затем каждые PREWARM_INTERVAL секунд, пока топ меняется.
+        """
+        while True:
+            try:
+                warmed = await self.prewarm_cache()
+                if warmed:
+                    print(f"[UrlService] Cache pre-warmed with {warmed} trending links")
+            except Exception as e:
+                print(f"[UrlService] Cache pre-warm failed: {e}")
+            await asyncio.sleep(self.PREWARM_INTERVAL)
+
+    def get_cache_stats(self) -> dict:
+        return {
+            "local": self.local_cache.stats(),
+            "negative": self.negative_cache.stats(),
+            "stats": self.stats_cache.stats(),
+            "aliasFilter": self.alias_filter.stats()
+        }
+
+    async def iter_urls(self) -> AsyncIterator[list[dict]]:
+        """
+        Выгрузка всех ссылок страницами по id с реплики. Каждая страница читается в своей короткой сессии,
+        поэтому выгрузка большой таблицы не держит транзакцию открытой всё время ответа.
+        """
+        async for page in self._iter_pages(self.db_manager.get_urls_page):
+            yield [self._url_to_dict(e) for e in page]
+
+    async def iter_expired_urls(self) -> AsyncIterator[list[dict]]:
+        async for page in self._iter_pages(self.db_manager.get_expired_urls_page):
+            yield [self._expired_to_dict(e) for e in page]
+
+    async def _iter_pages(self, get_page: Callable[..., Awaitable[list]]) -> AsyncIterator[list]:
+        after_id = 0
+        while True:
+            async with AsyncReadSessionLocal() as db:
+                page = await get_page(db, after_id, self.DUMP_PAGE_SIZE)
+            if not page:
+                return
+            yield page
+            if len(page) < self.DUMP_PAGE_SIZE:
+                return
+            after_id = page[-1].id
+
+    async def archive_expired(
+        self, older_than_days: int | None = None, still_leader: Callable[[], Awaitable[bool]] | None = None
+    ) -> int:
+        """
+        Переносит старые записи expired_urls в холодный архив порциями: файл пишется до удаления строк,
+        поэтому при сбое записи не теряются, а повторная выгрузка заменяет файл той же порции (см. ColdArchive).
+        :param still_leader: Проверка аренды лидерства перед каждой порцией; при её потере архивация прекращается
+        """
+        days = self.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        archived = 0
+        async with AsyncSessionLocal() as db:
+            while True:
+                if still_leader and not await still_leader():
+                    print("[UrlService] Archiving stopped: leadership lost")
+                    break
+                entries = await self.db_manager.get_archivable_chunk(db, cutoff, self.ARCHIVE_CHUNK_SIZE)
+                if not entries:
+                    break
+                records = [self._expired_to_dict(e) for e in entries]
+                await asyncio.to_thread(self.cold_archive.write, records)
+                await self.db_manager.delete_expired_records([record["id"] for record in records], db)
+                archived += len(records)
+                if len(entries) < self.ARCHIVE_CHUNK_SIZE:
+                    break
+                await asyncio.sleep(0)
+        if archived:
+            print(f"[UrlService] Archived {archived} expired links")
+        return archived
+
+    def stream_archived_urls(self, since: date | None = None, until: date | None = None) -> Iterator[str]:
+        return self.cold_archive.iter_lines(since, until)
+
+    @staticmethod
+    def _url_to_dict(e: ShortUrl) -> dict:
+        return {
+            "id": e.id,
+            "shortUrl": e.shortUrl,
+            "longUrl": e.longUrl,
+            "visits": e.timesVisited,
+            "createdAt": e.createdAt,
+            "lastVisited": e.lastVisited,
+            "expiresAt": e.expiresAt
+        }
+
+    @staticmethod
+    def _expired_to_dict(e: ExpiredUrl) -> dict:
+        return {
+            "id": e.id,
+            "shortUrl": e.shortUrl,
+            "longUrl": e.longUrl,
+            "visits": e.timesVisited,
+            "createdAt": e.createdAt,
+            "lastVisited": e.lastVisited,
+            "expiresAt": e.expiresAt,
+            "deletedAt": e.deletedAt,
+            "owner_id": e.owner_id
+        }
@@ -8,7 +8,7 @@ import pytest_asyncio
 from httpx import AsyncClient
 from httpx import ASGITransport
 from main import app
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 from Database.redis import get_redis_client
 from sqlalchemy.orm import Session
 from Database.main_db import SessionLocal
@@ -24,4 +24,16 @@ def get_db():
 def mock_redis(mocker):
     mock_client = MagicMock()
     mocker.patch("Database.redis.get_redis_client", return_value=mock_client)
-    return mock_client
\ No newline at end of file
+    return mock_client
+
+@pytest.fixture
+def async_redis():
+    """
+    Асинхронный клиент Redis: `async with client.pipeline()` отдаёт один и тот же конвейер client.pipe.
+    """
+    client = MagicMock()
+    client.pipe = MagicMock()
+    client.pipe.execute = AsyncMock()
+    client.pipeline.return_value.__aenter__ = AsyncMock(return_value=client.pipe)
+    client.pipeline.return_value.__aexit__ = AsyncMock(return_value=False)
+    return client
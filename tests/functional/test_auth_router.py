@@ -1,7 +1,9 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from main import app
 from service.AuthService import AuthService
+from router.AuthRouter import auth_service as shared_auth_service
 from Database.main_db import SessionLocal, User
 
 client = TestClient(app)
@@ -71,6 +73,27 @@ def test_logout_and_blacklist():
     assert response.status_code == 200
     assert response.json()["valid"] is False
 
+def test_logged_out_and_deactivated_tokens_stop_working():
+    token = client.post("/auth/register", json={"email": "gone@example.com", "password": "pass123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/links/mine", headers=headers).status_code == 200
+
+    client.post("/auth/logout", headers=headers)
+    assert client.get("/links/mine", headers=headers).status_code == 401
+
+    token = client.post("/auth/login", data={"username": "gone@example.com", "password": "pass123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/links/mine", headers=headers).status_code == 200
+    db = SessionLocal()
+    user_id = db.query(User.id).filter(User.email == "gone@example.com").scalar()
+    # Деактивация доступна только из кода: открытого HTTP-метода для неё нет
+    shared_auth_service.deactivate_user(user_id, db)
+    db.close()
+    assert client.post(f"/auth/admin/users/{user_id}/deactivate").status_code in (404, 405)
+    assert client.get("/links/mine", headers=headers).status_code == 401
+    assert client.post("/auth/login", data={"username": "gone@example.com", "password": "pass123"}).status_code == 403
+
+
 def test_get_all_users():
     # Создаём пользователя
     client.post("/auth/register", json={"email": "admin@example.com", "password": "admin123"})
@@ -78,6 +101,5 @@ def test_get_all_users():
     # Запрашиваем всех пользователей
     response = client.get("/auth/admin/users")
     assert response.status_code == 200
-    users = response.json()
-    assert isinstance(users, list)
-    assert len(users) >= 1
+    users = [json.loads(line) for line in response.text.splitlines()]
+    assert any(user["email"] == "admin@example.com" for user in users)
@@ -1,3 +1,5 @@
+import json
+import uuid
 import pytest
 from fastapi.testclient import TestClient
 from datetime import datetime, timedelta, timezone
@@ -5,6 +7,12 @@ from main import app
 
 client = TestClient(app)
 
+@pytest.fixture(scope="module", autouse=True)
+def app_lifespan():
+    # Асинхронные клиенты Redis и БД привязаны к event loop — держим один loop на весь модуль
+    with client:
+        yield
+
 @pytest.fixture(autouse=True)
 def clear_urls():
     from Database.main_db import SessionLocal, ShortUrl
@@ -13,6 +21,27 @@ def clear_urls():
     db.commit()
     db.close()
 
+@pytest.fixture(autouse=True)
+def clear_redis_analytics():
+    # Кэш ссылок, переходы, посетители и топ лежат в общем Redis и иначе переживают тесты и запуски
+    from Database.redis import get_redis_client
+    from DbManager.RedisDbManager import KEY_PREFIX
+    from Analytics.ClickRollup import ClickRollup
+    from Analytics.UniqueVisitors import UniqueVisitors
+    from Analytics.TrendingLinks import TrendingLinks
+    redis = get_redis_client()
+    for prefix in (KEY_PREFIX, ClickRollup.KEY_PREFIX, UniqueVisitors.KEY_PREFIX, TrendingLinks.KEY_PREFIX):
+        keys = list(redis.scan_iter(match=prefix + "*"))
+        if keys:
+            redis.delete(*keys)
+
+
+def test_token_user_is_read_from_primary():
+    from router.UrlRouter import get_db
+    sessions = get_db()
+    assert not next(sessions).info.get("replica")
+    sessions.close()
+
 
 def test_create_short_url_anonymous():
     response = client.post("/links/shorten", json={"url": "https://example.com"})
@@ -77,6 +106,39 @@ def test_get_url_stats():
     assert resp.json()["originalUrl"] == "https://stats.com"
 
 
+
+def test_get_url_stats_returns_not_modified_for_matching_etag():
+    short_code = client.post("/links/shorten", json={"url": "https://etag.com"}).json()["url"]
+
+    resp = client.get(f"/links/{short_code}/stats")
+    etag = resp.headers["etag"]
+    assert "max-age" in resp.headers["cache-control"]
+
+    repeat = client.get(f"/links/{short_code}/stats", headers={"If-None-Match": etag})
+    assert repeat.status_code == 304
+    assert repeat.headers["etag"] == etag
+    assert client.get(f"/links/{short_code}/stats", headers={"If-None-Match": '"other"'}).status_code == 200
+
+def test_get_url_stats_with_hourly_series():
+    from router.UrlRouter import url_service
+    short_code = client.post("/links/shorten", json={"url": "https://series.com"}).json()["url"]
+    for agent in ("a", "b", "a"):
+        client.get(f"/links/{short_code}", headers={"User-Agent": agent}, follow_redirects=False)
+    client.portal.call(url_service.visit_buffer.flush)
+
+    since = (datetime.now(timezone.utc) - timedelta(hours=2)).isoformat()
+    resp = client.get(f"/links/{short_code}/stats", params={"since": since, "granularity": "hour"})
+    assert resp.status_code == 200
+    series = resp.json()["series"]
+    assert len(series) == 3
+    assert sum(point["clicks"] for point in series) == 3
+    assert resp.json()["uniqueVisitors"] == 2
+    assert resp.json()["uniqueVisitorsInRange"] == 2
+
+    top = client.get("/admin/top", params={"window": "5m", "k": 1000}).json()
+    assert short_code in [item["shortUrl"] for item in top]
+
+
 def test_delete_url_unauthorized():
     create_resp = client.post("/links/shorten", json={"url": "https://delete-me.com"})
     short_code = create_resp.json()["url"]
@@ -86,6 +148,41 @@ def test_delete_url_unauthorized():
     assert resp.json()["url"] == "Deleted"
 
 
+def test_recreated_alias_starts_with_clean_analytics():
+    from router.UrlRouter import url_service
+    alias = "re" + uuid.uuid4().hex[:5]
+    client.post("/links/shorten", json={"url": "https://first.com", "alias": alias})
+    for agent in ("a", "b", "c"):
+        client.get(f"/links/{alias}", headers={"User-Agent": agent}, follow_redirects=False)
+    client.portal.call(url_service.visit_buffer.flush)
+    assert client.get(f"/links/{alias}/stats").json()["uniqueVisitors"] == 3
+
+    client.delete(f"/links/{alias}")
+    client.post("/links/shorten", json={"url": "https://second.com", "alias": alias})
+
+    since = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+    stats = client.get(f"/links/{alias}/stats", params={"since": since}).json()
+    assert stats["visits"] == 0 and stats["uniqueVisitors"] == 0
+    assert sum(point["clicks"] for point in stats["series"]) == 0
+    top = client.get("/admin/top", params={"window": "5m", "k": 1000}).json()
+    assert alias not in [item["shortUrl"] for item in top]
+
+
+def test_update_keeps_visits_counted_in_cache():
+    from router.UrlRouter import url_service
+    short_code = client.post("/links/shorten", json={"url": "https://before.com"}).json()["url"]
+    # Первый переход кладёт ссылку в Redis, следующие считаются скриптом в хэше
+    for _ in range(3):
+        url_service.local_cache.invalidate(short_code)
+        client.get(f"/links/{short_code}", follow_redirects=False)
+
+    client.put(f"/links/{short_code}", json={"newUrl": "https://after.com"})
+    client.portal.call(url_service.visit_buffer.flush)
+
+    stats = client.get(f"/links/{short_code}/stats").json()
+    assert stats["originalUrl"] == "https://after.com"
+    assert stats["visits"] == 3
+
 def test_update_url_unauthorized():
     create_resp = client.post("/links/shorten", json={"url": "https://old-url.com"})
     short_code = create_resp.json()["url"]
@@ -96,12 +193,102 @@ def test_update_url_unauthorized():
 
 
 def test_dump_database():
+    client.post("/links/shorten", json={"url": "https://dump.com"})
+
     resp = client.get("/admin/dump-db")
     assert resp.status_code == 200
-    assert isinstance(resp.json(), list)
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in resp.text.splitlines()]
+    assert any(record["longUrl"] == "https://dump.com" for record in records)
+    assert [record["id"] for record in records] == sorted(record["id"] for record in records)
+
+
+def test_dump_database_gzip():
+    resp = client.get("/admin/dump-db", params={"compression": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    # httpx распаковывает gzip сам
+    assert all(json.loads(line)["shortUrl"] for line in resp.text.splitlines())
 
 
 def test_dump_expired_database():
     resp = client.get("/admin/dump-expired")
     assert resp.status_code == 200
-    assert isinstance(resp.json(), list)
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    assert all("deletedAt" in json.loads(line) for line in resp.text.splitlines())
+
+
+def test_shorten_batch_returns_results_in_order():
+    client.post("/links/shorten", json={"url": "https://taken.com", "alias": "taken1"})
+
+    resp = client.post("/links/shorten/batch", json=[
+        {"url": "https://one.com"},
+        {"url": "https://two.com", "alias": "mine1"},
+        {"url": "https://three.com", "alias": "taken1"},
+        {"url": "https://four.com", "alias": "mine1"}
+    ])
+    assert resp.status_code == 200
+    results = resp.json()
+
+    assert results[0]["url"] and results[0]["error"] is None
+    assert results[1] == {"url": "mine1", "error": None}
+    assert results[2]["url"] is None and "taken1" in results[2]["error"]
+    assert results[3]["url"] is None
+
+    redirect = client.get(f"/links/{results[0]['url']}", follow_redirects=False)
+    assert redirect.status_code == 302
+    assert redirect.headers["location"] == "https://one.com"
+
+
+
+def test_resolve_and_stats_batch():
+    aliases = [
+        client.post("/links/shorten", json={"url": f"https://bulk{i}.com"}).json()["url"] for i in range(3)
+    ]
+    client.get(f"/links/{aliases[0]}", follow_redirects=False)
+
+    resolved = client.post("/links/resolve", json=aliases + ["missing1"])
+    assert resolved.status_code == 200
+    assert [item["url"] for item in resolved.json()] == [f"https://bulk{i}.com" for i in range(3)] + [None]
+
+    stats = client.post("/links/stats/batch", json=[aliases[0], "missing1"]).json()
+    assert stats[0]["shortUrl"] == aliases[0]
+    assert stats[0]["stats"]["visits"] == 1
+    assert stats[1]["error"] == "Short URL not found"
+
+def test_dump_expired_streams_cold_archive(tmp_path, monkeypatch):
+    from Archive.ColdArchive import ColdArchive
+    from router.UrlRouter import url_service
+    archive = ColdArchive(str(tmp_path))
+    archive.write([{"id": 1, "shortUrl": "old1", "deletedAt": datetime(2024, 3, 1)}])
+    monkeypatch.setattr(url_service, "cold_archive", archive)
+
+    resp = client.get("/admin/dump-expired", params={"archived": True, "since": "2024-03-01"})
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    assert '"shortUrl": "old1"' in resp.text
+
+
+def test_list_my_links_with_cursor():
+    token = client.post(
+        "/auth/register", json={"email": f"{uuid.uuid4().hex[:8]}@mine.com", "password": "secret"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    created = [
+        client.post("/links/shorten", json={"url": f"https://mine{i}.com"}, headers=headers).json()["url"]
+        for i in range(3)
+    ]
+    client.post("/links/shorten", json={"url": "https://not-mine.com"})
+
+    first = client.get("/links/mine", params={"limit": 2}, headers=headers).json()
+    assert [item["shortUrl"] for item in first["items"]] == created[:2]
+    assert first["nextCursor"] is not None
+
+    second = client.get("/links/mine", params={"limit": 2, "cursor": first["nextCursor"]}, headers=headers).json()
+    assert [item["shortUrl"] for item in second["items"]] == created[2:]
+    assert second["nextCursor"] is None
+
+
+def test_list_my_links_requires_auth():
+    assert client.get("/links/mine").status_code == 401
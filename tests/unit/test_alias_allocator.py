@@ -0,0 +1,69 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from service.AliasAllocator import AliasAllocator, encode_alias, VALID_ALIAS_CHARS, BASE
+from DataClasses.DataClasses import RESERVED_ALIASES
+
+
+@pytest.fixture
+def allocator(mocker):
+    mock_redis = MagicMock()
+    mock_redis.incrby = AsyncMock(side_effect=[3, 6])
+    mocker.patch("service.AliasAllocator.get_async_redis_client", return_value=mock_redis)
+    return AliasAllocator(block_size=3)
+
+
+def test_encode_alias_grows_with_value():
+    assert encode_alias(0) == VALID_ALIAS_CHARS[0]
+    assert len(encode_alias(BASE ** 5)) == 6
+    assert len(encode_alias(BASE ** 6 - 1)) == 6
+    assert len(encode_alias(BASE ** 6)) == 7
+    with pytest.raises(ValueError):
+        encode_alias(-1)
+
+
+def test_encode_alias_is_unique():
+    start = AliasAllocator.FIRST_ID
+    aliases = {encode_alias(value) for value in range(start, start + 5000)}
+    assert len(aliases) == 5000
+
+
+@pytest.mark.asyncio
+async def test_allocate_reserves_blocks(allocator):
+    aliases = [await allocator.allocate() for _ in range(4)]
+
+    assert len(set(aliases)) == 4
+    assert all(len(alias) == 6 for alias in aliases)
+    assert allocator.redis.incrby.await_count == 2
+    assert aliases[0] == encode_alias(AliasAllocator.FIRST_ID)
+    assert aliases[3] == encode_alias(AliasAllocator.FIRST_ID + 3)
+
+
+@pytest.mark.asyncio
+async def test_skip_block_reserves_next_block(allocator):
+    await allocator.allocate()
+    allocator.skip_block()
+
+    alias = await allocator.allocate()
+    assert alias == encode_alias(AliasAllocator.FIRST_ID + 3)
+    allocator.redis.incrby.assert_awaited_with(AliasAllocator.COUNTER_KEY, 3)
+
+
+@pytest.mark.asyncio
+async def test_allocate_many_uses_block_remainder_and_one_reserve(allocator):
+    first = await allocator.allocate()
+    aliases = await allocator.allocate_many(4)
+
+    assert aliases == [encode_alias(AliasAllocator.FIRST_ID + i) for i in range(1, 5)]
+    assert first not in aliases
+    assert allocator.redis.incrby.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_allocator_skips_reserved_aliases(allocator, mocker):
+    reserved = encode_alias(AliasAllocator.FIRST_ID + 1)
+    mocker.patch("service.AliasAllocator.RESERVED_ALIASES", RESERVED_ALIASES | {reserved})
+
+    aliases = [await allocator.allocate() for _ in range(2)] + await allocator.allocate_many(2)
+
+    assert reserved not in aliases
+    assert aliases == [encode_alias(AliasAllocator.FIRST_ID + i) for i in (0, 2, 3, 4)]
@@ -0,0 +1,96 @@
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from Database.main_db import Base, ShortUrl
+from DbManager.AsyncMainDbManager import AsyncMainDbManager
+from DbManager.AsyncRedisDbManager import AsyncRedisDbManager
+from DataClasses.ShortUrlRecord import ShortUrlRecord
+
+
+@pytest_asyncio.fixture
+async def db_session():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    TestingSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+    async with TestingSessionLocal() as db:
+        yield db
+    await engine.dispose()
+
+@pytest.fixture
+def manager():
+    return AsyncMainDbManager()
+
+@pytest.mark.asyncio
+async def test_async_save_and_get(manager, db_session):
+    saved = await manager.save(ShortUrl(shortUrl="abc", longUrl="https://test.com"), db_session)
+    assert saved.id is not None
+
+    fetched = await manager.get_by_short_url("abc", db_session)
+    assert fetched.longUrl == "https://test.com"
+    assert fetched.createdAt is not None
+
+@pytest.mark.asyncio
+async def test_async_update_and_delete(manager, db_session):
+    await manager.save(ShortUrl(shortUrl="abc", longUrl="https://old.com"), db_session)
+
+    updated = await manager.update_short_url("abc", "https://new.com", db_session)
+    assert updated.longUrl == "https://new.com"
+
+    deleted = await manager.delete_short_url("abc", db_session)
+    assert deleted.shortUrl == "abc"
+    assert await manager.get_by_short_url("abc", db_session) is None
+    assert await manager.get_record("abc", db_session) is None
+
+@pytest.mark.asyncio
+async def test_async_redis_resolve_returns_url_and_expiry(mocker):
+    mock_redis = MagicMock()
+    script = AsyncMock(return_value=["https://example.com", "2030-01-01T00:00:00Z"])
+    mock_redis.register_script.return_value = script
+    mocker.patch("DbManager.AsyncRedisDbManager.get_async_redis_client", return_value=mock_redis)
+
+    record = await AsyncRedisDbManager().resolve("abc123")
+
+    assert record.longUrl == "https://example.com"
+    assert record.expiresAt.year == 2030
+    assert script.call_args[1]["keys"] == ["url:abc123"]
+
+@pytest.mark.asyncio
+async def test_async_redis_get_returns_none_if_key_missing(mocker):
+    mock_redis = AsyncMock()
+    mock_redis.register_script = MagicMock()
+    mock_redis.hgetall.return_value = {}
+    mocker.patch("DbManager.AsyncRedisDbManager.get_async_redis_client", return_value=mock_redis)
+
+    assert await AsyncRedisDbManager().get("not-found") is None
+
+
+@pytest.mark.asyncio
+async def test_async_redis_get_many_skips_missing(mocker, async_redis):
+    async_redis.pipe.execute.return_value = [{"shortUrl": "a", "longUrl": "https://a.com"}, {}]
+    mocker.patch("DbManager.AsyncRedisDbManager.get_async_redis_client", return_value=async_redis)
+
+    records = await AsyncRedisDbManager().get_many(["a", "b"])
+
+    assert list(records) == ["a"]
+    assert records["a"].longUrl == "https://a.com"
+
+
+
+@pytest.mark.asyncio
+async def test_async_redis_update_link_keeps_counters_or_falls_back_to_save(mocker):
+    mock_redis = MagicMock()
+    script = AsyncMock(side_effect=[1, 0])
+    mock_redis.register_script.return_value = script
+    mocker.patch("DbManager.AsyncRedisDbManager.get_async_redis_client", return_value=mock_redis)
+    manager = AsyncRedisDbManager()
+    save = mocker.patch.object(manager, "save", return_value=None)
+    record = ShortUrlRecord(shortUrl="abc", longUrl="https://new.com", timesVisited=1)
+
+    await manager.update_link(record)
+    save.assert_not_called()
+    assert script.call_args.kwargs == {"keys": ["url:abc"], "args": ["https://new.com", ""]}
+
+    await manager.update_link(record)
+    save.assert_awaited_once_with(record)
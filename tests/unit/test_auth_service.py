@@ -128,12 +128,83 @@ def test_is_token_blacklisted_false(auth_service, mock_redis):
     mock_redis.exists.return_value = 0
     assert auth_service.is_token_blacklisted("token") is False
 
-def test_get_all_users(auth_service, db_session):
+def test_get_users_page(auth_service, db_session):
     user1 = User(email="user1@ex.com", password_hash="1")
     user2 = User(email="user2@ex.com", password_hash="2")
     db_session.add_all([user1, user2])
     db_session.commit()
 
-    result = auth_service.get_all_users(db_session)
+    result = auth_service.get_users_page(db_session)
     assert len(result) == 2
     assert result[0]["email"].startswith("user")
+
+    assert [u["email"] for u in auth_service.get_users_page(db_session, after_id=result[0]["id"])] == ["user2@ex.com"]
+
+
+def test_iter_users_reads_pages_in_own_sessions(auth_service, db_session, mocker):
+    db_session.add_all([User(email=f"user{i}@ex.com", password_hash="1") for i in range(3)])
+    db_session.commit()
+    mocker.patch.object(auth_service, "DUMP_PAGE_SIZE", 2)
+    session_factory = mocker.Mock(side_effect=sessionmaker(bind=db_session.get_bind()))
+
+    pages = list(auth_service.iter_users(session_factory))
+
+    assert [len(page) for page in pages] == [2, 1]
+    assert session_factory.call_count == 2
+
+
+def test_replica_miss_falls_back_to_primary(auth_service, db_session, mocker):
+    replica = mocker.MagicMock()
+    replica.info = {"replica": True}
+    replica.query.return_value.filter.return_value.first.return_value = None
+    mocker.patch("service.AuthService.SessionLocal", return_value=db_session)
+    db_session.add(User(email="fresh@ex.com", password_hash="1"))
+    db_session.commit()
+
+    assert auth_service._find_by_email("fresh@ex.com", replica).email == "fresh@ex.com"
+    assert auth_service._find_by_email("missing@ex.com", db_session) is None
+
+
+def test_get_current_user_caches_identity_by_jti(auth_service, db_session, mock_redis, mocker):
+    db_session.add(User(email="cached@user.com", password_hash="hashed"))
+    db_session.commit()
+    token = auth_service.create_access_token({"sub": "cached@user.com"})
+
+    first = auth_service.get_current_user(token, db_session)
+    find = mocker.spy(auth_service, "_find_by_email")
+    second = auth_service.get_current_user(token, db_session)
+
+    assert second == first and second.email == "cached@user.com"
+    assert mock_redis.exists.call_count == 1
+    find.assert_not_called()
+
+
+def test_logout_drops_cached_identity(auth_service, db_session, mock_redis):
+    db_session.add(User(email="bye@user.com", password_hash="hashed"))
+    db_session.commit()
+    token = auth_service.create_access_token({"sub": "bye@user.com"})
+    auth_service.get_current_user(token, db_session)
+
+    auth_service.logout_token(token)
+    mock_redis.exists.return_value = 1
+
+    with pytest.raises(HTTPException) as exc:
+        auth_service.get_current_user(token, db_session)
+    assert exc.value.status_code == 401
+    jti = auth_service.decode_token(token)["jti"]
+    mock_redis.publish.assert_called_once_with("auth:logout", f"{auth_service.invalidator.origin}:{jti}")
+
+
+def test_deactivated_user_is_rejected_despite_cached_token(auth_service, db_session, mock_redis):
+    user = User(email="off@user.com", password_hash="hashed")
+    db_session.add(user)
+    db_session.commit()
+    token = auth_service.create_access_token({"sub": "off@user.com"})
+    auth_service.get_current_user(token, db_session)
+
+    auth_service.deactivate_user(user.id, db_session)
+
+    with pytest.raises(HTTPException) as exc:
+        auth_service.get_current_user(token, db_session)
+    assert exc.value.status_code == 403
+    mock_redis.publish.assert_called_once_with("auth:deactivated", f"{auth_service.invalidator.origin}:{user.id}")
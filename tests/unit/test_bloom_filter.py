@@ -0,0 +1,77 @@
+import pytest
+from Cache.BloomFilter import CountingBloomFilter, AliasBloomFilter
+
+
+async def pages(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_added_items_are_always_found():
+    bloom = CountingBloomFilter(capacity=1000, error_rate=0.01)
+    aliases = [f"alias{i}" for i in range(1000)]
+    for alias in aliases:
+        bloom.add(alias)
+
+    assert all(alias in bloom for alias in aliases)
+
+def test_false_positive_rate_is_bounded():
+    bloom = CountingBloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"alias{i}")
+
+    false_positives = sum(f"missing{i}" in bloom for i in range(10_000))
+    assert false_positives < 300
+
+def test_remove_deletes_item_but_keeps_others():
+    bloom = CountingBloomFilter(capacity=100)
+    bloom.add("abc")
+    bloom.add("xyz")
+
+    bloom.remove("abc")
+
+    assert "abc" not in bloom
+    assert "xyz" in bloom
+    assert bloom.count == 1
+
+def test_alias_filter_allows_everything_until_built():
+    alias_filter = AliasBloomFilter(capacity=100)
+    assert alias_filter.might_exist("anything")
+
+@pytest.mark.asyncio
+async def test_alias_filter_rebuild_from_pages():
+    alias_filter = AliasBloomFilter(capacity=100)
+    await alias_filter.rebuild(pages(["a1", "a2"], ["a3"]))
+
+    assert alias_filter.ready
+    assert alias_filter.might_exist("a3")
+    assert not alias_filter.might_exist("missing")
+
+@pytest.mark.asyncio
+async def test_alias_filter_replays_changes_made_during_rebuild():
+    alias_filter = AliasBloomFilter(capacity=100)
+
+    async def racing_pages():
+        yield ["old", "gone"]
+        alias_filter.add("new")
+        alias_filter.remove("gone")
+
+    await alias_filter.rebuild(racing_pages())
+
+    assert alias_filter.might_exist("new")
+    assert alias_filter.might_exist("old")
+    assert not alias_filter.might_exist("gone")
+
+@pytest.mark.asyncio
+async def test_alias_filter_stays_permissive_if_rebuild_fails():
+    alias_filter = AliasBloomFilter(capacity=100)
+
+    async def broken_pages():
+        yield ["a1"]
+        raise RuntimeError("db unavailable")
+
+    with pytest.raises(RuntimeError):
+        await alias_filter.rebuild(broken_pages())
+
+    assert not alias_filter.ready
+    assert alias_filter.might_exist("missing")
@@ -1,23 +1,36 @@
 import pytest
 import asyncio
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from Cleaner import cleaner
 
 
-@pytest.mark.asyncio
-async def test_periodic_expired_cleanup_triggers_once(mocker):
-    # Мокаем delete_expired
-    mock_delete = mocker.patch.object(cleaner.url_service, "delete_expired")
+@pytest.fixture
+def url_service():
+    service = MagicMock()
+    service.delete_expired = AsyncMock()
+    service.archive_expired = AsyncMock()
+    return service
+
 
+@pytest.mark.asyncio
+async def test_periodic_expired_cleanup_triggers_once(mocker, url_service):
     mocker.patch("asyncio.sleep", new_callable=AsyncMock, side_effect=KeyboardInterrupt)
 
-    mock_loop = mocker.Mock()
-    mock_loop.run_in_executor = AsyncMock()
-    mocker.patch("asyncio.get_event_loop", return_value=mock_loop)
+    with pytest.raises(KeyboardInterrupt):
+        await cleaner.periodic_expired_cleanup(url_service, interval_seconds=1, unused_days=5)
+
+    url_service.delete_expired.assert_awaited_once_with(5, still_leader=None)
+    url_service.archive_expired.assert_awaited_once_with(still_leader=None)
+
+
+@pytest.mark.asyncio
+async def test_periodic_expired_cleanup_checks_lease(mocker, url_service):
+    mocker.patch("asyncio.sleep", new_callable=AsyncMock, side_effect=KeyboardInterrupt)
+    lease = AsyncMock()
 
     with pytest.raises(KeyboardInterrupt):
-        await cleaner.periodic_expired_cleanup(interval_seconds=1, unused_days=5)
+        await cleaner.periodic_expired_cleanup(url_service, interval_seconds=1, unused_days=5, lease=lease)
 
-    mock_loop.run_in_executor.assert_called_once()
-    assert mock_loop.run_in_executor.call_args[0][1].__name__ == "<lambda>"
+    url_service.delete_expired.assert_awaited_once_with(5, still_leader=lease.is_leader)
+    url_service.archive_expired.assert_awaited_once_with(still_leader=lease.is_leader)
@@ -0,0 +1,76 @@
+import pytest
+from datetime import datetime, timezone
+from Analytics.ClickRollup import ClickRollup, bucket_start
+
+
+@pytest.fixture
+def pipe(mocker, async_redis):
+    mocker.patch("Analytics.ClickRollup.get_async_redis_client", return_value=async_redis)
+    return async_redis.pipe
+
+
+def ts(*args) -> int:
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+
+def test_bucket_start_aligns_to_granularity():
+    moment = ts(2024, 3, 1, 10, 17, 42)
+    assert bucket_start(moment, "minute") == ts(2024, 3, 1, 10, 17)
+    assert bucket_start(moment, "hour") == ts(2024, 3, 1, 10)
+    assert bucket_start(moment, "day") == ts(2024, 3, 1)
+
+
+@pytest.mark.asyncio
+async def test_add_rolls_minutes_up_to_hours_and_days(pipe):
+    rollup = ClickRollup()
+    await rollup.add({("abc", ts(2024, 3, 1, 10, 17)): 2, ("abc", ts(2024, 3, 1, 10, 18)): 3})
+
+    increments = {call.args[:2]: call.args[2] for call in pipe.hincrby.call_args_list}
+    assert increments == {
+        ("clicks:minute:abc:20240301", str(ts(2024, 3, 1, 10, 17))): 2,
+        ("clicks:minute:abc:20240301", str(ts(2024, 3, 1, 10, 18))): 3,
+        ("clicks:hour:abc:202403", str(ts(2024, 3, 1, 10))): 5,
+        ("clicks:day:abc:2024", str(ts(2024, 3, 1))): 5,
+    }
+    # Мелкие корзины истекают раньше крупных
+    ttls = {call.args[0]: call.args[1] for call in pipe.expire.call_args_list}
+    assert ttls["clicks:minute:abc:20240301"] < ttls["clicks:hour:abc:202403"] < ttls["clicks:day:abc:2024"]
+    pipe.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_series_is_dense_and_reads_each_partition_once(pipe):
+    pipe.execute.return_value = [["4", None], [None, "1"]]
+    rollup = ClickRollup()
+
+    series = await rollup.series(
+        "abc", datetime(2024, 2, 29, 22, 30, tzinfo=timezone.utc), datetime(2024, 3, 1, 1, 0, tzinfo=timezone.utc), "hour"
+    )
+
+    assert [(start.hour, clicks) for start, clicks in series] == [(22, 4), (23, 0), (0, 0), (1, 1)]
+    # Часы разложены по месячным партициям — один HMGET на ключ
+    assert [call.args[0] for call in pipe.hmget.call_args_list] == ["clicks:hour:abc:202402", "clicks:hour:abc:202403"]
+
+
+@pytest.mark.asyncio
+async def test_series_rejects_too_long_range(pipe):
+    rollup = ClickRollup()
+    with pytest.raises(ValueError):
+        await rollup.series(
+            "abc", datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 3, 1, tzinfo=timezone.utc), "minute"
+        )
+    pipe.hmget.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_forget_unlinks_every_partition_within_retention(pipe):
+    rollup = ClickRollup()
+    now = ts(2024, 3, 10, 12)
+    await rollup.forget(["abc"], now=now)
+
+    keys = set(pipe.unlink.call_args.args)
+    for granularity in ("minute", "hour", "day"):
+        assert rollup.key("abc", granularity, now) in keys
+    assert rollup.key("abc", "minute", ts(2024, 3, 8)) in keys
+    assert rollup.key("abc", "hour", ts(2023, 2, 10)) in keys
+    assert rollup.key("abc", "minute", ts(2024, 3, 1)) not in keys
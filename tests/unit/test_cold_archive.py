@@ -0,0 +1,65 @@
+import gzip
+import os
+from datetime import date, datetime
+from Archive.ColdArchive import ColdArchive
+
+
+def make_record(record_id: int, deleted_at: datetime) -> dict:
+    return {
+        "id": record_id,
+        "shortUrl": f"a{record_id}",
+        "longUrl": f"https://{record_id}.com",
+        "visits": record_id,
+        "createdAt": datetime(2024, 1, 1),
+        "lastVisited": None,
+        "expiresAt": None,
+        "deletedAt": deleted_at,
+        "owner_id": None
+    }
+
+
+def test_write_partitions_by_deletion_date(tmp_path):
+    archive = ColdArchive(str(tmp_path))
+    paths = archive.write([
+        make_record(1, datetime(2024, 3, 1, 10)),
+        make_record(2, datetime(2024, 3, 1, 23)),
+        make_record(3, datetime(2024, 3, 2, 1))
+    ])
+
+    assert [os.path.basename(os.path.dirname(path)) for path in paths] == ["date=2024-03-01", "date=2024-03-02"]
+    assert paths[0].endswith("part-000000000001.ndjson.gz")
+    with gzip.open(paths[0], "rt") as file:
+        assert len(file.readlines()) == 2
+
+
+def test_rewriting_same_chunk_does_not_duplicate(tmp_path):
+    archive = ColdArchive(str(tmp_path))
+    records = [make_record(1, datetime(2024, 3, 1)), make_record(2, datetime(2024, 3, 1))]
+
+    archive.write(records)
+    archive.write(records)
+
+    assert [record["id"] for record in archive.iter_records()] == [1, 2]
+
+
+def test_rewriting_grown_partial_chunk_does_not_duplicate(tmp_path):
+    archive = ColdArchive(str(tmp_path))
+    # Сбой после записи неполной порции: следующий запуск берёт те же строки и более новые
+    archive.write([make_record(1, datetime(2024, 3, 1)), make_record(2, datetime(2024, 3, 1))])
+    archive.write([make_record(i, datetime(2024, 3, 1)) for i in range(1, 5)])
+
+    assert [record["id"] for record in archive.iter_records()] == [1, 2, 3, 4]
+
+
+def test_iter_records_filters_by_date_range(tmp_path):
+    archive = ColdArchive(str(tmp_path))
+    archive.write([make_record(i, datetime(2024, 3, i)) for i in range(1, 6)])
+
+    records = list(archive.iter_records(since=date(2024, 3, 2), until=date(2024, 3, 3)))
+
+    assert [record["id"] for record in records] == [2, 3]
+    assert records[0]["deletedAt"] == "2024-03-02T00:00:00"
+
+
+def test_empty_archive_yields_nothing(tmp_path):
+    assert list(ColdArchive(str(tmp_path / "missing")).iter_lines()) == []
@@ -12,4 +12,9 @@ def test_alias_too_long():
 
 def test_alias_invalid_chars():
     with pytest.raises(ValidationError):
-        CreateShortUrlDC(url="http://example.com", alias="bad!@#")
\ No newline at end of file
+        CreateShortUrlDC(url="http://example.com", alias="bad!@#")
+
+@pytest.mark.parametrize("alias", ["mine", "search"])
+def test_alias_reserved_path_segment(alias):
+    with pytest.raises(ValidationError):
+        CreateShortUrlDC(url="http://example.com", alias=alias)
@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from Database.engine import (
+    create_db_engine, create_async_db_engine, engine_options, get_database_url, get_replica_database_url,
+    has_replica, to_async_url
+)
+
+
+def test_database_url_from_env(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    assert get_database_url() == "sqlite:///urls.db"
+
+    monkeypatch.setenv("DATABASE_URL", "postgres://user:pw@db:5432/urls")
+    assert get_database_url() == "postgresql+psycopg://user:pw@db:5432/urls"
+
+
+def test_async_url_switches_sqlite_driver():
+    assert to_async_url("sqlite:///urls.db") == "sqlite+aiosqlite:///urls.db"
+    assert to_async_url("postgresql+psycopg://u:p@db/urls") == "postgresql+psycopg://u:p@db/urls"
+
+
+def test_postgres_profile_has_pool_settings(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "5")
+    options = engine_options("postgresql+psycopg://u:p@db/urls")
+
+    assert options["pool_size"] == 5
+    assert options["pool_pre_ping"] is True
+    assert options["echo"] is False
+    assert "pool_size" not in engine_options("sqlite:///urls.db")
+
+
+def test_sqlite_profile_applies_pragmas(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_async_sqlite_profile_applies_pragmas(tmp_path):
+    engine = create_async_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    async with engine.connect() as conn:
+        assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+    await engine.dispose()
+
+
+def test_replica_url_falls_back_to_primary(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgres://u:p@primary/urls")
+    monkeypatch.delenv("DATABASE_REPLICA_URL", raising=False)
+    assert get_replica_database_url() == "postgresql+psycopg://u:p@primary/urls"
+    assert has_replica() is False
+
+    monkeypatch.setenv("DATABASE_REPLICA_URL", "postgres://u:p@replica/urls")
+    assert get_replica_database_url() == "postgresql+psycopg://u:p@replica/urls"
+    assert has_replica() is True
+
+
+def test_read_only_engine_rejects_writes(tmp_path):
+    url = f"sqlite:///{tmp_path / 'test.db'}"
+    writer = create_db_engine(url)
+    with writer.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO t (id) VALUES (1)"))
+
+    reader = create_db_engine(url, read_only=True)
+    with reader.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 1
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO t (id) VALUES (2)"))
+    reader.dispose()
+    writer.dispose()
+    assert engine_options("postgresql+psycopg://u:p@db/urls", read_only=True)["execution_options"] == {
+        "postgresql_readonly": True
+    }
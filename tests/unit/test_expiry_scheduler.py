@@ -0,0 +1,43 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from Cleaner.ExpiryScheduler import ExpiryScheduler
+
+
+@pytest.fixture
+def redis_manager():
+    manager = MagicMock()
+    manager.claim_expired = AsyncMock(return_value=["a", "b"])
+    manager.schedule_expiry = AsyncMock()
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_run_once_passes_claimed_aliases(redis_manager):
+    on_expired = AsyncMock()
+    scheduler = ExpiryScheduler(redis_manager, on_expired, batch_size=10)
+
+    assert await scheduler.run_once() == 2
+
+    on_expired.assert_awaited_once_with(["a", "b"])
+    assert redis_manager.claim_expired.call_args[0][1] == 10
+
+
+@pytest.mark.asyncio
+async def test_run_once_does_nothing_without_due_links(redis_manager):
+    redis_manager.claim_expired.return_value = []
+    on_expired = AsyncMock()
+
+    assert await ExpiryScheduler(redis_manager, on_expired).run_once() == 0
+    on_expired.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_run_once_reschedules_on_failure(redis_manager):
+    on_expired = AsyncMock(side_effect=RuntimeError("db down"))
+    scheduler = ExpiryScheduler(redis_manager, on_expired)
+
+    with pytest.raises(RuntimeError):
+        await scheduler.run_once()
+
+    rescheduled = redis_manager.schedule_expiry.call_args[0][0]
+    assert set(rescheduled) == {"a", "b"}
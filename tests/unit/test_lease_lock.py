@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from Cleaner.LeaseLock import RedisLeaseLock
+
+
+@pytest.fixture
+def lease(mocker):
+    mock_redis = MagicMock()
+    mock_redis.register_script.side_effect = lambda script: AsyncMock()
+    mock_redis.get = AsyncMock()
+    mocker.patch("Cleaner.LeaseLock.get_async_redis_client", return_value=mock_redis)
+    return RedisLeaseLock("test", lease_ms=1000, renew_interval=0.01, retry_interval=0.01)
+
+
+@pytest.mark.asyncio
+async def test_acquire_returns_fencing_token(lease):
+    lease._acquire.return_value = 7
+
+    assert await lease.acquire() == 7
+    assert lease._acquire.call_args[1]["keys"] == ["lease:test", "lease:test:fencing"]
+
+    lease.redis.get.return_value = f"{lease.owner}:7"
+    assert await lease.is_leader() is True
+    lease.redis.get.return_value = "other:8"
+    assert await lease.is_leader() is False
+
+
+@pytest.mark.asyncio
+async def test_acquire_fails_when_lease_is_taken(lease):
+    lease._acquire.return_value = None
+
+    assert await lease.acquire() is None
+    assert await lease.renew() is False
+    assert await lease.is_leader() is False
+
+
+@pytest.mark.asyncio
+async def test_run_cancels_job_when_lease_is_lost(lease):
+    lease._acquire.side_effect = [1, asyncio.CancelledError()]
+    lease._renew.return_value = 0
+    job_cancelled = asyncio.Event()
+
+    async def job():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            job_cancelled.set()
+            raise
+
+    with pytest.raises(asyncio.CancelledError):
+        await lease.run(job)
+
+    assert job_cancelled.is_set()
+    assert lease.token is None
+
+
+@pytest.mark.asyncio
+async def test_run_releases_lease_on_shutdown(lease):
+    lease._acquire.return_value = 3
+    lease._renew.return_value = 1
+    started = asyncio.Event()
+
+    async def job():
+        started.set()
+        await asyncio.sleep(10)
+
+    runner = asyncio.create_task(lease.run(job))
+    await started.wait()
+    runner.cancel()
+    await asyncio.gather(runner, return_exceptions=True)
+
+    lease._release.assert_awaited_once_with(keys=["lease:test"], args=[f"{lease.owner}:3"])
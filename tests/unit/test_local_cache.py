@@ -0,0 +1,84 @@
+import pytest
+from unittest.mock import AsyncMock
+from Cache.LocalCache import LocalCache
+from Cache.CacheInvalidator import CacheInvalidator
+
+
+def test_get_returns_saved_value_and_counts_hits():
+    cache = LocalCache(max_size=10, ttl_seconds=60)
+    cache.set("abc", "https://example.com")
+
+    assert cache.get("abc") == "https://example.com"
+    assert cache.get("missing") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+def test_lru_evicts_least_recently_used():
+    cache = LocalCache(max_size=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" становится самым старым
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_entry_expires_after_ttl(mocker):
+    now = mocker.patch("Cache.LocalCache.time.monotonic", return_value=100.0)
+    cache = LocalCache(max_size=10, ttl_seconds=30)
+    cache.set("abc", "https://example.com")
+
+    now.return_value = 131.0
+    assert cache.get("abc") is None
+    assert cache.stats()["size"] == 0
+
+def test_ttl_is_capped_by_link_lifetime(mocker):
+    now = mocker.patch("Cache.LocalCache.time.monotonic", return_value=100.0)
+    cache = LocalCache(max_size=10, ttl_seconds=30)
+    cache.set("abc", "https://example.com", ttl_seconds=5)
+
+    now.return_value = 106.0
+    assert cache.get("abc") is None
+
+def test_non_positive_ttl_is_not_cached():
+    cache = LocalCache(max_size=10, ttl_seconds=30)
+    cache.set("abc", "https://example.com", ttl_seconds=-1)
+    assert cache.get("abc") is None
+
+def test_invalidate_where_drops_matching_values():
+    cache = LocalCache(max_size=10, ttl_seconds=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 1)
+
+    assert cache.invalidate_where(lambda value: value == 1) == 2
+    assert cache.get("a") is None and cache.get("c") is None
+    assert cache.get("b") == 2
+
+@pytest.mark.asyncio
+async def test_invalidator_publish_clears_local_entry_and_broadcasts(mocker):
+    mock_redis = AsyncMock()
+    mocker.patch("Cache.CacheInvalidator.get_async_redis_client", return_value=mock_redis)
+    cache = LocalCache()
+    cache.set("abc", "https://example.com")
+    invalidator = CacheInvalidator(cache)
+
+    await invalidator.publish("abc")
+
+    assert cache.get("abc") is None
+    mock_redis.publish.assert_called_once_with(CacheInvalidator.CHANNEL, f"{invalidator.origin}:abc")
+
+@pytest.mark.asyncio
+async def test_invalidator_runs_event_handlers_on_publish(mocker):
+    mocker.patch("Cache.CacheInvalidator.get_async_redis_client", return_value=AsyncMock())
+    invalidator = CacheInvalidator(LocalCache())
+    created = []
+    invalidator.on_event(CacheInvalidator.CREATED_CHANNEL, created.append)
+
+    await invalidator.publish("abc", channel=CacheInvalidator.CREATED_CHANNEL)
+
+    assert created == ["abc"]
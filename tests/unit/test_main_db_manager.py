@@ -1,8 +1,9 @@
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from Database.main_db import Base, ShortUrl, ExpiredUrl
+from Database.main_db import Base, ShortUrl, ExpiredUrl, long_url_hash
 from DbManager.MainDbManager import MainDbManager
+from DataClasses.ShortUrlRecord import ShortUrlRecord
 from datetime import datetime, timedelta, timezone
 
 # Настройка in-memory SQLite
@@ -29,6 +30,29 @@ def test_save_and_get(manager, db_session):
     fetched = manager.get_by_short_url("abc", db_session)
     assert fetched.longUrl == "https://test.com"
 
+def test_get_record_reads_columns_only(manager, db_session):
+    manager.save(ShortUrl(shortUrl="rec", longUrl="https://test.com", owner_id=3), db_session)
+
+    record = manager.get_record("rec", db_session)
+    assert not isinstance(record, ShortUrl)
+    assert record.longUrl == "https://test.com"
+    assert record.owner_id == 3
+    assert record.createdAt is not None
+    assert manager.get_record("missing", db_session) is None
+
+def test_insert_many_skips_taken_aliases(manager, db_session):
+    manager.save(ShortUrl(shortUrl="taken", longUrl="https://old.com"), db_session)
+    records = [
+        ShortUrlRecord(shortUrl=f"b{i}", longUrl=f"https://{i}.com", createdAt=datetime.now(timezone.utc))
+        for i in range(5)
+    ] + [ShortUrlRecord(shortUrl="taken", longUrl="https://new.com")]
+
+    inserted = manager.insert_many(records, db_session, chunk_size=2)
+
+    assert inserted == {(f"b{i}", f"https://{i}.com") for i in range(5)}
+    assert manager.get_by_short_url("taken", db_session).longUrl == "https://old.com"
+    assert manager.get_by_short_url("b3", db_session).longUrl == "https://3.com"
+
 def test_save_conflict(manager, db_session):
     entry = ShortUrl(shortUrl="abc", longUrl="https://test.com")
     manager.save(entry, db_session)
@@ -36,6 +60,19 @@ def test_save_conflict(manager, db_session):
     with pytest.raises(Exception):
         manager.save(ShortUrl(shortUrl="abc", longUrl="https://other.com"), db_session)
 
+def test_update_and_delete_check_owner_in_statement(manager, db_session):
+    manager.save(ShortUrl(shortUrl="own", longUrl="https://old.com", owner_id=1), db_session)
+
+    assert manager.update_short_url("own", "https://new.com", db_session, user_id=2) is None
+    assert manager.update_short_url("own", "https://new.com", db_session) is None
+    assert manager.delete_short_url("own", db_session, user_id=2) is None
+    assert manager.get_record("own", db_session).longUrl == "https://old.com"
+
+    updated = manager.update_short_url("own", "https://new.com", db_session, user_id=1)
+    assert updated.longUrl == "https://new.com"
+    assert manager.delete_short_url("own", db_session, user_id=1).shortUrl == "own"
+    assert db_session.query(ExpiredUrl).filter_by(shortUrl="own").count() == 1
+
 def test_update_short_url(manager, db_session):
     entry = ShortUrl(shortUrl="abc", longUrl="https://old.com")
     manager.save(entry, db_session)
@@ -61,6 +98,26 @@ def test_get_by_long_url(manager, db_session):
     found = manager.get_by_long_url("https://long.com", db_session)
     assert found.shortUrl == "xyz"
 
+def test_get_by_long_url_uses_normalized_hash(manager, db_session):
+    manager.save(ShortUrl(shortUrl="norm", longUrl="https://Example.COM:443/Path?q=1"), db_session)
+
+    assert manager.get_by_long_url("https://example.com/Path?q=1", db_session).shortUrl == "norm"
+    assert manager.get_by_long_url("https://example.com/path?q=1", db_session) is None
+
+    manager.update_short_url("norm", "https://other.com", db_session)
+    assert manager.get_by_long_url("https://other.com", db_session).shortUrl == "norm"
+
+def test_get_aliases_by_long_urls_matches_owner_and_active(manager, db_session):
+    past = datetime.now(timezone.utc) - timedelta(days=1)
+    manager.save(ShortUrl(shortUrl="own1", longUrl="https://a.com", owner_id=1), db_session)
+    manager.save(ShortUrl(shortUrl="own2", longUrl="https://a.com", owner_id=1), db_session)
+    manager.save(ShortUrl(shortUrl="other", longUrl="https://b.com", owner_id=2), db_session)
+    manager.save(ShortUrl(shortUrl="old", longUrl="https://c.com", owner_id=1, expiresAt=past), db_session)
+
+    found = manager.get_aliases_by_long_urls(["https://a.com", "https://b.com", "https://c.com"], 1, db_session)
+
+    assert found == {long_url_hash("https://a.com"): "own1"}
+
 def test_delete_all_expired(manager, db_session):
     expired = ShortUrl(
         shortUrl="exp1",
@@ -79,6 +136,88 @@ def test_delete_all_expired(manager, db_session):
     assert "exp1" in deleted
     assert "active" not in deleted
 
+def test_delete_expired_chunk_archives_bounded_batch(manager, db_session):
+    past = datetime.now(timezone.utc) - timedelta(days=1)
+    db_session.add_all([
+        ShortUrl(shortUrl=f"exp{i}", longUrl=f"https://{i}.com", expiresAt=past, timesVisited=i)
+        for i in range(5)
+    ])
+    db_session.commit()
+
+    first = manager.delete_expired_chunk(db_session, limit=3)
+    assert len(first) == 3
+    assert db_session.query(ShortUrl).count() == 2
+
+    rest = manager.delete_all_expired(db_session, chunk_size=3)
+    assert sorted(first + rest) == [f"exp{i}" for i in range(5)]
+    assert db_session.query(ShortUrl).count() == 0
+
+    archived = db_session.query(ExpiredUrl).filter_by(shortUrl="exp4").one()
+    assert archived.timesVisited == 4
+    assert archived.deletedAt is not None
+
+def test_delete_expired_by_aliases_checks_expiry(manager, db_session):
+    past = datetime.now(timezone.utc) - timedelta(minutes=1)
+    future = datetime.now(timezone.utc) + timedelta(days=1)
+    manager.save(ShortUrl(shortUrl="gone", longUrl="https://gone.com", expiresAt=past), db_session)
+    manager.save(ShortUrl(shortUrl="alive", longUrl="https://alive.com", expiresAt=future), db_session)
+
+    assert manager.delete_expired_by_aliases(["gone", "alive", "missing"], db_session) == ["gone"]
+    assert manager.get_record("alive", db_session) is not None
+
+def test_archivable_chunk_and_delete_records(manager, db_session):
+    now = datetime.now(timezone.utc)
+    for i, age in enumerate([30, 20, 1]):
+        db_session.add(ExpiredUrl(
+            shortUrl=f"e{i}", longUrl="https://e.com", createdAt=now, deletedAt=now - timedelta(days=age)
+        ))
+    db_session.commit()
+
+    chunk = manager.get_archivable_chunk(db_session, now - timedelta(days=7), limit=10)
+    assert [entry.shortUrl for entry in chunk] == ["e0", "e1"]
+
+    assert manager.delete_expired_records([entry.id for entry in chunk], db_session) == 2
+    assert [entry.shortUrl for entry in db_session.query(ExpiredUrl).all()] == ["e2"]
+
+def test_urls_page_uses_keyset_pagination(manager, db_session):
+    for i in range(5):
+        manager.save(ShortUrl(shortUrl=f"p{i}", longUrl="https://p.com"), db_session)
+
+    first = manager.get_urls_page(db_session, limit=2)
+    second = manager.get_urls_page(db_session, after_id=first[-1].id, limit=10)
+
+    assert [row.shortUrl for row in first] == ["p0", "p1"]
+    assert [row.shortUrl for row in second] == ["p2", "p3", "p4"]
+    assert not isinstance(first[0], ShortUrl)
+
+def test_expired_urls_page(manager, db_session):
+    now = datetime.now(timezone.utc)
+    db_session.add_all([ExpiredUrl(shortUrl=f"e{i}", longUrl="https://e.com", createdAt=now) for i in range(3)])
+    db_session.commit()
+
+    page = manager.get_expired_urls_page(db_session, after_id=1, limit=10)
+    assert [row.shortUrl for row in page] == ["e1", "e2"]
+
+def test_owner_urls_page_filters_by_owner(manager, db_session):
+    for i, owner in enumerate([1, 2, 1, 1]):
+        manager.save(ShortUrl(shortUrl=f"o{i}", longUrl="https://o.com", owner_id=owner), db_session)
+
+    first = manager.get_owner_urls_page(1, db_session, limit=2)
+    rest = manager.get_owner_urls_page(1, db_session, after_id=first[-1].id)
+
+    assert [row.shortUrl for row in first] == ["o0", "o2"]
+    assert [row.shortUrl for row in rest] == ["o3"]
+
+def test_get_records_reads_many_aliases(manager, db_session):
+    for alias in ("r1", "r2", "r3"):
+        manager.save(ShortUrl(shortUrl=alias, longUrl=f"https://{alias}.com"), db_session)
+
+    records = manager.get_records(["r1", "r3", "missing"], db_session)
+
+    assert sorted(record.shortUrl for record in records) == ["r1", "r3"]
+    assert all(isinstance(record, ShortUrlRecord) for record in records)
+    assert manager.get_records([], db_session) == []
+
 def test_delete_unused_for_days(manager, db_session):
     unused = ShortUrl(
         shortUrl="old1",
@@ -105,3 +244,15 @@ def test_move_to_expired_creates_entry(manager, db_session):
     manager.move_to_expired(url, db_session)
     archived = db_session.query(ExpiredUrl).filter_by(shortUrl="toarchive").first()
     assert archived is not None
+
+def test_apply_visits_updates_counters_in_batch(manager, db_session):
+    manager.save(ShortUrl(shortUrl="v1", longUrl="https://v1.com"), db_session)
+    manager.save(ShortUrl(shortUrl="v2", longUrl="https://v2.com", timesVisited=3), db_session)
+    visited_at = datetime(2025, 1, 1, 12, 0)
+
+    manager.apply_visits({"v1": [2, visited_at], "v2": [1, visited_at]}, db_session)
+    db_session.expire_all()
+
+    assert manager.get_by_short_url("v1", db_session).timesVisited == 2
+    assert manager.get_by_short_url("v2", db_session).timesVisited == 4
+    assert manager.get_by_short_url("v2", db_session).lastVisited == visited_at
@@ -0,0 +1,80 @@
+import os
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect, text
+from Database.main_db import Base, long_url_hash
+
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "..", "..", "src", "alembic.ini")
+
+
+@pytest.fixture
+def database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrate.db'}"
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("sqlalchemy.url", url)
+    config.attributes["configure_logger"] = False
+    engine = create_engine(url)
+    yield engine, config
+    engine.dispose()
+
+
+def urls_indexes(engine) -> set[str]:
+    return {index["name"] for index in inspect(engine).get_indexes("urls")}
+
+
+def test_upgrade_old_schema_adds_indexes_and_hash(database):
+    engine, config = database
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE urls (id INTEGER PRIMARY KEY, short_url VARCHAR, long_url VARCHAR, "
+            "expires_at DATETIME, last_visited DATETIME, owner_id INTEGER)"
+        ))
+        conn.execute(text("INSERT INTO urls (id, short_url, long_url) VALUES (1, 'a', 'HTTP://A.com')"))
+
+    command.upgrade(config, "head")
+
+    indexes = urls_indexes(engine)
+    assert {"ix_urls_expires_at", "ix_urls_last_visited", "ix_urls_owner_id_id", "ix_urls_long_url_hash"} <= indexes
+    assert "ix_urls_owner_id" not in indexes
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT long_url_hash FROM urls")).scalar() == long_url_hash("http://a.com/")
+
+
+def test_upgrade_is_noop_on_schema_from_models(database):
+    engine, config = database
+    Base.metadata.create_all(engine)
+    before = urls_indexes(engine)
+
+    command.upgrade(config, "head")
+
+    assert urls_indexes(engine) == before
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT version_num FROM alembic_version")).scalar() == "0003"
+
+
+def test_cleanup_queries_use_indexes(database):
+    engine, _ = database
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        expired_plan = " ".join(str(row[-1]) for row in conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM urls WHERE expires_at IS NOT NULL AND expires_at <= '2030-01-01'"
+        )))
+        unused_plan = " ".join(str(row[-1]) for row in conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM urls WHERE last_visited <= '2030-01-01'"
+        )))
+
+    assert "ix_urls_expires_at" in expired_plan
+    assert "ix_urls_last_visited" in unused_plan
+
+
+def test_owner_page_uses_composite_index_without_sort(database):
+    engine, _ = database
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        plan = " ".join(str(row[-1]) for row in conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM urls WHERE owner_id = 1 AND id > 0 ORDER BY id LIMIT 50"
+        )))
+
+    assert "ix_urls_owner_id_id" in plan
+    assert "TEMP B-TREE" not in plan
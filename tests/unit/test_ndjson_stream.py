@@ -0,0 +1,51 @@
+import gzip
+import json
+import pytest
+from datetime import datetime
+from fastapi import HTTPException
+from Export import NdjsonStream
+from Export.NdjsonStream import encode_pages, make_compressor, ndjson_response, to_ndjson
+
+
+async def pages_of(*pages):
+    for page in pages:
+        yield page
+
+
+async def collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+def test_to_ndjson_serializes_datetimes():
+    body = to_ndjson([{"id": 1, "createdAt": datetime(2024, 1, 2, 3, 4)}, {"id": 2, "createdAt": None}])
+    assert body.decode().splitlines() == [
+        '{"id": 1, "createdAt": "2024-01-02T03:04:00"}',
+        '{"id": 2, "createdAt": null}'
+    ]
+
+
+@pytest.mark.asyncio
+async def test_encode_pages_yields_chunk_per_page():
+    chunks = [chunk async for chunk in encode_pages(pages_of([{"id": 1}], [{"id": 2}, {"id": 3}]))]
+    assert len(chunks) == 2
+    assert [json.loads(line)["id"] for line in b"".join(chunks).decode().splitlines()] == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_encode_pages_gzip_round_trip():
+    body = await collect(encode_pages(pages_of([{"id": 1}], [{"id": 2}]), make_compressor("gzip")))
+    assert gzip.decompress(body).decode().splitlines() == ['{"id": 1}', '{"id": 2}']
+
+
+def test_make_compressor_rejects_zstd_without_module(mocker):
+    mocker.patch.object(NdjsonStream, "zstandard", None)
+    with pytest.raises(HTTPException) as exc:
+        make_compressor("zstd")
+    assert exc.value.status_code == 400
+
+
+def test_ndjson_response_sets_content_encoding():
+    response = ndjson_response(pages_of(), "gzip")
+    assert response.media_type == "application/x-ndjson"
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in ndjson_response(pages_of()).headers
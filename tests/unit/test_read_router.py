@@ -0,0 +1,51 @@
+import pytest
+from unittest.mock import AsyncMock
+from redis.exceptions import ConnectionError as RedisConnectionError
+from Database.main_db import AsyncSessionLocal, AsyncReadSessionLocal
+from DbManager.ReadRouter import ReadRouter
+
+
+@pytest.fixture
+def mock_redis(mocker, async_redis):
+    async_redis.exists = AsyncMock(return_value=0)
+    mocker.patch("DbManager.ReadRouter.get_async_redis_client", return_value=async_redis)
+    return async_redis
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica_without_recent_writes(mock_redis):
+    router = ReadRouter(enabled=True)
+
+    assert await router.session_factory("abc", user_id=3) is AsyncReadSessionLocal
+    mock_redis.exists.assert_awaited_once_with("ryw:url:abc", "ryw:user:3")
+
+
+@pytest.mark.asyncio
+async def test_recent_write_pins_reads_to_primary(mock_redis):
+    router = ReadRouter(window=7, enabled=True)
+    await router.mark_written(["abc"], user_id=3)
+
+    pipe = mock_redis.pipe
+    assert [call.args for call in pipe.set.call_args_list] == [("ryw:url:abc", 1), ("ryw:user:3", 1)]
+    assert pipe.set.call_args.kwargs["ex"] == 7
+
+    mock_redis.exists.return_value = 1
+    assert await router.session_factory(user_id=3) is AsyncSessionLocal
+
+
+@pytest.mark.asyncio
+async def test_redis_failure_falls_back_to_primary(mock_redis):
+    mock_redis.exists.side_effect = RedisConnectionError("down")
+    router = ReadRouter(enabled=True)
+
+    assert await router.session_factory("abc") is AsyncSessionLocal
+
+
+@pytest.mark.asyncio
+async def test_disabled_router_skips_redis(mock_redis):
+    router = ReadRouter(enabled=False)
+    await router.mark_written(["abc"], user_id=1)
+
+    assert await router.session_factory("abc") is AsyncReadSessionLocal
+    mock_redis.exists.assert_not_called()
+    mock_redis.pipeline.assert_not_called()
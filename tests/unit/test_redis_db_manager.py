@@ -1,7 +1,7 @@
 import pytest
-from DbManager.RedisDbManager import RedisDbManager
+from DbManager.RedisDbManager import RedisDbManager, to_redis_hash, from_redis_hash
 from Database.main_db import ShortUrl
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import json
 
 
@@ -13,65 +13,149 @@ def sample_short_url():
         timesVisited=5,
         createdAt=datetime(2024, 1, 1, tzinfo=timezone.utc),
         lastVisited=datetime(2024, 1, 2, tzinfo=timezone.utc),
-        expiresAt=datetime(2025, 1, 1, tzinfo=timezone.utc)
+        expiresAt=datetime(2030, 1, 1, tzinfo=timezone.utc)
     )
 
 
-def test_save_sets_serialized_data(mocker, sample_short_url):
+def test_save_writes_hash_with_ttl_in_one_pipeline(mocker, sample_short_url):
     mock_redis = mocker.Mock()
     mocker.patch("DbManager.RedisDbManager.get_redis_client", return_value=mock_redis)
     redis_manager = RedisDbManager()
+    pipe = mock_redis.pipeline.return_value
 
     redis_manager.save(sample_short_url)
 
-    mock_redis.set.assert_called_once()
-    mock_redis.expire.assert_called_once_with("abc123", redis_manager.LIVE_TIME)
+    pipe.hset.assert_called_once()
+    pipe.expire.assert_called_once_with("url:abc123", redis_manager.LIVE_TIME)
+    pipe.execute.assert_called_once()
 
-    key, serialized = mock_redis.set.call_args[0]
-    assert key == "abc123"
-
-    data = json.loads(serialized)
+    key = pipe.hset.call_args[0][0]
+    data = pipe.hset.call_args[1]["mapping"]
+    assert key == "url:abc123"
     assert data["longUrl"] == "https://example.com"
     assert data["timesVisited"] == 5
     assert data["createdAt"].endswith("Z")
 
 
-def test_get_deserializes_data(mocker):
+def test_save_caps_ttl_and_schedules_expiry(mocker, sample_short_url):
+    mock_redis = mocker.Mock()
+    mocker.patch("DbManager.RedisDbManager.get_redis_client", return_value=mock_redis)
+    redis_manager = RedisDbManager()
+    pipe = mock_redis.pipeline.return_value
+    sample_short_url.expiresAt = datetime.now(timezone.utc) + timedelta(minutes=10)
+
+    redis_manager.save(sample_short_url)
+
+    ttl = pipe.expire.call_args[0][1]
+    assert 590 <= ttl <= 600
+    pipe.zadd.assert_called_once_with("links:expiry", {"abc123": sample_short_url.expiresAt.timestamp()})
+
+
+def test_save_skips_expired_link(mocker, sample_short_url):
+    mock_redis = mocker.Mock()
+    mocker.patch("DbManager.RedisDbManager.get_redis_client", return_value=mock_redis)
+    redis_manager = RedisDbManager()
+    pipe = mock_redis.pipeline.return_value
+    sample_short_url.expiresAt = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+    redis_manager.save(sample_short_url)
+
+    pipe.hset.assert_not_called()
+    pipe.delete.assert_called_once_with("url:abc123")
+    pipe.zrem.assert_called_once_with("links:expiry", "abc123")
+
+
+def test_hash_round_trip_keeps_fields(sample_short_url):
+    data = {key: str(value) for key, value in to_redis_hash(sample_short_url).items()}
+    restored = from_redis_hash(data)
+
+    assert restored.shortUrl == "abc123"
+    assert restored.timesVisited == 5
+    assert restored.expiresAt == sample_short_url.expiresAt
+
+
+def test_get_deserializes_hash(mocker):
     mock_redis = mocker.Mock()
     mocker.patch("DbManager.RedisDbManager.get_redis_client", return_value=mock_redis)
     redis_manager = RedisDbManager()
 
-    serialized = json.dumps({
+    mock_redis.hgetall.return_value = {
         "shortUrl": "abc123",
         "longUrl": "https://example.com",
-        "timesVisited": 5,
+        "timesVisited": "5",
         "createdAt": "2024-01-01T00:00:00Z",
         "lastVisited": "2024-01-02T00:00:00Z",
-        "expiresAt": "2025-01-01T00:00:00Z"
-    })
-    mock_redis.get.return_value = serialized
+        "expiresAt": ""
+    }
 
     result = redis_manager.get("abc123")
 
-    assert result is not None
+    mock_redis.hgetall.assert_called_once_with("url:abc123")
     assert result.shortUrl == "abc123"
     assert result.longUrl == "https://example.com"
     assert result.timesVisited == 5
+    assert result.expiresAt is None
 
 
 def test_get_returns_none_if_key_missing(mocker):
     mock_redis = mocker.Mock()
-    mocker.patch("Database.redis.get_redis_client", return_value=mock_redis)
+    mocker.patch("DbManager.RedisDbManager.get_redis_client", return_value=mock_redis)
     redis_manager = RedisDbManager()
 
-    mock_redis.get.return_value = None
+    mock_redis.hgetall.return_value = {}
     assert redis_manager.get("not-found") is None
 
 
+def test_resolve_runs_single_script(mocker):
+    mock_redis = mocker.Mock()
+    mocker.patch("DbManager.RedisDbManager.get_redis_client", return_value=mock_redis)
+    script = mocker.Mock(return_value=["https://example.com", ""])
+    mock_redis.register_script.return_value = script
+    redis_manager = RedisDbManager()
+
+    record = redis_manager.resolve("abc123")
+    assert record.longUrl == "https://example.com"
+    assert record.expiresAt is None
+    script.assert_called_once()
+    assert script.call_args[1]["keys"] == ["url:abc123"]
+
+    script.return_value = None
+    assert redis_manager.resolve("missing") is None
+
+
 def test_delete_calls_redis(mocker):
     mock_redis = mocker.Mock()
     mocker.patch("DbManager.RedisDbManager.get_redis_client", return_value=mock_redis)
     redis_manager = RedisDbManager()
 
+    pipe = mock_redis.pipeline.return_value
+
     redis_manager.delete("abc123")
-    mock_redis.delete.assert_called_once_with("abc123")
+    pipe.delete.assert_called_once_with("url:abc123")
+    pipe.zrem.assert_called_once_with("links:expiry", "abc123")
+    pipe.execute.assert_called_once()
+
+
+def test_migrate_json_records_moves_legacy_keys(mocker):
+    mock_redis = mocker.Mock()
+    mocker.patch("DbManager.RedisDbManager.get_redis_client", return_value=mock_redis)
+    redis_manager = RedisDbManager()
+    pipe = mock_redis.pipeline.return_value
+
+    mock_redis.scan_iter.return_value = ["abc123", "blacklist:token"]
+    mock_redis.get.return_value = json.dumps({
+        "shortUrl": "abc123",
+        "longUrl": "https://example.com",
+        "timesVisited": 5,
+        "createdAt": "2024-01-01T00:00:00Z",
+        "lastVisited": None,
+        "expiresAt": None
+    })
+    mock_redis.pttl.return_value = 1000
+
+    assert redis_manager.migrate_json_records() == 1
+
+    mock_redis.get.assert_called_once_with("abc123")
+    assert pipe.hset.call_args[0][0] == "url:abc123"
+    pipe.pexpire.assert_called_once_with("url:abc123", 1000)
+    pipe.delete.assert_called_once_with("abc123")
@@ -0,0 +1,34 @@
+import pytest
+from datetime import datetime, timezone
+from DataClasses.ShortUrlRecord import ShortUrlRecord, parse_dt
+
+
+def test_dates_parsed_lazily_on_first_access():
+    record = ShortUrlRecord(shortUrl="abc", longUrl="https://a.com", createdAt="2024-01-01T00:00:00Z")
+
+    assert record._createdAt == "2024-01-01T00:00:00Z"
+    assert record.createdAt == datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert isinstance(record._createdAt, datetime)
+
+
+def test_empty_date_string_means_none():
+    record = ShortUrlRecord(shortUrl="abc", longUrl="https://a.com", expiresAt="")
+    assert record.expiresAt is None
+
+
+def test_datetime_values_passed_through():
+    now = datetime.now(timezone.utc)
+    record = ShortUrlRecord(shortUrl="abc", longUrl="https://a.com", lastVisited=now)
+    assert record.lastVisited is now
+
+
+def test_record_has_no_instance_dict():
+    record = ShortUrlRecord(shortUrl="abc", longUrl="https://a.com")
+    assert not hasattr(record, "__dict__")
+    with pytest.raises(AttributeError):
+        record.extra = 1
+
+
+def test_parse_dt_normalizes_to_utc():
+    assert parse_dt(None) is None
+    assert parse_dt("2024-01-01T03:00:00+03:00") == datetime(2024, 1, 1, tzinfo=timezone.utc)
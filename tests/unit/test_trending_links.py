@@ -0,0 +1,57 @@
+import math
+import pytest
+from unittest.mock import AsyncMock
+from Analytics.TrendingLinks import TrendingLinks, WINDOWS
+
+
+@pytest.fixture
+def mock_redis(mocker, async_redis):
+    async_redis.register_script.return_value = AsyncMock()
+    mocker.patch("Analytics.TrendingLinks.get_async_redis_client", return_value=async_redis)
+    return async_redis
+
+
+@pytest.mark.asyncio
+async def test_add_updates_every_window_in_one_script_call(mock_redis):
+    trending = TrendingLinks(max_size=50)
+    await trending.add({"abc": 3, "xyz": 1}, now=1000.0)
+
+    script = mock_redis.register_script.return_value
+    script.assert_awaited_once()
+    keys, args = script.call_args.kwargs["keys"], script.call_args.kwargs["args"]
+    assert keys == [
+        "trending:5m", "trending:5m:landmark",
+        "trending:1h", "trending:1h:landmark",
+        "trending:1d", "trending:1d:landmark",
+    ]
+    assert args[:2] == [1000.0, 50]
+    assert args[2:5] == list(WINDOWS.values())
+    assert args[-4:] == ["abc", 3, "xyz", 1]
+
+
+@pytest.mark.asyncio
+async def test_add_skips_empty_batch(mock_redis):
+    await TrendingLinks().add({})
+    mock_redis.register_script.return_value.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_top_decays_scores_to_now(mock_redis):
+    pipe = mock_redis.pipe
+    pipe.execute.return_value = [[("abc", 10.0), ("xyz", 4.0)], "1000"]
+
+    top = await TrendingLinks().top("5m", k=2, now=1300.0)
+
+    pipe.zrevrange.assert_called_once_with("trending:5m", 0, 1, withscores=True)
+    assert [alias for alias, _ in top] == ["abc", "xyz"]
+    assert top[0][1] == pytest.approx(10.0 / math.e)
+
+
+@pytest.mark.asyncio
+async def test_forget_removes_aliases_from_every_window(mock_redis):
+    await TrendingLinks().forget(["abc", "xyz"])
+
+    pipe = mock_redis.pipe
+    assert [call.args for call in pipe.zrem.call_args_list] == [
+        (f"trending:{window}", "abc", "xyz") for window in WINDOWS
+    ]
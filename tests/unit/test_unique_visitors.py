@@ -0,0 +1,78 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock
+from Analytics.UniqueVisitors import UniqueVisitors, visitor_fingerprint
+
+
+@pytest.fixture
+def mock_redis(mocker, async_redis):
+    async_redis.pfcount = AsyncMock(return_value=5)
+    async_redis.pipe.execute.return_value = [1, 2]
+    mocker.patch("Analytics.UniqueVisitors.get_async_redis_client", return_value=async_redis)
+    return async_redis
+
+
+def test_fingerprint_is_stable_and_hides_input():
+    fingerprint = visitor_fingerprint("10.0.0.1", "curl/8")
+    assert fingerprint == visitor_fingerprint("10.0.0.1", "curl/8")
+    assert fingerprint != visitor_fingerprint("10.0.0.2", "curl/8")
+    assert "10.0.0.1" not in fingerprint and len(fingerprint) == 16
+
+
+@pytest.mark.asyncio
+async def test_add_feeds_overall_and_window_hlls(mock_redis):
+    hour = int(datetime(2024, 3, 1, 10, tzinfo=timezone.utc).timestamp())
+    day = int(datetime(2024, 3, 1, tzinfo=timezone.utc).timestamp())
+    await UniqueVisitors().add({("abc", hour): {"v1", "v2"}, ("abc", hour + 3600): {"v2"}})
+
+    pipe = mock_redis.pipe
+    added = {call.args[0]: set(call.args[1:]) for call in pipe.pfadd.call_args_list}
+    assert added == {
+        "uv:abc": {"v1", "v2"},
+        f"uv:hour:abc:{hour}": {"v1", "v2"},
+        f"uv:hour:abc:{hour + 3600}": {"v2"},
+        f"uv:day:abc:{day}": {"v1", "v2"},
+    }
+    # Общий HLL не истекает, оконные — да
+    assert "uv:abc" not in {call.args[0] for call in pipe.expire.call_args_list}
+
+
+@pytest.mark.asyncio
+async def test_count_range_unions_window_keys(mock_redis):
+    until = datetime.now(timezone.utc)
+    assert await UniqueVisitors().count_range("abc", until - timedelta(hours=2), until, "hour") == 5
+
+    keys = mock_redis.pfcount.call_args.args
+    assert len(keys) == 3
+    assert all(key.startswith("uv:hour:abc:") for key in keys)
+
+
+@pytest.mark.asyncio
+async def test_count_range_skips_expired_windows(mock_redis):
+    until = datetime.now(timezone.utc)
+    await UniqueVisitors().count_range("abc", until - timedelta(days=365), until, "day")
+
+    assert len(mock_redis.pfcount.call_args.args) <= 91
+
+
+@pytest.mark.asyncio
+async def test_count_many_reads_all_aliases_in_one_pipeline(mock_redis):
+    assert await UniqueVisitors().count_many(["abc", "xyz"]) == [1, 2]
+
+    pipe = mock_redis.pipe
+    assert [call.args[0] for call in pipe.pfcount.call_args_list] == ["uv:abc", "uv:xyz"]
+
+
+@pytest.mark.asyncio
+async def test_forget_unlinks_overall_and_window_hlls(mock_redis):
+    visitors = UniqueVisitors()
+    now = datetime(2024, 3, 10, 12, tzinfo=timezone.utc)
+    await visitors.forget(["abc"], now=now.timestamp())
+
+    pipe = mock_redis.pipe
+    keys = set(pipe.unlink.call_args.args)
+    hour = int(now.timestamp())
+    assert "uv:abc" in keys
+    assert f"uv:hour:abc:{hour}" in keys
+    assert f"uv:hour:abc:{hour - 7 * 86400}" in keys
+    assert f"uv:day:abc:{int(datetime(2023, 12, 12, tzinfo=timezone.utc).timestamp())}" in keys
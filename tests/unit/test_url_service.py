@@ -3,176 +3,362 @@
 import pytest
 from service.UrlService import UrlService
 from DataClasses.DataClasses import CreateShortUrlDC, UpdateUrlDC, ShortUrlStatsDC
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException
+from Cache.CacheInvalidator import CacheInvalidator
+from DataClasses.ShortUrlRecord import ShortUrlRecord
+from redis.exceptions import ConnectionError as RedisConnectionError
 
 url_service = UrlService()
 
-def test_create_alias_generates_unique_value(mocker):
+
+@pytest.fixture(autouse=True)
+def unique_visitors(mocker):
+    # HyperLogLog в Redis в юнит-тестах не нужен
+    return mocker.patch.object(url_service.unique_visitors, "count", return_value=0)
+
+
+@pytest.fixture(autouse=True)
+def forget_analytics(mocker):
+    return [
+        mocker.patch.object(analytics, "forget", return_value=None)
+        for analytics in (url_service.click_rollup, url_service.unique_visitors, url_service.trending)
+    ]
+
+
+@pytest.fixture
+def stats_from_db(mocker):
+    url_service.stats_cache.clear()
+    mocker.patch.object(url_service.redis_manager, "get", return_value=None)
+    mocker.patch.object(url_service.redis_manager, "save", return_value=None)
+
+
+@pytest.mark.asyncio
+async def test_create_alias_generates_unique_value(mocker):
     mock_db = MagicMock()
     mocker.patch.object(url_service.db_manager, "get_by_short_url", return_value=None)
-    alias = url_service.create_alias(mock_db)
+    mocker.patch.object(url_service.alias_allocator, "allocate", side_effect=RedisConnectionError("down"))
+    alias = await url_service.create_alias(mock_db)
     assert isinstance(alias, str)
     assert len(alias) > 0
 
-def test_make_short_url_sets_default_expiry_for_anon(mocker):
-    mocker.patch.object(url_service.db_manager, "get_by_short_url", return_value=None)
-    mocker.patch.object(url_service.db_manager, "save", return_value=None)
+@pytest.mark.asyncio
+async def test_make_short_url_retries_on_alias_conflict(mocker):
+    mocker.patch.object(url_service.alias_allocator, "allocate", side_effect=["taken1", "free01"])
+    skip_block = mocker.patch.object(url_service.alias_allocator, "skip_block")
+    conflict = HTTPException(status_code=409, detail="Alias 'taken1' already exists")
+    save = mocker.patch.object(url_service.db_manager, "save", side_effect=[conflict, MagicMock()])
+    mocker.patch.object(url_service.redis_manager, "save", return_value=None)
+    mocker.patch.object(url_service.cache_invalidator, "publish", return_value=None)
+
+    result = await url_service.make_short_url(CreateShortUrlDC(url="https://example.com"), user=None)
+
+    assert result.url == "free01"
+    assert save.call_count == 2
+    skip_block.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_make_short_url_sets_default_expiry_for_anon(mocker):
+    mocker.patch.object(url_service.alias_allocator, "allocate", return_value="gen123")
+    mocker.patch.object(url_service.db_manager, "save", side_effect=lambda shortUrl, db: shortUrl)
     mocker.patch.object(url_service.redis_manager, "save", return_value=None)
+    publish = mocker.patch.object(url_service.cache_invalidator, "publish", return_value=None)
 
     create_dto = CreateShortUrlDC(url="https://example.com")
-    result = url_service.make_short_url(create_dto, user=None)
-    assert result.url
+    result = await url_service.make_short_url(create_dto, user=None)
+    assert result.url == "gen123"
+    publish.assert_called_once_with(result.url, channel=CacheInvalidator.CREATED_CHANNEL)
 
-def test_make_short_url_honors_custom_expiry_for_anon(mocker):
-    mocker.patch.object(url_service.db_manager, "get_by_short_url", return_value=None)
-    mocker.patch.object(url_service.db_manager, "save", return_value=None)
+@pytest.mark.asyncio
+async def test_make_short_url_honors_custom_expiry_for_anon(mocker):
+    mocker.patch.object(url_service.alias_allocator, "allocate", return_value="gen123")
+    mocker.patch.object(url_service.db_manager, "save", side_effect=lambda shortUrl, db: shortUrl)
     mocker.patch.object(url_service.redis_manager, "save", return_value=None)
+    mocker.patch.object(url_service.cache_invalidator, "publish", return_value=None)
 
     custom_exp = datetime.now(timezone.utc) + timedelta(hours=24)
     dto = CreateShortUrlDC(url="https://example.com", expiresAt=custom_exp)
-    result = url_service.make_short_url(dto, user=None)
+    result = await url_service.make_short_url(dto, user=None)
     assert result.url
 
-def test_delete_expired_removes_correct_entries(mocker):
-    mocker.patch.object(url_service.db_manager, "delete_all_expired", return_value=["a", "b"])
-    mocker.patch.object(url_service.db_manager, "delete_unused_for_days", return_value=["c"])
+@pytest.mark.asyncio
+async def test_delete_expired_removes_correct_entries(mocker):
+    mocker.patch.object(url_service.db_manager, "delete_expired_chunk", return_value=["a", "b"])
+    unused_chunk = mocker.patch.object(url_service.db_manager, "delete_unused_chunk", return_value=["c"])
     redis_delete = mocker.patch.object(url_service.redis_manager, "delete", return_value=None)
+    publish = mocker.patch.object(url_service.cache_invalidator, "publish", return_value=None)
+
+    assert await url_service.delete_expired(unused_days=5) == 3
 
-    url_service.delete_expired(unused_days=5)
+    assert unused_chunk.call_args[0][1] == 5
+    redis_delete.assert_has_calls([mocker.call("a", "b"), mocker.call("c")])
+    publish.assert_called_with("c", channel=CacheInvalidator.DELETED_CHANNEL)
 
-    redis_delete.assert_any_call("a")
-    redis_delete.assert_any_call("b")
-    redis_delete.assert_any_call("c")
 
 @pytest.mark.asyncio
-async def test_update_usage_stats_async(mocker):
-    mock_entry = MagicMock()
-    mock_entry.timesVisited = 0
-    mock_entry.lastVisited = None
+async def test_deleted_links_lose_their_analytics(mocker, forget_analytics):
+    mocker.patch.object(url_service.redis_manager, "delete", return_value=None)
+    forget_analytics[2].side_effect = RedisConnectionError("down")
 
-    mocker.patch.object(url_service.db_manager, "get_by_short_url", return_value=mock_entry)
-    mocker.patch.object(url_service.redis_manager, "save", return_value=None)
+    await url_service._drop_from_redis(["gone1", "gone2"])
+
+    for forget in forget_analytics:
+        forget.assert_awaited_once_with(["gone1", "gone2"])
+
+@pytest.mark.asyncio
+async def test_delete_expired_processes_chunks_until_short_one(mocker):
+    mocker.patch.object(url_service, "CLEANUP_CHUNK_SIZE", 2)
+    expired_chunk = mocker.patch.object(
+        url_service.db_manager, "delete_expired_chunk", side_effect=[["a", "b"], ["c", "d"], ["e"]]
+    )
+    mocker.patch.object(url_service.db_manager, "delete_unused_chunk", return_value=[])
+    redis_delete = mocker.patch.object(url_service.redis_manager, "delete", return_value=None)
+    mocker.patch.object(url_service.cache_invalidator, "publish", return_value=None)
+    sleep = mocker.patch("service.UrlService.asyncio.sleep")
+
+    assert await url_service.delete_expired() == 5
+
+    assert expired_chunk.await_count == 3
+    assert redis_delete.call_count == 3
+    assert sleep.await_count == 2
+
+@pytest.mark.asyncio
+async def test_get_full_url_records_visit_in_buffer(mocker):
+    url_service.local_cache.set("visit1", "https://visit.com")
+    record = mocker.patch.object(url_service.visit_buffer, "record")
 
-    await url_service._update_usage_stats("abc123")
+    await url_service.get_full_url("visit1")
 
-    assert mock_entry.timesVisited == 1
-    assert mock_entry.lastVisited is not None
+    record.assert_called_once_with("visit1", False, None)
 
-def test_get_short_url_stats_returns_dto(mocker):
+@pytest.mark.asyncio
+async def test_get_short_url_stats_returns_dto(mocker, stats_from_db):
     mock_entry = MagicMock()
     mock_entry.longUrl = "https://example.com"
     mock_entry.timesVisited = 10
     mock_entry.lastVisited = datetime.now(timezone.utc)
     mock_entry.createdAt = datetime.now(timezone.utc)
 
-    mocker.patch.object(url_service.db_manager, "get_by_short_url", return_value=mock_entry)
+    mocker.patch.object(url_service.db_manager, "get_record", return_value=mock_entry)
 
-    stats = url_service.get_short_url_stats("abc123")
+    stats = await url_service.get_short_url_stats("abc123")
     assert isinstance(stats, ShortUrlStatsDC)
     assert stats.originalUrl == "https://example.com"
 
-def test_update_long_url_success(mocker):
+@pytest.mark.asyncio
+async def test_get_short_url_stats_adds_series_for_range(mocker, stats_from_db):
+    mocker.patch.object(url_service.db_manager, "get_record", return_value=MagicMock(
+        longUrl="https://example.com", timesVisited=3,
+        lastVisited=datetime.now(timezone.utc), createdAt=datetime.now(timezone.utc)
+    ))
+    start = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    series = mocker.patch.object(url_service.click_rollup, "series", return_value=[(start, 3)])
+    mocker.patch.object(url_service.unique_visitors, "count_buckets", return_value=[2])
+    count_range = mocker.patch.object(url_service.unique_visitors, "count_range", return_value=2)
+
+    stats = await url_service.get_short_url_stats("abc123", since=start, granularity="day")
+
+    assert stats.series[0].clicks == 3
+    assert stats.series[0].uniqueVisitors == 2
+    assert stats.uniqueVisitorsInRange == 2
+    # Период старше хранения часовых HLL считается по дневным
+    assert count_range.call_args.args[3] == "day"
+    assert series.call_args.args[1] == start
+    assert series.call_args.args[3] == "day"
+    assert (await url_service.get_short_url_stats("abc123")).series is None
+
+
+@pytest.mark.asyncio
+async def test_get_short_url_stats_rejects_inverted_range(mocker, stats_from_db):
+    mocker.patch.object(url_service.db_manager, "get_record", return_value=MagicMock(
+        longUrl="https://example.com", timesVisited=3,
+        lastVisited=datetime.now(timezone.utc), createdAt=datetime.now(timezone.utc)
+    ))
+    with pytest.raises(HTTPException) as exc:
+        await url_service.get_short_url_stats(
+            "abc123", since=datetime(2024, 3, 2, tzinfo=timezone.utc), until=datetime(2024, 3, 1, tzinfo=timezone.utc)
+        )
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_short_url_stats_uses_routed_session(mocker, stats_from_db):
+    session = AsyncMock()
+    factory = MagicMock(return_value=session)
+    session.__aenter__.return_value = session
+    route = mocker.patch.object(url_service.read_router, "session_factory", return_value=factory)
+    get_record = mocker.patch.object(url_service.db_manager, "get_record", return_value=MagicMock(
+        longUrl="https://example.com", timesVisited=1,
+        lastVisited=datetime.now(timezone.utc), createdAt=datetime.now(timezone.utc)
+    ))
+
+    await url_service.get_short_url_stats("routed1")
+
+    route.assert_called_once_with("routed1")
+    assert get_record.call_args.args == ("routed1", session)
+
+@pytest.mark.asyncio
+async def test_get_short_url_stats_served_from_cache_with_pending_visits(mocker):
+    url_service.stats_cache.clear()
+    visited = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    mocker.patch.object(url_service.redis_manager, "get", return_value=ShortUrlRecord(
+        shortUrl="cached1", longUrl="https://example.com", timesVisited=5,
+        lastVisited=visited, createdAt=visited
+    ))
+    get_record = mocker.patch.object(url_service.db_manager, "get_record")
+    later = visited + timedelta(minutes=1)
+    mocker.patch.object(url_service.visit_buffer, "pending_uncached", return_value=(2, later))
+
+    stats = await url_service.get_short_url_stats("cached1")
+
+    assert stats.visits == 7
+    assert stats.lastTimeUsed == later
+    get_record.assert_not_called()
+    # Повторный опрос в пределах свежести не ходит даже в Redis
+    assert await url_service.get_short_url_stats("cached1") is stats
+    url_service.redis_manager.get.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_update_long_url_success(mocker):
     mock_entry = MagicMock()
     mock_entry.owner_id = 1
 
-    mocker.patch.object(url_service.db_manager, "get_by_short_url", return_value=mock_entry)
-    mocker.patch.object(url_service.db_manager, "update_short_url", return_value=mock_entry)
-    mocker.patch.object(url_service.redis_manager, "save", return_value=None)
+    update = mocker.patch.object(url_service.db_manager, "update_short_url", return_value=mock_entry)
+    update_link = mocker.patch.object(url_service.redis_manager, "update_link", return_value=None)
+    publish = mocker.patch.object(url_service.cache_invalidator, "publish", return_value=None)
+
+    mark_written = mocker.patch.object(url_service.read_router, "mark_written", return_value=None)
 
     user = MagicMock()
     user.id = 1
-    success = url_service.update_long_url("alias123", "https://new.com", user)
+    success = await url_service.update_long_url("alias123", "https://new.com", user)
     assert success is True
+    assert update.call_args[0][3] == 1
+    # Кэш обновляется без перезаписи счётчиков переходов
+    update_link.assert_awaited_once_with(mock_entry)
+    publish.assert_called_once_with("alias123")
+    # Автор изменения сразу читает свою ссылку с основной БД
+    mark_written.assert_called_once_with(["alias123"], 1)
 
-def test_update_long_url_forbidden(mocker):
+@pytest.mark.asyncio
+async def test_update_long_url_forbidden(mocker):
     mock_entry = MagicMock()
     mock_entry.owner_id = 2
 
-    mocker.patch.object(url_service.db_manager, "get_by_short_url", return_value=mock_entry)
+    mocker.patch.object(url_service.db_manager, "update_short_url", return_value=None)
+    mocker.patch.object(url_service.db_manager, "get_record", return_value=mock_entry)
 
     user = MagicMock()
     user.id = 1
 
     with pytest.raises(HTTPException) as exc:
-        url_service.update_long_url("alias123", "https://new.com", user)
+        await url_service.update_long_url("alias123", "https://new.com", user)
 
     assert exc.value.status_code == 403
 
-def test_delete_by_short_url_owner(mocker):
+@pytest.mark.asyncio
+async def test_update_long_url_not_found(mocker):
+    mocker.patch.object(url_service.db_manager, "update_short_url", return_value=None)
+    mocker.patch.object(url_service.db_manager, "get_record", return_value=None)
+
+    with pytest.raises(HTTPException) as exc:
+        await url_service.update_long_url("missing", "https://new.com", None)
+
+    assert exc.value.status_code == 404
+
+@pytest.mark.asyncio
+async def test_delete_by_short_url_owner(mocker):
     mock_entry = MagicMock()
     mock_entry.owner_id = 5
 
-    mocker.patch.object(url_service.db_manager, "get_by_short_url", return_value=mock_entry)
     mocker.patch.object(url_service.db_manager, "delete_short_url", return_value=mock_entry)
     mocker.patch.object(url_service.redis_manager, "delete", return_value=None)
+    publish = mocker.patch.object(url_service.cache_invalidator, "publish", return_value=None)
 
     user = MagicMock()
     user.id = 5
-    success = url_service.delete_by_short_url("alias123", user)
+    success = await url_service.delete_by_short_url("alias123", user)
     assert success is True
+    publish.assert_called_once_with("alias123", channel=CacheInvalidator.DELETED_CHANNEL)
 
-def test_delete_by_short_url_forbidden(mocker):
+@pytest.mark.asyncio
+async def test_delete_by_short_url_forbidden(mocker):
     mock_entry = MagicMock()
     mock_entry.owner_id = 99
 
-    mocker.patch.object(url_service.db_manager, "get_by_short_url", return_value=mock_entry)
+    mocker.patch.object(url_service.db_manager, "delete_short_url", return_value=None)
+    mocker.patch.object(url_service.db_manager, "get_record", return_value=mock_entry)
 
     user = MagicMock()
     user.id = 1
 
     with pytest.raises(HTTPException) as exc:
-        url_service.delete_by_short_url("alias123", user)
+        await url_service.delete_by_short_url("alias123", user)
 
     assert exc.value.status_code == 403
 
-def test_find_by_original_url_found(mocker):
+@pytest.mark.asyncio
+async def test_find_by_original_url_found(mocker):
     mock_entry = MagicMock()
     mock_entry.shortUrl = "abc123"
 
     mocker.patch.object(url_service.db_manager, "get_by_long_url", return_value=mock_entry)
 
-    result = url_service.find_by_original_url("https://example.com")
+    result = await url_service.find_by_original_url("https://example.com")
     assert result.url == "abc123"
 
-def test_find_by_original_url_not_found(mocker):
+@pytest.mark.asyncio
+async def test_find_by_original_url_not_found(mocker):
     mocker.patch.object(url_service.db_manager, "get_by_long_url", return_value=None)
 
     with pytest.raises(HTTPException) as exc:
-        url_service.find_by_original_url("https://missing.com")
+        await url_service.find_by_original_url("https://missing.com")
 
     assert exc.value.status_code == 404
 
-def test_get_short_url_from_db_if_not_cached(mocker):
-    mock_short_url = MagicMock()
-    mock_short_url.longUrl = "https://from-db.com"
-    mock_short_url.timesVisited = 0
-    mock_short_url.lastVisited = None
+@pytest.mark.asyncio
+async def test_get_full_url_from_db_if_not_cached(mocker):
+    mock_entry = MagicMock()
+    mock_entry.longUrl = "https://cached.com"
+    mock_entry.expiresAt = None
 
-    mocker.patch.object(url_service.redis_manager, "get", return_value=None)
-    mocker.patch.object(url_service.db_manager, "get_by_short_url", return_value=mock_short_url)
+    mocker.patch.object(url_service.redis_manager, "resolve", return_value=None)
+    mocker.patch.object(url_service.db_manager, "get_record", return_value=mock_entry)
     mocker.patch.object(url_service.redis_manager, "save", return_value=None)
-    mocker.patch("sqlalchemy.orm.session.Session.commit", return_value=None)
+    record = mocker.patch.object(url_service.visit_buffer, "record")
 
-    long_url = url_service.get_short_url("alias123")
-    assert long_url == "https://from-db.com"
+    url = await url_service.get_full_url("abc123")
+    assert url == "https://cached.com"
+    record.assert_called_once_with("abc123", False, None)
 
 
-def test_get_full_url_from_db_if_not_cached(mocker):
-    mock_entry = MagicMock()
-    mock_entry.longUrl = "https://cached.com"
+@pytest.mark.asyncio
+async def test_get_full_url_resolves_through_redis_script(mocker):
+    mocker.patch.object(
+        url_service.redis_manager, "resolve",
+        return_value=ShortUrlRecord(shortUrl="inredis", longUrl="https://redis.com", expiresAt="")
+    )
+    db_get = mocker.patch.object(url_service.db_manager, "get_record")
+    record = mocker.patch.object(url_service.visit_buffer, "record")
 
-    mocker.patch.object(url_service.redis_manager, "get", return_value=None)
-    mocker.patch.object(url_service.db_manager, "get_by_short_url", return_value=mock_entry)
-    mocker.patch.object(url_service.redis_manager, "save", return_value=None)
-    mocker.patch("asyncio.create_task", return_value=None)
+    assert await url_service.get_full_url("inredis") == "https://redis.com"
+    db_get.assert_not_called()
+    record.assert_called_once_with("inredis", True, None)
 
-    url = url_service.get_full_url("abc123")
-    assert url == "https://cached.com"
+
+@pytest.mark.asyncio
+async def test_get_full_url_served_from_local_cache(mocker):
+    url_service.local_cache.set("hot1", "https://hot.com")
+    redis_resolve = mocker.patch.object(url_service.redis_manager, "resolve")
+    mocker.patch.object(url_service.visit_buffer, "record")
+
+    assert await url_service.get_full_url("hot1") == "https://hot.com"
+    redis_resolve.assert_not_called()
 
 
-def test_get_all_urls_returns_list(mocker):
+@pytest.mark.asyncio
+async def test_iter_urls_yields_dict_pages(mocker):
     fake_entry = MagicMock()
     fake_entry.id = 1
     fake_entry.shortUrl = "abc"
@@ -182,17 +368,15 @@ def test_get_all_urls_returns_list(mocker):
     fake_entry.lastVisited = datetime.now(timezone.utc)
     fake_entry.expiresAt = None
 
-    mock_query = MagicMock()
-    mock_query.all.return_value = [fake_entry]
-    mocker.patch("sqlalchemy.orm.Session.query", return_value=mock_query)
+    mocker.patch.object(url_service.db_manager, "get_urls_page", return_value=[fake_entry])
 
-    mocker.patch("asyncio.create_task", return_value=None)
-    result = url_service.get_all_urls()
-    assert isinstance(result, list)
-    assert result[0]["shortUrl"] == "abc"
+    pages = [page async for page in url_service.iter_urls()]
+    assert len(pages) == 1
+    assert pages[0][0]["shortUrl"] == "abc"
 
 
-def test_get_all_expired_urls_returns_list(mocker):
+@pytest.mark.asyncio
+async def test_iter_expired_urls_yields_dict_pages(mocker):
     fake_entry = MagicMock()
     fake_entry.id = 1
     fake_entry.shortUrl = "expired1"
@@ -204,8 +388,306 @@ def test_get_all_expired_urls_returns_list(mocker):
     fake_entry.deletedAt = datetime.now(timezone.utc)
     fake_entry.owner_id = None
 
-    mocker.patch("sqlalchemy.orm.Session.query", return_value=MagicMock(all=lambda: [fake_entry]))
+    mocker.patch.object(url_service.db_manager, "get_expired_urls_page", return_value=[fake_entry])
+
+    pages = [page async for page in url_service.iter_expired_urls()]
+    assert pages[0][0]["shortUrl"] == "expired1"
+    assert pages[0][0]["deletedAt"] == fake_entry.deletedAt
+
+
+@pytest.mark.asyncio
+async def test_iter_urls_pages_by_last_id(mocker):
+    mocker.patch.object(url_service, "DUMP_PAGE_SIZE", 2)
+    rows = [MagicMock(id=i, shortUrl=f"a{i}") for i in (1, 2, 3)]
+    get_page = mocker.patch.object(
+        url_service.db_manager, "get_urls_page", side_effect=[rows[:2], rows[2:]]
+    )
+
+    pages = [page async for page in url_service.iter_urls()]
+
+    assert [[item["shortUrl"] for item in page] for page in pages] == [["a1", "a2"], ["a3"]]
+    assert [call.args[1] for call in get_page.call_args_list] == [0, 2]
+
+
+@pytest.mark.asyncio
+async def test_get_user_links_returns_cursor_when_more_rows(mocker):
+    now = datetime.now(timezone.utc)
+    rows = [
+        MagicMock(id=i, shortUrl=f"u{i}", longUrl="https://u.com", timesVisited=0,
+                  createdAt=now, lastVisited=now, expiresAt=None)
+        for i in (4, 7, 9)
+    ]
+    get_page = mocker.patch.object(url_service.db_manager, "get_owner_urls_page", return_value=rows)
+
+    page = await url_service.get_user_links(5, cursor=2, limit=2)
+
+    assert [item.shortUrl for item in page.items] == ["u4", "u7"]
+    assert page.nextCursor == 7
+    # Запрашивается на одну строку больше страницы
+    assert get_page.call_args.args[0] == 5
+    assert get_page.call_args.args[2:] == (2, 3)
+
+
+@pytest.mark.asyncio
+async def test_get_user_links_last_page_and_limit_cap(mocker):
+    get_page = mocker.patch.object(url_service.db_manager, "get_owner_urls_page", return_value=[])
+
+    page = await url_service.get_user_links(5, limit=10_000)
+
+    assert page.items == [] and page.nextCursor is None
+    assert get_page.call_args.args[3] == url_service.USER_LINKS_PAGE_MAX + 1
+
+
+@pytest.mark.asyncio
+async def test_prewarm_cache_loads_trending_links(mocker):
+    mocker.patch.object(url_service.trending, "top", return_value=[("warm1", 9.0), ("warm2", 5.0), ("gone1", 1.0)])
+    mocker.patch.object(url_service.redis_manager, "get_many", return_value={
+        "warm1": ShortUrlRecord(shortUrl="warm1", longUrl="https://warm1.com")
+    })
+    get_records = mocker.patch.object(url_service.db_manager, "get_records", return_value=[
+        ShortUrlRecord(shortUrl="warm2", longUrl="https://warm2.com")
+    ])
+    save_many = mocker.patch.object(url_service.redis_manager, "save_many", return_value=None)
+
+    assert await url_service.prewarm_cache() == 2
+
+    assert get_records.call_args.args[0] == ["warm2", "gone1"]
+    assert [record.shortUrl for record in save_many.call_args.args[0]] == ["warm2"]
+    assert url_service.local_cache.get("warm1") == "https://warm1.com"
+    assert url_service.local_cache.get("warm2") == "https://warm2.com"
+    assert url_service.local_cache.get("gone1") is None
+
+
+@pytest.mark.asyncio
+async def test_make_short_urls_never_reuses_batch_alias_for_generated_item(mocker):
+    # Счётчик выдал alias, который в этой же пачке занят пользовательским, а затем дубль
+    mocker.patch.object(url_service.alias_allocator, "allocate_many", side_effect=[["baal1d", "free01"], ["free02"]])
+    mocker.patch.object(url_service.alias_allocator, "skip_block")
+    batches = []
+
+    async def insert_many(records, db, chunk_size):
+        batches.append([(record.shortUrl, record.longUrl) for record in records])
+        return set(batches[-1])
+
+    mocker.patch.object(url_service.db_manager, "insert_many", side_effect=insert_many)
+    mocker.patch.object(url_service.redis_manager, "save_many", return_value=None)
+    mocker.patch.object(url_service.cache_invalidator, "publish", return_value=None)
+    mocker.patch.object(url_service.read_router, "mark_written", return_value=None)
+
+    results = await url_service.make_short_urls([
+        CreateShortUrlDC(url="https://custom.example", alias="baal1d"),
+        CreateShortUrlDC(url="https://generated.example"),
+        CreateShortUrlDC(url="https://other.example"),
+    ])
+
+    assert [result.url for result in results] == ["baal1d", "free02", "free01"]
+    assert batches[0] == [("baal1d", "https://custom.example"), ("free01", "https://other.example")]
+    assert batches[1] == [("free02", "https://generated.example")]
+
+
+@pytest.mark.asyncio
+async def test_resolve_many_uses_one_pipeline_and_one_query(mocker):
+    url_service.local_cache.clear()
+    mocker.patch.object(url_service, "_known_missing", return_value=False)
+    get_many = mocker.patch.object(url_service.redis_manager, "get_many", return_value={
+        "bulk1": ShortUrlRecord(shortUrl="bulk1", longUrl="https://bulk1.com")
+    })
+    get_records = mocker.patch.object(url_service.db_manager, "get_records", return_value=[
+        ShortUrlRecord(shortUrl="bulk2", longUrl="https://bulk2.com"),
+        ShortUrlRecord(shortUrl="old1", longUrl="https://old.com", expiresAt=datetime.now(timezone.utc) - timedelta(days=1))
+    ])
+    mocker.patch.object(url_service.redis_manager, "save_many", return_value=None)
+    record = mocker.patch.object(url_service.visit_buffer, "record")
+
+    results = await url_service.resolve_many(["bulk2", "bulk1", "nope1", "old1", "bulk1"])
+
+    assert [(r.shortUrl, r.url) for r in results] == [
+        ("bulk2", "https://bulk2.com"), ("bulk1", "https://bulk1.com"), ("nope1", None), ("old1", None),
+        ("bulk1", "https://bulk1.com")
+    ]
+    assert results[2].error == "Short URL not found"
+    assert results[3].error == "Short URL has expired"
+    get_many.assert_called_once_with(["bulk2", "bulk1", "nope1", "old1"])
+    assert get_records.call_args.args[0] == ["bulk2", "nope1", "old1"]
+    record.assert_not_called()
+    assert url_service.negative_cache.get("nope1") is True
+
+
+@pytest.mark.asyncio
+async def test_resolve_many_rejects_oversized_batch():
+    with pytest.raises(HTTPException) as exc:
+        await url_service.resolve_many(["a"] * (url_service.BULK_LOOKUP_MAX_SIZE + 1))
+    assert exc.value.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_get_many_stats_rereads_incomplete_cache_entries(mocker):
+    url_service.stats_cache.clear()
+    mocker.patch.object(url_service, "_known_missing", return_value=False)
+    now = datetime.now(timezone.utc)
+    mocker.patch.object(url_service.redis_manager, "get_many", return_value={
+        "full1": ShortUrlRecord(shortUrl="full1", longUrl="https://a.com", timesVisited=4, lastVisited=now, createdAt=now),
+        "part1": ShortUrlRecord(shortUrl="part1", longUrl="https://b.com", timesVisited=1)
+    })
+    get_records = mocker.patch.object(url_service.db_manager, "get_records", return_value=[
+        ShortUrlRecord(shortUrl="part1", longUrl="https://b.com", timesVisited=2, lastVisited=now, createdAt=now)
+    ])
+    mocker.patch.object(url_service.redis_manager, "save_many", return_value=None)
+    count_many = mocker.patch.object(url_service.unique_visitors, "count_many", return_value=[3, 1])
+
+    results = await url_service.get_many_stats(["full1", "part1", "nope2"])
+
+    assert results[0].stats.visits == 4 and results[0].stats.uniqueVisitors == 3
+    assert results[1].stats.visits == 2
+    assert results[2].stats is None and results[2].error == "Short URL not found"
+    assert get_records.call_args.args[0] == ["part1", "nope2"]
+    count_many.assert_called_once_with(["full1", "part1"])
+    assert url_service.stats_cache.get("full1") is results[0].stats
+
+
+def test_prewarm_repeats_before_warmed_entries_expire():
+    assert 0 < url_service.PREWARM_INTERVAL < url_service.LOCAL_CACHE_TTL
+
+
+@pytest.mark.asyncio
+async def test_get_full_url_remembers_missing_alias(mocker):
+    mocker.patch.object(url_service.redis_manager, "resolve", return_value=None)
+    db_get = mocker.patch.object(url_service.db_manager, "get_record", return_value=None)
+
+    for _ in range(3):
+        with pytest.raises(HTTPException) as exc:
+            await url_service.get_full_url("nope404")
+        assert exc.value.status_code == 404
+
+    db_get.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_get_full_url_rejects_alias_outside_bloom_filter(mocker):
+    async def pages():
+        yield ["known1"]
+
+    service = UrlService()
+    await service.alias_filter.rebuild(pages())
+    redis_resolve = mocker.patch.object(service.redis_manager, "resolve")
+    db_get = mocker.patch.object(service.db_manager, "get_record")
+
+    with pytest.raises(HTTPException) as exc:
+        await service.get_full_url("unknown1")
+
+    assert exc.value.status_code == 404
+    redis_resolve.assert_not_called()
+    db_get.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_make_short_urls_retries_generated_conflicts(mocker):
+    mocker.patch.object(url_service.alias_allocator, "allocate_many", side_effect=[["gen1", "gen2"], ["gen3"]])
+    mocker.patch.object(url_service.alias_allocator, "skip_block")
+    insert_many = mocker.patch.object(
+        url_service.db_manager, "insert_many", side_effect=[{("gen1", "https://a.com")}, {("gen3", "https://b.com")}]
+    )
+    save_many = mocker.patch.object(url_service.redis_manager, "save_many", return_value=None)
+    publish = mocker.patch.object(url_service.cache_invalidator, "publish", return_value=None)
+
+    results = await url_service.make_short_urls([
+        CreateShortUrlDC(url="https://a.com"),
+        CreateShortUrlDC(url="https://b.com"),
+        CreateShortUrlDC(url="https://c.com", alias="dup"),
+        CreateShortUrlDC(url="https://d.com", alias="dup")
+    ])
+
+    assert [result.url for result in results] == ["gen1", "gen3", None, None]
+    assert "dup" in results[2].error
+    assert insert_many.await_count == 2
+    assert len(save_many.call_args[0][0]) == 2
+    publish.assert_called_once_with("gen1", "gen3", channel=CacheInvalidator.CREATED_CHANNEL)
+
+
+@pytest.mark.asyncio
+async def test_make_short_urls_rejects_oversized_batch():
+    with pytest.raises(HTTPException) as exc:
+        await url_service.make_short_urls([CreateShortUrlDC(url="https://a.com")] * (UrlService.BATCH_MAX_SIZE + 1))
+    assert exc.value.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_make_short_url_dedupe_returns_existing_alias(mocker):
+    mocker.patch.object(url_service.db_manager, "get_aliases_by_long_urls", return_value={"hash": "exist1"})
+    save = mocker.patch.object(url_service.db_manager, "save")
+
+    user = MagicMock()
+    user.id = 7
+    result = await url_service.make_short_url(CreateShortUrlDC(url="https://example.com", dedupe=True), user)
+
+    assert result.url == "exist1"
+    save.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_full_url_rejects_expired_link_from_db(mocker):
+    expired = ShortUrlRecord(
+        shortUrl="late1", longUrl="https://late.com",
+        expiresAt=datetime.now(timezone.utc) - timedelta(minutes=1)
+    )
+    mocker.patch.object(url_service.redis_manager, "resolve", return_value=None)
+    mocker.patch.object(url_service.db_manager, "get_record", return_value=expired)
+    mocker.patch.object(url_service.redis_manager, "save", return_value=None)
+
+    with pytest.raises(HTTPException) as exc:
+        await url_service.get_full_url("late1")
+
+    assert exc.value.status_code == 404
+    assert url_service.local_cache.get("late1") is None
+
+
+@pytest.mark.asyncio
+async def test_expire_links_invalidates_only_deleted(mocker):
+    mocker.patch.object(url_service.db_manager, "delete_expired_by_aliases", return_value=["a"])
+    redis_delete = mocker.patch.object(url_service.redis_manager, "delete", return_value=None)
+    publish = mocker.patch.object(url_service.cache_invalidator, "publish", return_value=None)
+
+    assert await url_service.expire_links(["a", "b"]) == ["a"]
+
+    redis_delete.assert_called_once_with("a")
+    publish.assert_called_once_with("a", channel=CacheInvalidator.DELETED_CHANNEL)
+
+
+@pytest.mark.asyncio
+async def test_delete_expired_stops_when_leadership_lost(mocker):
+    expired_chunk = mocker.patch.object(url_service.db_manager, "delete_expired_chunk", return_value=["a"])
+    still_leader = AsyncMock(return_value=False)
+
+    assert await url_service.delete_expired(still_leader=still_leader) == 0
+
+    expired_chunk.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_archive_expired_writes_before_deleting(mocker):
+    entry = MagicMock()
+    entry.id = 11
+    entry.deletedAt = datetime(2024, 3, 1)
+    mocker.patch.object(url_service.db_manager, "get_archivable_chunk", side_effect=[[entry]])
+    calls = []
+    mocker.patch.object(url_service.cold_archive, "write", side_effect=lambda records: calls.append("write"))
+    delete_records = mocker.patch.object(
+        url_service.db_manager, "delete_expired_records", side_effect=lambda ids, db: calls.append("delete")
+    )
+
+    assert await url_service.archive_expired(older_than_days=3) == 1
+
+    assert calls == ["write", "delete"]
+    assert delete_records.call_args[0][0] == [11]
+
+
+@pytest.mark.asyncio
+async def test_archive_expired_stops_when_leadership_lost(mocker):
+    chunk = mocker.patch.object(url_service.db_manager, "get_archivable_chunk")
+    write = mocker.patch.object(url_service.cold_archive, "write")
+    still_leader = AsyncMock(return_value=False)
+
+    assert await url_service.archive_expired(still_leader=still_leader) == 0
 
-    result = url_service.get_all_expired_urls()
-    assert isinstance(result, list)
-    assert result[0]["shortUrl"] == "expired1"
+    chunk.assert_not_called()
+    write.assert_not_called()
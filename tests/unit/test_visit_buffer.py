@@ -0,0 +1,192 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+from Analytics.VisitBuffer import VisitBuffer
+
+
+@pytest.fixture
+def db_manager():
+    manager = MagicMock()
+    manager.apply_visits = AsyncMock()
+    return manager
+
+@pytest.fixture(autouse=True)
+def session_local(mocker):
+    return mocker.patch("Analytics.VisitBuffer.AsyncSessionLocal", return_value=AsyncMock())
+
+def test_record_aggregates_visits_per_alias(db_manager):
+    buffer = VisitBuffer(db_manager)
+    buffer.record("abc")
+    buffer.record("abc")
+    buffer.record("xyz")
+
+    count, last_visited = buffer.pending("abc")
+    assert count == 2
+    assert last_visited is not None
+    assert buffer.pending("missing") == (0, None)
+
+def test_pending_uncached_counts_only_visits_missing_in_redis(db_manager):
+    buffer = VisitBuffer(db_manager)
+    buffer.record("abc", True)
+    buffer.record("abc")
+
+    count, last_visited = buffer.pending_uncached("abc")
+    assert count == 1
+    assert last_visited is not None
+    assert buffer.pending_uncached("missing") == (0, None)
+
+def test_discard_forgets_pending_visits_of_alias(db_manager):
+    buffer = VisitBuffer(db_manager)
+    buffer.record("abc", visitor="v1")
+    buffer.record("abc")
+    buffer.record("xyz")
+
+    buffer.discard("abc")
+
+    assert buffer.pending("abc") == (0, None)
+    assert buffer.pending("xyz")[0] == 1
+    assert all(key[0] == "xyz" for key in buffer._clicks) and not buffer._visitors
+    assert buffer._pending_visits == 1
+
+@pytest.mark.asyncio
+async def test_flush_applies_single_batch_and_clears(db_manager):
+    buffer = VisitBuffer(db_manager)
+    buffer.record("abc")
+    buffer.record("abc")
+    buffer.record("xyz")
+
+    assert await buffer.flush() == 2
+
+    db_manager.apply_visits.assert_called_once()
+    batch = db_manager.apply_visits.call_args[0][0]
+    assert batch["abc"][0] == 2
+    assert batch["xyz"][0] == 1
+    assert buffer.pending("abc") == (0, None)
+
+@pytest.mark.asyncio
+async def test_flush_without_visits_skips_db(db_manager, session_local):
+    buffer = VisitBuffer(db_manager)
+    assert await buffer.flush() == 0
+    db_manager.apply_visits.assert_not_called()
+    session_local.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_visits(db_manager):
+    db_manager.apply_visits.side_effect = RuntimeError("db is locked")
+    buffer = VisitBuffer(db_manager)
+    buffer.record("abc")
+
+    with pytest.raises(RuntimeError):
+        await buffer.flush()
+
+    buffer.record("abc")
+    assert buffer.pending("abc")[0] == 2
+
+@pytest.mark.asyncio
+async def test_run_flushes_remaining_visits_on_cancel(db_manager):
+    buffer = VisitBuffer(db_manager, flush_interval=60)
+    task = asyncio.create_task(buffer.run())
+    await asyncio.sleep(0)
+    buffer.record("abc")
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    db_manager.apply_visits.assert_called_once()
+    assert db_manager.apply_visits.call_args[0][0]["abc"][0] == 1
+
+@pytest.mark.asyncio
+async def test_cancel_during_flush_keeps_in_flight_batch(db_manager):
+    started = asyncio.Event()
+    applied = []
+
+    async def slow_apply(batch, session):
+        started.set()
+        await asyncio.sleep(0.05)
+        applied.append(batch)
+
+    db_manager.apply_visits.side_effect = slow_apply
+    buffer = VisitBuffer(db_manager, flush_interval=0.01)
+    buffer.record("abc")
+    task = asyncio.create_task(buffer.run())
+    await started.wait()
+    buffer.record("abc")
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert sum(batch["abc"][0] for batch in applied) == 2
+    assert buffer.pending("abc") == (0, None)
+
+@pytest.mark.asyncio
+async def test_flush_sends_only_uncached_visits_to_redis(db_manager):
+    redis_manager = MagicMock()
+    redis_manager.record_visits = AsyncMock()
+    buffer = VisitBuffer(db_manager, redis_manager)
+    buffer.record("abc", counted_in_cache=True)
+    buffer.record("abc")
+    buffer.record("xyz", counted_in_cache=True)
+
+    await buffer.flush()
+
+    assert db_manager.apply_visits.call_args[0][0]["abc"][0] == 2
+    cache_visits = redis_manager.record_visits.call_args[0][0]
+    assert cache_visits["abc"][0] == 1
+    assert "xyz" not in cache_visits
+
+
+@pytest.mark.asyncio
+async def test_flush_sends_minute_clicks_to_rollup(db_manager):
+    rollup = MagicMock()
+    rollup.add = AsyncMock()
+    buffer = VisitBuffer(db_manager, rollup=rollup)
+    buffer.record("abc")
+    buffer.record("abc")
+    buffer.record("xyz")
+
+    await buffer.flush()
+
+    clicks = rollup.add.call_args[0][0]
+    assert sorted((alias, count) for (alias, _), count in clicks.items()) == [("abc", 2), ("xyz", 1)]
+    assert all(minute % 60 == 0 for (_, minute) in clicks)
+
+
+@pytest.mark.asyncio
+async def test_rollup_failure_does_not_fail_flush(db_manager):
+    rollup = MagicMock()
+    rollup.add = AsyncMock(side_effect=Exception("redis down"))
+    buffer = VisitBuffer(db_manager, rollup=rollup)
+    buffer.record("abc")
+
+    assert await buffer.flush() == 1
+    db_manager.apply_visits.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_flush_sends_hourly_visitors_to_hll(db_manager):
+    unique_visitors = MagicMock()
+    unique_visitors.add = AsyncMock()
+    buffer = VisitBuffer(db_manager, unique_visitors=unique_visitors)
+    buffer.record("abc", visitor="v1")
+    buffer.record("abc", visitor="v1")
+    buffer.record("abc", visitor="v2")
+    buffer.record("xyz")
+
+    await buffer.flush()
+
+    visitors = unique_visitors.add.call_args[0][0]
+    assert [(alias, fingerprints) for (alias, _), fingerprints in visitors.items()] == [("abc", {"v1", "v2"})]
+
+
+@pytest.mark.asyncio
+async def test_flush_feeds_trending_counts(db_manager):
+    trending = MagicMock()
+    trending.add = AsyncMock()
+    buffer = VisitBuffer(db_manager, trending=trending)
+    buffer.record("abc")
+    buffer.record("abc")
+    buffer.record("xyz")
+
+    await buffer.flush()
+
+    trending.add.assert_awaited_once_with({"abc": 2, "xyz": 1})